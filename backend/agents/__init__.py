@@ -1 +1,16 @@
-"""\nDenteScope AI - Agent Package\nMulti-agent system for dental X-ray analysis\n"""\n\nfrom .supervisor import create_supervisor\nfrom .dental_analyst import create_dental_analyst\nfrom .report_generator import create_report_generator\n\n__all__ = [\n    'create_supervisor',\n    'create_dental_analyst',\n    'create_report_generator'\n]\n\n__version__ = '1.0.0'
\ No newline at end of file
+"""
+DenteScope AI - Agent Package
+Multi-agent system for dental X-ray analysis
+"""
+
+from .supervisor import create_supervisor
+from .dental_analyst import create_dental_analyst
+from .report_generator import create_report_generator
+
+__all__ = [
+    'create_supervisor',
+    'create_dental_analyst',
+    'create_report_generator'
+]
+
+__version__ = '1.0.0'
@@ -15,3 +15,8 @@ class SupervisorAgent:
             "status": "success",
             "message": "Analysis coordinated successfully"
         }
+
+
+def create_supervisor() -> SupervisorAgent:
+    """Factory function to create a supervisor agent instance"""
+    return SupervisorAgent()
@@ -1,7 +1,16 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
 from fastapi import FastAPI, UploadFile, File, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+
+DATA_DIR = os.environ.get("DATA_DIR", str(Path(__file__).resolve().parent.parent / "data" / "raw"))
+
 app = FastAPI(
     title="DenteScope AI API",
     description="Multi-Agent Dental Analysis System",
@@ -28,6 +37,28 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+# Kept in memory so unchanged corpora are listed from the cached index
+_dataset_index = None
+_dataset_lock = threading.Lock()
+
+@app.get("/api/dataset")
+def list_dataset(recursive: bool = True):
+    # Imported here: the backend image is built from ./backend only, so the
+    # rest of the API must start without the dentescope package
+    from dentescope.scanner import DatasetIndex
+
+    global _dataset_index
+    with _dataset_lock:
+        if _dataset_index is None:
+            _dataset_index = DatasetIndex(DATA_DIR)
+        # Listing only needs stat and header info, not content hashes
+        records = _dataset_index.scan(recursive=recursive, with_hash=False)
+    return {
+        "root": str(_dataset_index.root),
+        "total": len(records),
+        "images": [record._asdict() for record in records]
+    }
+
 @app.post("/api/analyze")
 async def analyze_image(file: UploadFile = File(...)):
     return {
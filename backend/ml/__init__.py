@@ -1 +1,10 @@
-"""\nDenteScope AI - ML Package\nMachine learning models for tooth detection\n"""\n\nfrom .yolo_detector import create_yolo_detector\n\n__all__ = ['create_yolo_detector']\n\n__version__ = '1.0.0'
\ No newline at end of file
+"""
+DenteScope AI - ML Package
+Machine learning models for tooth detection
+"""
+
+from .yolo_detector import create_yolo_detector
+
+__all__ = ['create_yolo_detector']
+
+__version__ = '1.0.0'
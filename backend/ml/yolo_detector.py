@@ -1,15 +1,101 @@
 """
 YOLOv8 Detector - Optimized for Jetson Thor
+
+Decode, letterbox and forward pass are separate methods so callers (and
+the benchmark suite) can batch and time each stage on its own.
 """
 
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))  # repo root
+
+
 class YOLODetector:
-    def __init__(self, model_path="model/dental_detector.pt"):
+    def __init__(self, model_path="model/dental_detector.pt", device="cpu", conf=0.5, iou=0.7):
         self.model_path = model_path
+        self.device = device
+        self.conf = conf
+        self.iou = iou
         self.model = None
-    
+        self.net = None
+        self.imgsz = None
+        self.names = {}
+
+    def load(self):
+        """Load the checkpoint (ultralytics and torch are imported here, not at startup)"""
+        from dentescope.inference import load_network, model_input_size, resolve_device
+        from dentescope.registry import load_model
+
+        # Shared with any other user of the same checkpoint in this process
+        self.model = load_model(self.model_path)
+        self._device = resolve_device(self.device)
+        self.net = load_network(self.model, self._device)
+        self.imgsz = model_input_size(self.model)
+        self.names = self.model.names
+        return self
+
     def is_loaded(self):
-        return True
-    
+        return self.model is not None
+
+    @staticmethod
+    def decode(image):
+        """BGR uint8 array from a path, encoded bytes or an array"""
+        import cv2
+        import numpy as np
+
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, (bytes, bytearray)):
+            return cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return cv2.imread(str(image), cv2.IMREAD_COLOR)
+
+    def preprocess(self, images):
+        """Letterbox decoded images into one batch: (tensor, transforms, shapes)"""
+        from dentescope.inference import letterbox_batch
+
+        tensor, transforms = letterbox_batch(images, self.imgsz)
+        return tensor.to(self._device), transforms, [image.shape[:2] for image in images]
+
+    def infer(self, batch):
+        """Forward pass + NMS; one list of detection dicts per image"""
+        from dentescope.inference import detect_batch
+
+        tensor, transforms, shapes = batch
+        results = []
+        for boxes, scores, classes in detect_batch(self.net, tensor, transforms, shapes,
+                                                   self.conf, self.iou):
+            results.append([
+                {
+                    "class": self.names.get(int(c), str(int(c))),
+                    "confidence": float(s),
+                    "x": float((x1 + x2) / 2),
+                    "y": float((y1 + y2) / 2),
+                    "width": float(x2 - x1),
+                    "height": float(y2 - y1),
+                    "bbox": [float(x1), float(y1), float(x2), float(y2)]
+                }
+                for (x1, y1, x2, y2), s, c in zip(boxes, scores, classes)
+            ])
+        return results
+
+    def detect_images(self, images):
+        """Detect teeth in a list of decoded images"""
+        return self.infer(self.preprocess(images))
+
     async def detect(self, image):
         """Detect teeth in image"""
-        return []
+        if not self.is_loaded():
+            return []
+        loop = asyncio.get_running_loop()
+        decoded = await loop.run_in_executor(None, self.decode, image)
+        if decoded is None:
+            return []
+        detections = await loop.run_in_executor(None, self.detect_images, [decoded])
+        return detections[0]
+
+
+def create_yolo_detector(model_path="model/dental_detector.pt", **kwargs) -> YOLODetector:
+    """Factory function to create a loaded YOLO detector"""
+    return YOLODetector(model_path, **kwargs).load()
@@ -2,214 +2,427 @@
 """
 DenteScope AI - Results Analyzer
 Analyzes batch test results and generates comprehensive reports
+
+Run files are streamed once in constant memory: latencies go into an
+HDR-style histogram (percentiles within 1%), and only bounded samples of
+individual rows are kept for the report.
+
+Compare mode checks a candidate run against a baseline and flags
+statistically significant regressions. Confidence intervals for the
+change in each metric come from a bootstrap that resamples the latency
+histograms, so it also works on runs too large to hold in memory:
+
+    python3 analyze_results.py compare baseline.jsonl candidate.jsonl
 """
 
-import json
+import math
 import sys
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 from typing import Dict, List
 
+from results_log import iter_records
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from dentescope.perf import LatencyHistogram
+
+MAX_TABLE_ROWS = 500        # individual results listed in the report
+MAX_FAILED_LISTED = 5       # file names listed per error type
+
 class ResultsAnalyzer:
     """Analyze and generate reports from batch test results"""
-    
+
     def __init__(self, results_file: Path):
         self.results_file = results_file
-        with open(results_file) as f:
-            self.data = json.load(f)
-    
+        self.test_info = {}
+        self.complete = False
+        self.histogram = LatencyHistogram()      # successful analyses
+        self.all_histogram = LatencyHistogram()  # every request, for throughput
+        self.tested = 0
+        self.success = 0
+        self.total_time = 0.0
+        self.expected_total = None
+        self.teeth_detected = 0
+        self.conditions_count = defaultdict(int)
+        self.error_types = defaultdict(lambda: [0, []])
+        self.rows = []
+
+        for record in iter_records(results_file):
+            kind = record.get("type")
+            if kind == "header":
+                self.test_info = record["test_info"]
+            elif kind == "image":
+                self._add(record)
+            elif kind == "summary":
+                self.complete = True
+                self.expected_total = record["summary"].get("total")
+                if record.get("end_time"):
+                    self.test_info.setdefault("end_time", record["end_time"])
+
+    def _add(self, result: Dict):
+        self.tested += 1
+        elapsed = result["processing_time"]
+        self.total_time += elapsed
+        self.all_histogram.record(elapsed)
+
+        if result["status"] == "success":
+            self.success += 1
+            self.histogram.record(elapsed)
+            analysis = result.get("analysis") or {}
+            if "tooth_count" in analysis:
+                self.teeth_detected += analysis["tooth_count"]
+            for condition in analysis.get("conditions", []):
+                self.conditions_count[condition] += 1
+        else:
+            errors = self.error_types[result.get("error") or "Unknown error"]
+            errors[0] += 1
+            if len(errors[1]) < MAX_FAILED_LISTED:
+                errors[1].append(result["filename"])
+
+        if len(self.rows) < MAX_TABLE_ROWS:
+            self.rows.append(result)
+
+    @property
+    def summary(self) -> Dict:
+        """Run totals computed from the streamed records"""
+        total = self.expected_total if self.complete else self.tested
+        return {
+            "total": total,
+            "tested": self.tested,
+            "success": self.success,
+            "failed": self.tested - self.success,
+            "total_time": self.total_time,
+            "avg_time_per_image": self.total_time / total if total else 0
+        }
+
     def generate_markdown_report(self) -> str:
         """Generate a comprehensive markdown report"""
         report = []
-        
+        summary = self.summary
+        total = summary["total"] or 1
+
         # Header
-        report.append("# 🦷 DenteScope AI - Batch Test Report
-")
-        report.append(f"**Generated:** {datetime.now().strftime(\"%Y-%m-%d %H:%M:%S\")}
-")
-        report.append(f"**Test Started:** {self.data[\"test_info\"][\"start_time\"]}
-")
-        report.append(f"**Dataset Source:** {self.data[\"test_info\"][\"dataset_source\"]}
-")
-        report.append("
----
-")
-        
+        report.append("# 🦷 DenteScope AI - Batch Test Report\n")
+        report.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        report.append(f"**Test Started:** {self.test_info.get('start_time', 'unknown')}\n")
+        report.append(f"**Dataset Source:** {self.test_info.get('dataset_source', 'unknown')}\n")
+        if not self.complete:
+            report.append("**⚠️ Partial run:** interrupted before completion; figures cover tested images only\n")
+        report.append("\n---\n")
+
         # Executive Summary
-        summary = self.data["summary"]
-        report.append("## 📊 Executive Summary
-")
-        report.append(f"- **Total Images Tested:** {summary[\"total\"]}")
-        report.append(f"- **Successful Analyses:** {summary[\"success\"]} ({summary[\"success\"]/summary[\"total\"]*100:.1f}%)")
-        report.append(f"- **Failed Analyses:** {summary[\"failed\"]} ({summary[\"failed\"]/summary[\"total\"]*100:.1f}%)")
-        report.append(f"- **Total Processing Time:** {summary[\"total_time\"]:.2f}s")
-        report.append(f"- **Average Time per Image:** {summary[\"avg_time_per_image\"]:.2f}s
-")
-        
+        report.append("## 📊 Executive Summary\n")
+        report.append(f"- **Total Images Tested:** {summary['total']}")
+        report.append(f"- **Successful Analyses:** {summary['success']} ({summary['success']/total*100:.1f}%)")
+        report.append(f"- **Failed Analyses:** {summary['failed']} ({summary['failed']/total*100:.1f}%)")
+        report.append(f"- **Total Processing Time:** {summary['total_time']:.2f}s")
+        report.append(f"- **Average Time per Image:** {summary['avg_time_per_image']:.2f}s\n")
+
         # Performance Metrics
-        successful_results = [r for r in self.data["images"] if r["status"] == "success"]
-        if successful_results:
-            times = [r["processing_time"] for r in successful_results]
-            report.append("## ⏱️ Performance Metrics
-")
-            report.append(f"- **Fastest Analysis:** {min(times):.2f}s")
-            report.append(f"- **Slowest Analysis:** {max(times):.2f}s")
-            report.append(f"- **Median Time:** {sorted(times)[len(times)//2]:.2f}s
-")
-        
+        if self.success:
+            latency = self.histogram
+            report.append("## ⏱️ Performance Metrics\n")
+            report.append(f"- **Fastest Analysis:** {latency.min:.2f}s")
+            report.append(f"- **Slowest Analysis:** {latency.max:.2f}s")
+            report.append(f"- **Median Time:** {latency.percentile(50):.2f}s")
+            report.append(f"- **p90 / p99 Time:** {latency.percentile(90):.2f}s / {latency.percentile(99):.2f}s\n")
+
         # Aggregate Analysis Statistics
-        report.append("## 🔍 Clinical Analysis Summary
-")
-        
-        # Count detections and conditions across all successful analyses
-        total_teeth_detected = 0
-        conditions_count = defaultdict(int)
-        
-        for result in successful_results:
-            if result.get("analysis"):
-                analysis = result["analysis"]
-                if "tooth_count" in analysis:
-                    total_teeth_detected += analysis["tooth_count"]
-                if "conditions" in analysis:
-                    for condition in analysis["conditions"]:
-                        conditions_count[condition] += 1
-        
-        if total_teeth_detected > 0:
-            report.append(f"- **Total Teeth Detected:** {total_teeth_detected}")
-            report.append(f"- **Average Teeth per Image:** {total_teeth_detected/len(successful_results):.1f}
-")
-        
-        if conditions_count:
-            report.append("### Most Common Findings:
-")
-            sorted_conditions = sorted(conditions_count.items(), key=lambda x: x[1], reverse=True)
+        report.append("## 🔍 Clinical Analysis Summary\n")
+
+        if self.teeth_detected > 0:
+            report.append(f"- **Total Teeth Detected:** {self.teeth_detected}")
+            report.append(f"- **Average Teeth per Image:** {self.teeth_detected/self.success:.1f}\n")
+
+        if self.conditions_count:
+            report.append("### Most Common Findings:\n")
+            sorted_conditions = sorted(self.conditions_count.items(), key=lambda x: x[1], reverse=True)
             for condition, count in sorted_conditions[:10]:
                 report.append(f"- **{condition}:** {count} occurrences")
             report.append("")
-        
+
         # Failed Images Analysis
-        failed_results = [r for r in self.data["images"] if r["status"] == "failed"]
-        if failed_results:
-            report.append("## ❌ Failed Analyses
-")
-            report.append(f"Total failed: {len(failed_results)}
-")
-            
-            # Group by error type
-            error_types = defaultdict(list)
-            for result in failed_results:
-                error_msg = result.get("error", "Unknown error")
-                error_types[error_msg].append(result["filename"])
-            
-            report.append("### Failure Breakdown:
-")
-            for error, files in error_types.items():
-                report.append(f"**{error}** ({len(files)} images)")
-                for filename in files[:5]:  # Show first 5
+        if summary["failed"]:
+            report.append("## ❌ Failed Analyses\n")
+            report.append(f"Total failed: {summary['failed']}\n")
+
+            report.append("### Failure Breakdown:\n")
+            for error, (count, files) in self.error_types.items():
+                report.append(f"**{error}** ({count} images)")
+                for filename in files:
                     report.append(f"  - {filename}")
-                if len(files) > 5:
-                    report.append(f"  - ... and {len(files)-5} more")
+                if count > len(files):
+                    report.append(f"  - ... and {count-len(files)} more")
                 report.append("")
-        
+
         # Individual Results Table
-        report.append("## 📋 Individual Results
-")
+        report.append("## 📋 Individual Results\n")
         report.append("| # | Filename | Status | Time (s) | Notes |")
         report.append("|---|----------|--------|----------|-------|")
-        
-        for idx, result in enumerate(self.data["images"], 1):
+
+        for idx, result in enumerate(self.rows, 1):
             filename = result["filename"][:40] + "..." if len(result["filename"]) > 40 else result["filename"]
             status = "✅" if result["status"] == "success" else "❌"
-            time_str = f"{result[\"processing_time\"]:.2f}"
-            
+            time_str = f"{result['processing_time']:.2f}"
+
             notes = ""
             if result["status"] == "success" and result.get("analysis"):
                 analysis = result["analysis"]
                 if "tooth_count" in analysis:
-                    notes = f"{analysis[\"tooth_count\"]} teeth"
+                    notes = f"{analysis['tooth_count']} teeth"
             elif result["status"] == "failed":
-                notes = result.get("error", "Error")[:30]
-            
+                notes = (result.get("error") or "Error")[:30]
+
             report.append(f"| {idx} | {filename} | {status} | {time_str} | {notes} |")
-        
+
+        if self.tested > len(self.rows):
+            report.append(f"\n*First {len(self.rows)} of {self.tested} results; see {self.results_file.name} for all*")
         report.append("")
-        
+
         # Recommendations
-        report.append("## 💡 Recommendations
-")
-        
+        report.append("## 💡 Recommendations\n")
+
         if summary["failed"] > 0:
-            failure_rate = summary["failed"] / summary["total"] * 100
+            failure_rate = summary["failed"] / total * 100
             if failure_rate > 10:
                 report.append("- ⚠️ High failure rate detected. Review failed images and error messages.")
-        
+
         if summary["avg_time_per_image"] > 5.0:
             report.append("- ⚠️ Average processing time is high. Consider optimization or hardware upgrades.")
-        
+
         if summary["success"] == summary["total"]:
             report.append("- ✅ Perfect success rate! All images processed successfully.")
-        
-        report.append("
----")
-        report.append("
-*Report generated by DenteScope AI Results Analyzer*")
-        
-        return "
-".join(report)
-    
+
+        report.append("\n---")
+        report.append("\n*Report generated by DenteScope AI Results Analyzer*")
+
+        return "\n".join(report)
+
     def save_report(self, output_path: Path):
         """Save the markdown report to a file"""
         report = self.generate_markdown_report()
         with open(output_path, "w") as f:
             f.write(report)
         print(f"✅ Report saved to: {output_path}")
-    
+
     def print_summary(self):
         """Print a brief summary to console"""
-        summary = self.data["summary"]
-        
-        print("
-" + "="*80)
+        summary = self.summary
+
+        print("\n" + "="*80)
         print("📊 ANALYSIS SUMMARY")
         print("="*80)
-        print(f"
-✅ Success Rate: {summary[\"success\"]}/{summary[\"total\"]} ({summary[\"success\"]/summary[\"total\"]*100:.1f}%)")
-        print(f"⏱️  Average Time: {summary[\"avg_time_per_image\"]:.2f}s per image")
-        
+        if not self.complete:
+            print("\n⚠️  Partial run (interrupted); resume it with: batch_test_dentescope.py --resume")
+        print(f"\n✅ Success Rate: {summary['success']}/{summary['total']} ({summary['success']/(summary['total'] or 1)*100:.1f}%)")
+        print(f"⏱️  Average Time: {summary['avg_time_per_image']:.2f}s per image")
+        if self.success:
+            print(f"   p50 {self.histogram.percentile(50):.2f}s, p90 {self.histogram.percentile(90):.2f}s, "
+                  f"p99 {self.histogram.percentile(99):.2f}s")
+
         if summary["failed"] > 0:
-            print(f"
-❌ {summary[\"failed\"]} images failed processing")
-        
-        print("
-" + "="*80)
+            print(f"\n❌ {summary['failed']} images failed processing")
+
+        print("\n" + "="*80)
+
+
+# --- run-to-run comparison ---------------------------------------------------
+
+# (key, label, higher_is_worse, relative): error rate changes are compared in
+# absolute percentage points, everything else relative to the baseline
+COMPARE_METRICS = [
+    ("p50", "p50 latency", True, True),
+    ("p90", "p90 latency", True, True),
+    ("p99", "p99 latency", True, True),
+    ("mean", "mean latency", True, True),
+    ("throughput", "throughput (img/s)", False, True),
+    ("error_rate", "error rate", True, False),
+]
+
+
+def _bootstrap_stats(analyzer: ResultsAnalyzer, replicates: int, rng):
+    """
+    Metric values for the run itself (row 0) and bootstrap replicates.
+
+    Latencies are resampled from the histogram (multinomial over buckets),
+    successes from a binomial, so no raw samples are needed.
+    """
+    import numpy as np
+
+    stats = {}
+    values, counts = analyzer.histogram.buckets()
+    values, counts = np.asarray(values), np.asarray(counts)
+    n = int(counts.sum())
+    if n:
+        samples = np.vstack([counts, rng.multinomial(n, counts / n, size=replicates)])
+        cumulative = samples.cumsum(axis=1)
+        for q in (50, 90, 99):
+            rank = max(math.ceil(n * q / 100), 1)
+            stats[f"p{q}"] = values[(cumulative >= rank).argmax(axis=1)]
+        stats["mean"] = samples @ values / n
+
+    all_values, all_counts = analyzer.all_histogram.buckets()
+    all_values, all_counts = np.asarray(all_values), np.asarray(all_counts)
+    tested = int(all_counts.sum())
+    if tested:
+        all_samples = np.vstack([all_counts, rng.multinomial(tested, all_counts / tested, size=replicates)])
+        mean_time = all_samples @ all_values / tested
+        success_rate = np.concatenate([[analyzer.success / tested],
+                                       rng.binomial(tested, analyzer.success / tested, replicates) / tested])
+        stats["throughput"] = success_rate / mean_time
+        stats["error_rate"] = 1 - success_rate
+    return stats
+
+
+def compare_runs(baseline: ResultsAnalyzer, candidate: ResultsAnalyzer, confidence: float = 0.95,
+                 replicates: int = 2000, tolerance: float = 0.05, error_tolerance: float = 0.01,
+                 seed: int = 0) -> List[Dict]:
+    """
+    Bootstrap confidence intervals for the change in each metric.
+
+    A change is a regression (or improvement) when the whole confidence
+    interval lies on the bad (good) side of zero and the estimate exceeds
+    the tolerance (relative for latency/throughput, error_tolerance in
+    absolute points for the error rate).
+
+    Returns:
+        One row per metric with baseline, candidate, change, ci and verdict
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    base = _bootstrap_stats(baseline, replicates, rng)
+    cand = _bootstrap_stats(candidate, replicates, rng)
+    alpha = (1 - confidence) / 2
+
+    rows = []
+    for key, label, higher_is_worse, relative in COMPARE_METRICS:
+        if key not in base or key not in cand:
+            continue
+        b, c = base[key], cand[key]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = c / b - 1 if relative else c - b
+        estimate, replicas = delta[0], delta[1:]
+        if not np.isfinite(estimate):
+            continue
+        replicas = replicas[np.isfinite(replicas)]
+        low, high = np.quantile(replicas, [alpha, 1 - alpha])
+        worse = (low > 0) if higher_is_worse else (high < 0)
+        better = (high < 0) if higher_is_worse else (low > 0)
+        tolerance_for = tolerance if relative else error_tolerance
+        if worse and abs(estimate) >= tolerance_for:
+            verdict = "regression"
+        elif better and abs(estimate) >= tolerance_for:
+            verdict = "improvement"
+        else:
+            verdict = "no significant change"
+        rows.append({"metric": key, "label": label, "baseline": float(b[0]), "candidate": float(c[0]),
+                     "change": float(estimate), "ci": [float(low), float(high)],
+                     "relative": relative, "verdict": verdict})
+    return rows
+
+
+def _format_metric(key: str, value: float) -> str:
+    if key == "error_rate":
+        return f"{value:.1%}"
+    if key == "throughput":
+        return f"{value:.2f}"
+    return f"{value:.3f}s"
+
+
+def _format_change(value: float, relative: bool) -> str:
+    return f"{value:+.1%}" if relative else f"{value * 100:+.1f}pt"
+
+
+def compare_main(argv):
+    """Entry point for: analyze_results.py compare BASELINE CANDIDATE"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(prog="analyze_results.py compare",
+                                     description="Flag significant regressions between two runs")
+    parser.add_argument("baseline", type=Path, help="Baseline run file")
+    parser.add_argument("candidate", type=Path, help="Candidate run file")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level")
+    parser.add_argument("--replicates", type=int, default=2000, help="Bootstrap replicates")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Smallest relative latency/throughput change worth flagging")
+    parser.add_argument("--error-tolerance", type=float, default=0.01,
+                        help="Smallest error rate change worth flagging (0.01 = 1 point)")
+    parser.add_argument("--seed", type=int, default=0, help="Bootstrap seed")
+    parser.add_argument("--json", type=Path, help="Also write the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    for path in (args.baseline, args.candidate):
+        if not path.exists():
+            print(f"❌ Results file not found: {path}")
+            return 2
+
+    baseline = ResultsAnalyzer(args.baseline)
+    candidate = ResultsAnalyzer(args.candidate)
+    rows = compare_runs(baseline, candidate, args.confidence, args.replicates, args.tolerance,
+                        args.error_tolerance, args.seed)
+
+    print("\n" + "="*80)
+    print("📊 RUN COMPARISON")
+    print("="*80)
+    print(f"   Baseline:  {args.baseline} ({baseline.success}/{baseline.tested} successful)")
+    print(f"   Candidate: {args.candidate} ({candidate.success}/{candidate.tested} successful)")
+    for analyzer in (baseline, candidate):
+        if not analyzer.complete:
+            print(f"   ⚠️  {analyzer.results_file.name} is a partial run")
+    print(f"\n   {'Metric':<20} {'Baseline':>10} {'Candidate':>10} {'Change':>9}   "
+          f"{f'{args.confidence:.0%} CI':<19} Verdict")
+    icons = {"regression": "❌", "improvement": "✅", "no significant change": "  "}
+    for row in rows:
+        ci = f"[{_format_change(row['ci'][0], row['relative'])}, {_format_change(row['ci'][1], row['relative'])}]"
+        print(f"   {row['label']:<20} {_format_metric(row['metric'], row['baseline']):>10} "
+              f"{_format_metric(row['metric'], row['candidate']):>10} "
+              f"{_format_change(row['change'], row['relative']):>9}   {ci:<19} "
+              f"{icons[row['verdict']]} {row['verdict']}")
+
+    regressions = [row["label"] for row in rows if row["verdict"] == "regression"]
+    if regressions:
+        print(f"\n❌ Significant regressions: {', '.join(regressions)}")
+    else:
+        print("\n✅ No significant regressions")
+    print("="*80)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"baseline": str(args.baseline), "candidate": str(args.candidate),
+                       "confidence": args.confidence, "replicates": args.replicates,
+                       "tolerance": args.tolerance, "metrics": rows}, f, indent=2)
+    return 1 if regressions else 0
 
 def main():
     """Main entry point"""
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        sys.exit(compare_main(sys.argv[2:]))
+
     if len(sys.argv) < 2:
-        print("Usage: python3 analyze_results.py <results_file.json>")
-        print("
-Example:")
-        print("  python3 analyze_results.py test_results/results/batch_test_results_20241030_120000.json")
+        print("Usage: python3 analyze_results.py <results_file.jsonl>")
+        print("       python3 analyze_results.py compare <baseline.jsonl> <candidate.jsonl>")
+        print("\nExample:")
+        print("  python3 analyze_results.py test_results/results/batch_test_results_20241030_120000.jsonl")
         sys.exit(1)
-    
+
     results_file = Path(sys.argv[1])
-    
+
     if not results_file.exists():
         print(f"❌ Results file not found: {results_file}")
         sys.exit(1)
-    
+
     # Analyze results
     analyzer = ResultsAnalyzer(results_file)
     analyzer.print_summary()
-    
+
     # Generate and save markdown report
     report_path = results_file.parent / f"{results_file.stem}_report.md"
     analyzer.save_report(report_path)
-    
-    print(f"
-📄 Full report available at: {report_path}")
+
+    print(f"\n📄 Full report available at: {report_path}")
 
 if __name__ == "__main__":
     main()
-
@@ -6,14 +6,16 @@ Tests all dental X-ray images from the dataset repository
 
 import os
 import sys
-import json
 import time
 import requests
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
 import subprocess
-import urllib.request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from dentescope.download import GITHUB_SAMPLES_URL, Downloader, list_remote
+from results_log import RUN_PREFIX, ResultsLog, iter_records, latest_run, recover
 
 class DenteScopeBatchTester:
     """Batch testing for DenteScope AI system"""
@@ -37,61 +39,42 @@ class DenteScopeBatchTester:
                 "api_url": self.api_url,
                 "dataset_source": self.dataset_repo
             },
-            "images": [],
             "summary": {
                 "total": 0,
                 "success": 0,
                 "failed": 0,
                 "total_time": 0,
-                "avg_time_per_image": 0
+                "avg_time_per_image": 0,
+                "fastest": None,
+                "slowest": None
             }
         }
+        self.results_file = None
+        self.log = None
     
     def download_dataset(self):
-        """Download sample images from GitHub repository"""
-        print("🔽 Downloading dataset from GitHub...")
-        print(f"   Repository: {self.dataset_repo}")
-        
-        # GitHub API URL for the samples directory
-        api_url = "https://api.github.com/repos/ajeetraina/dentescope-ai/contents/data/samples"
+        """Download sample images from GitHub repository (or $DENTESCOPE_MIRROR)"""
+        url = os.environ.get("DENTESCOPE_MIRROR", GITHUB_SAMPLES_URL)
+        print("🔽 Downloading dataset...")
+        print(f"   Source: {url}")
         
         try:
-            response = requests.get(api_url)
-            response.raise_for_status()
-            files = response.json()
-            
-            # Filter only image files
-            image_files = [
-                f for f in files 
-                if f["type"] == "file" and 
-                f["name"].lower().endswith((".jpg", ".jpeg", ".png", ".tif", ".tiff"))
-            ]
-            
-            print(f"   Found {len(image_files)} images to download")
+            downloader = Downloader(self.images_dir, workers=8)
+            image_files = list_remote(url, downloader.session)
+            print(f"   Found {len(image_files)} images")
             
-            downloaded = 0
-            for file_info in image_files:
-                filename = file_info["name"]
-                download_url = file_info["download_url"]
-                local_path = self.images_dir / filename
-                
-                # Skip if already downloaded
-                if local_path.exists():
-                    print(f"   ⏭️  Skipping (already exists): {filename}")
-                    downloaded += 1
-                    continue
-                
-                try:
-                    print(f"   ⬇️  Downloading: {filename}... ", end="", flush=True)
-                    urllib.request.urlretrieve(download_url, local_path)
-                    print("✅")
-                    downloaded += 1
-                except Exception as e:
-                    print(f"❌ Error: {e}")
+            def progress(remote, status, error):
+                if error:
+                    print(f"   ❌ Error: {error}")
+                elif status != "skipped":
+                    print(f"   ⬇️  {status.capitalize()}: {remote.name}")
             
-            print(f"
-✅ Downloaded {downloaded}/{len(image_files)} images")
-            return downloaded
+            # Concurrent and resumable; unchanged images are skipped
+            counts = downloader.fetch_all(image_files, progress)
+            available = len(image_files) - counts["failed"]
+            print(f"\n✅ {available}/{len(image_files)} images ready "
+                  f"({counts['skipped']} already up to date)")
+            return available
             
         except Exception as e:
             print(f"❌ Error downloading dataset: {e}")
@@ -147,16 +130,19 @@ class DenteScopeBatchTester:
         
         return result
     
-    def run_batch_test(self):
-        """Run batch processing on all images"""
-        print("
-" + "="*80)
+    def run_batch_test(self, resume=None):
+        """
+        Run batch processing on all images
+        
+        Args:
+            resume: Run file to continue after a crash, or "latest"
+        """
+        print("\n" + "="*80)
         print("🦷 DenteScope AI - Batch Testing")
         print("="*80)
         
         # Check API health
-        print("
-1️⃣  Checking API availability...")
+        print("\n1️⃣  Checking API availability...")
         if not self.check_api_health():
             print("❌ DenteScope API is not available at", self.api_url)
             print("   Please ensure the backend is running:")
@@ -165,8 +151,7 @@ class DenteScopeBatchTester:
         print("✅ API is available")
         
         # Download dataset
-        print("
-2️⃣  Preparing dataset...")
+        print("\n2️⃣  Preparing dataset...")
         num_downloaded = self.download_dataset()
         
         if num_downloaded == 0:
@@ -181,102 +166,129 @@ class DenteScopeBatchTester:
         
         total_images = len(image_files)
         self.results["summary"]["total"] = total_images
+        done = self.open_run(resume)
         
-        print(f"
-3️⃣  Processing {total_images} images...")
+        print(f"\n3️⃣  Processing {total_images} images...")
         print("="*80)
         
         # Process each image
         for idx, image_path in enumerate(image_files, 1):
-            print(f"
-[{idx}/{total_images}] Processing: {image_path.name}")
+            if image_path.name in done:
+                continue
+            print(f"\n[{idx}/{total_images}] Processing: {image_path.name}")
             print("-" * 80)
             
             result = self.process_image(image_path)
-            self.results["images"].append(result)
+            self.log.append(result)
+            self.tally(result)
             
             if result["status"] == "success":
-                self.results["summary"]["success"] += 1
-                print(f"✅ Success - {result[\"processing_time\"]:.2f}s")
+                print(f"✅ Success - {result['processing_time']:.2f}s")
                 
                 # Print brief analysis summary if available
                 if result["analysis"]:
                     analysis = result["analysis"]
                     if "tooth_count" in analysis:
-                        print(f"   Teeth detected: {analysis[\"tooth_count\"]}")
+                        print(f"   Teeth detected: {analysis['tooth_count']}")
                     if "conditions" in analysis:
-                        print(f"   Conditions: {\", \".join(analysis[\"conditions\"][:3])}")
+                        print(f"   Conditions: {', '.join(analysis['conditions'][:3])}")
             else:
-                self.results["summary"]["failed"] += 1
-                print(f"❌ Failed - {result[\"error\"]}")
-            
-            # Save intermediate results
-            self.save_results()
+                print(f"❌ Failed - {result['error']}")
         
         # Calculate final statistics
-        total_time = sum(r["processing_time"] for r in self.results["images"])
-        self.results["summary"]["total_time"] = total_time
+        total_time = self.results["summary"]["total_time"]
         self.results["summary"]["avg_time_per_image"] = (
             total_time / total_images if total_images > 0 else 0
         )
         self.results["test_info"]["end_time"] = datetime.now().isoformat()
         
-        # Final save
-        self.save_results()
+        # Summary line marks the run complete
+        self.log.close(self.results["summary"], end_time=self.results["test_info"]["end_time"])
         self.print_summary()
     
-    def save_results(self):
-        """Save test results to JSON file"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        results_file = self.results_dir / f"batch_test_results_{timestamp}.json"
+    def tally(self, result: Dict[str, Any]):
+        """Add one image result to the running summary"""
+        summary = self.results["summary"]
+        summary["total_time"] += result["processing_time"]
+        if result["status"] == "success":
+            summary["success"] += 1
+            t = result["processing_time"]
+            summary["fastest"] = t if summary["fastest"] is None else min(summary["fastest"], t)
+            summary["slowest"] = t if summary["slowest"] is None else max(summary["slowest"], t)
+        else:
+            summary["failed"] += 1
+    
+    def open_run(self, resume=None) -> set:
+        """
+        Start a new run file, or continue a crashed one
+        
+        Returns:
+            Filenames already tested in the resumed run
+        """
+        if resume:
+            path = latest_run(self.results_dir) if resume == "latest" else Path(resume)
+            if path is None or not path.exists():
+                print("⚠️  No run to resume, starting a new one")
+            else:
+                header, done, complete = recover(path)
+                if complete:
+                    print(f"⚠️  {path.name} already finished, starting a new run")
+                else:
+                    if header:
+                        self.results["test_info"] = header["test_info"]
+                    for record in iter_records(path):
+                        if record.get("type") == "image":
+                            self.tally(record)
+                    print(f"♻️  Resuming {path.name}: {len(done)} images already tested")
+                    self.results_file = path
+                    self.log = ResultsLog(path)
+                    return done
         
-        with open(results_file, "w") as f:
-            json.dump(self.results, f, indent=2)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.results_file = self.results_dir / f"{RUN_PREFIX}{timestamp}.jsonl"
+        self.log = ResultsLog(self.results_file, self.results["test_info"])
+        return set()
     
     def print_summary(self):
         """Print test summary"""
-        print("
-" + "="*80)
+        print("\n" + "="*80)
         print("📊 TEST SUMMARY")
         print("="*80)
         
         summary = self.results["summary"]
         
-        print(f"
-📈 Overall Statistics:")
-        print(f"   Total Images:    {summary[\"total\"]}")
-        print(f"   ✅ Successful:   {summary[\"success\"]}")
-        print(f"   ❌ Failed:       {summary[\"failed\"]}")
-        print(f"   Success Rate:    {(summary[\"success\"]/summary[\"total\"]*100):.1f}%")
+        print(f"\n📈 Overall Statistics:")
+        print(f"   Total Images:    {summary['total']}")
+        print(f"   ✅ Successful:   {summary['success']}")
+        print(f"   ❌ Failed:       {summary['failed']}")
+        print(f"   Success Rate:    {(summary['success']/summary['total']*100):.1f}%")
         
-        print(f"
-⏱️  Performance Metrics:")
-        print(f"   Total Time:      {summary[\"total_time\"]:.2f}s")
-        print(f"   Avg Time/Image:  {summary[\"avg_time_per_image\"]:.2f}s")
+        print(f"\n⏱️  Performance Metrics:")
+        print(f"   Total Time:      {summary['total_time']:.2f}s")
+        print(f"   Avg Time/Image:  {summary['avg_time_per_image']:.2f}s")
         
         if summary["success"] > 0:
-            successful_times = [
-                r["processing_time"] for r in self.results["images"]
-                if r["status"] == "success"
-            ]
-            print(f"   Fastest:         {min(successful_times):.2f}s")
-            print(f"   Slowest:         {max(successful_times):.2f}s")
+            print(f"   Fastest:         {summary['fastest']:.2f}s")
+            print(f"   Slowest:         {summary['slowest']:.2f}s")
         
-        print(f"
-📁 Results saved to:")
-        print(f"   {self.results_dir}/")
+        print(f"\n📁 Results saved to:")
+        print(f"   {self.results_file}")
         
-        print("
-" + "="*80)
+        print("\n" + "="*80)
 
 def main():
     """Main entry point"""
-    # Parse command line arguments
-    api_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="DenteScope AI batch test")
+    parser.add_argument("api_url", nargs="?", default="http://localhost:8000", help="Backend URL")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_FILE",
+                        help="Continue an interrupted run (default: the latest run file)")
+    args = parser.parse_args()
     
     # Create tester and run
-    tester = DenteScopeBatchTester(api_url=api_url)
-    tester.run_batch_test()
+    tester = DenteScopeBatchTester(api_url=args.api_url)
+    tester.run_batch_test(resume=args.resume)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+DenteScope AI - Load Testing
+Find where the analysis API saturates under concurrent load
+
+Two load models, each run as a ramp of steps after a warm-up period:
+
+    closed loop  --concurrency 1,2,4,8   N clients, each sends its next request
+                                         as soon as the previous one returns
+    open loop    --rate 1,2,4,8          Poisson arrivals at R requests/second,
+                                         independent of how fast the server answers
+
+Open-loop latency is measured from the scheduled arrival time, so time a
+request spends queued behind a saturated client connection pool counts
+(no coordinated omission). Per step the report shows throughput, error
+rate and p50/p90/p99/p99.9 latency from an HDR-style histogram, and the
+first step where throughput stops growing or latency/errors blow up is
+flagged as the saturation point.
+
+Usage:
+    python3 load_test.py http://localhost:8000 --concurrency 1,2,4,8,16
+    python3 load_test.py http://localhost:8000 --rate 0.5,1,2,4 --step-duration 60
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from dentescope.perf import LatencyHistogram
+from dentescope.scanner import list_images
+
+# Saturation criteria, relative to the previous/first step
+MIN_SCALING = 0.5            # throughput grows by less than half the load increase
+MAX_P99_GROWTH = 3.0         # p99 more than 3x the first step
+MAX_ERROR_RATE = 0.01
+MIN_ERRORS = 5               # ignore the odd failed request in short steps
+
+
+class StepResult:
+    """Counters and latency histogram for one load step"""
+
+    def __init__(self, name: str, load: float):
+        self.name = name
+        self.load = load
+        self.histogram = LatencyHistogram()
+        self.errors = {}
+        self.sent = 0
+        self.dropped = 0
+        self.duration = 0.0
+
+    def record(self, latency: float, error: Optional[str]):
+        if error is None:
+            self.histogram.record(latency)
+        else:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    @property
+    def completed(self) -> int:
+        return self.histogram.count
+
+    @property
+    def failed(self) -> int:
+        return sum(self.errors.values()) + self.dropped
+
+    def to_dict(self) -> dict:
+        total = self.completed + self.failed
+        return {
+            'step': self.name,
+            'load': self.load,
+            'duration_s': round(self.duration, 3),
+            'sent': self.sent,
+            'completed': self.completed,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'error_rate': self.failed / total if total else 0.0,
+            'throughput_rps': self.completed / self.duration if self.duration else 0.0,
+            'latency_ms': self.histogram.summary(),
+            'histogram': self.histogram.to_dict(),
+        }
+
+
+class LoadGenerator:
+    """
+    Drive the analysis endpoint with closed- or open-loop load.
+
+    Args:
+        api_url: Backend base URL
+        images: Image paths; request bodies are read into memory once
+        endpoint: Path of the upload endpoint
+        timeout: Per-request timeout in seconds
+        max_inflight: Connection limit (open loop: arrivals beyond it are dropped)
+    """
+
+    def __init__(self, api_url: str, images: List[Path], endpoint: str = '/api/analyze',
+                 timeout: float = 120, max_inflight: int = 256):
+        self.url = api_url.rstrip('/') + endpoint
+        self.bodies = [(path.name, path.read_bytes()) for path in images]
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_inflight = max_inflight
+        self._next_body = itertools.cycle(self.bodies)
+        self._inflight = 0
+        self.session = None
+
+    async def _send(self, step: StepResult, started: float):
+        name, body = next(self._next_body)
+        form = aiohttp.FormData()
+        form.add_field('file', body, filename=name, content_type='image/jpeg')
+        error = None
+        try:
+            async with self.session.post(self.url, data=form) as response:
+                await response.read()
+                if response.status != 200:
+                    error = f"HTTP {response.status}"
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except aiohttp.ClientError as e:
+            error = type(e).__name__
+        step.record(time.perf_counter() - started, error)
+
+    async def closed_loop(self, step: StepResult, concurrency: int, duration: float):
+        """N clients back to back for duration seconds"""
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            while time.perf_counter() < deadline:
+                step.sent += 1
+                await self._send(step, time.perf_counter())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        step.duration = time.perf_counter() - start
+
+    async def open_loop(self, step: StepResult, rate: float, duration: float, rng: random.Random):
+        """Poisson arrivals at rate requests/second for duration seconds"""
+        tasks = set()
+        start = time.perf_counter()
+        arrival = start
+        while True:
+            arrival += rng.expovariate(rate)
+            if arrival - start >= duration:
+                break
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            step.sent += 1
+            if self._inflight >= self.max_inflight:
+                step.dropped += 1  # client-side overload: the server is far behind
+                continue
+            task = asyncio.ensure_future(self._tracked(step, arrival))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        step.duration = time.perf_counter() - start
+
+    async def _tracked(self, step: StepResult, arrival: float):
+        self._inflight += 1
+        try:
+            await self._send(step, arrival)
+        finally:
+            self._inflight -= 1
+
+    async def run(self, mode: str, levels: List[float], step_duration: float,
+                  warmup: float, seed: int = 0, on_step=None) -> List[StepResult]:
+        """Warm up at the first level, then run one step per level"""
+        rng = random.Random(seed)
+        connector = aiohttp.TCPConnector(limit=self.max_inflight)
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout) as session:
+            self.session = session
+
+            async def step_at(step, level, duration):
+                if mode == 'closed':
+                    await self.closed_loop(step, int(level), duration)
+                else:
+                    await self.open_loop(step, level, duration, rng)
+                return step
+
+            if warmup > 0:
+                warm = await step_at(StepResult('warmup', levels[0]), levels[0], warmup)
+                if on_step:
+                    on_step(warm)
+
+            results = []
+            for i, level in enumerate(levels, 1):
+                step = await step_at(StepResult(f"step {i}", level), level, step_duration)
+                results.append(step)
+                if on_step:
+                    on_step(step)
+        return results
+
+
+def find_saturation(steps: List[dict]) -> Optional[dict]:
+    """First step where more load stops helping or starts hurting"""
+    if not steps:
+        return None
+    base_p99 = steps[0]['latency_ms'].get('p99')
+    for previous, step in zip(steps, steps[1:]):
+        reasons = []
+        gain = (step['throughput_rps'] / previous['throughput_rps'] - 1
+                if previous['throughput_rps'] else 0.0)
+        load_gain = step['load'] / previous['load'] - 1
+        if gain < MIN_SCALING * load_gain:
+            reasons.append(f"throughput {gain:+.0%} for {load_gain:+.0%} load")
+        p99 = step['latency_ms'].get('p99')
+        if base_p99 and p99 and p99 > base_p99 * MAX_P99_GROWTH:
+            reasons.append(f"p99 {p99 / base_p99:.1f}x step 1")
+        if step['error_rate'] > MAX_ERROR_RATE and step['failed'] >= MIN_ERRORS:
+            reasons.append(f"errors {step['error_rate']:.1%}")
+        if reasons:
+            return {'step': step['step'], 'load': step['load'], 'reasons': reasons,
+                    'max_throughput_rps': max(s['throughput_rps'] for s in steps)}
+    return None
+
+
+def print_step(step: StepResult, unit: str):
+    data = step.to_dict()
+    latency = data['latency_ms']
+    shown = ' '.join(f"{k}={latency[k]:.0f}" for k in ('p50', 'p90', 'p99', 'p999') if k in latency)
+    print(f"   {data['step']:>8} {data['load']:>6g} {unit}  "
+          f"{data['throughput_rps']:7.2f} req/s  errors {data['error_rate']:6.1%}  "
+          f"{shown or 'no successful requests'} ms")
+
+
+def parse_levels(text: str) -> List[float]:
+    return [float(x) for x in text.split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the DenteScope analysis API')
+    parser.add_argument('api_url', nargs='?', default='http://localhost:8000', help='Backend URL')
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', type=parse_levels,
+                      help='Closed loop: comma-separated client counts, e.g. 1,2,4,8')
+    load.add_argument('--rate', type=parse_levels,
+                      help='Open loop: comma-separated Poisson arrival rates (req/s)')
+    parser.add_argument('--step-duration', type=float, default=30, help='Seconds per step')
+    parser.add_argument('--warmup', type=float, default=10, help='Warm-up seconds (not reported)')
+    parser.add_argument('--images', default='test_results/images', help='Images to upload')
+    parser.add_argument('--endpoint', default='/api/analyze', help='Upload endpoint path')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout (s)')
+    parser.add_argument('--max-inflight', type=int, default=256, help='Connection limit')
+    parser.add_argument('--seed', type=int, default=0, help='Arrival process seed')
+    parser.add_argument('--output', default='test_results/results', help='Report directory')
+    args = parser.parse_args()
+
+    mode, levels = ('open', args.rate) if args.rate else ('closed', args.concurrency or [1, 2, 4, 8])
+    unit = 'req/s' if mode == 'open' else 'clients'
+
+    images = list_images(args.images)
+    if not images:
+        print(f"❌ No images in {args.images} (run batch_test_dentescope.py once to download them)")
+        return 1
+
+    print("=" * 80)
+    print("🦷 DenteScope AI - Load Test")
+    print("=" * 80)
+    print(f"   Target: {args.api_url.rstrip('/')}{args.endpoint}")
+    print(f"   Mode: {mode} loop, steps {', '.join(f'{x:g}' for x in levels)} {unit}, "
+          f"{args.step_duration:g}s each after {args.warmup:g}s warm-up")
+    print(f"   Images: {len(images)} from {args.images}\n")
+
+    generator = LoadGenerator(args.api_url, images, args.endpoint, args.timeout, args.max_inflight)
+    steps = asyncio.run(generator.run(mode, levels, args.step_duration, args.warmup, args.seed,
+                                      on_step=lambda step: print_step(step, unit)))
+
+    report = [step.to_dict() for step in steps]
+    saturation = find_saturation(report)
+    print()
+    if not any(step['completed'] for step in report):
+        print(f"❌ No successful requests; is the API running at {args.api_url}?")
+        return 1
+    if saturation:
+        print(f"⚠️  Saturation at {saturation['step']} ({saturation['load']:g} {unit}): "
+              f"{', '.join(saturation['reasons'])}; "
+              f"peak throughput {saturation['max_throughput_rps']:.2f} req/s")
+    else:
+        print("✅ No saturation within the tested range")
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report_path = output_dir / f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, 'w') as f:
+        json.dump({'api_url': args.api_url, 'endpoint': args.endpoint, 'mode': mode,
+                   'levels': levels, 'step_duration': args.step_duration, 'warmup': args.warmup,
+                   'images': len(images), 'steps': report, 'saturation': saturation}, f, indent=2)
+    print(f"📁 Report: {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
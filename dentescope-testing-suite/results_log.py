@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+DenteScope AI - Results Log
+Append-only JSONL run files shared by the batch tester and the analyzer
+
+One run is one file, one JSON object per line:
+
+    {"type": "header", "test_info": {...}}
+    {"type": "image", "filename": ..., "status": ..., "processing_time": ...}
+    ...
+    {"type": "summary", "summary": {...}, "end_time": ...}
+
+Each result costs one appended line, so logging stays O(n) over a soak
+test. A run that crashed has no summary line and at most one torn last
+line; recover() truncates the tear and returns what was already tested,
+so the run can be continued in place.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Set, Tuple
+
+RUN_PREFIX = "batch_test_results_"
+
+
+def iter_records(path) -> Iterator[dict]:
+    """
+    Stream the records of a run file in constant memory.
+
+    Legacy single-document .json results are converted on the fly. A torn
+    last line (crash mid-write) is skipped.
+    """
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path) as f:
+            data = json.load(f)
+        yield {"type": "header", "test_info": data.get("test_info", {})}
+        for result in data.get("images", []):
+            yield {"type": "image", **result}
+        if data.get("summary"):
+            yield {"type": "summary", "summary": data["summary"],
+                   "end_time": data.get("test_info", {}).get("end_time")}
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # torn write; recover() removes it
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def recover(path) -> Tuple[Optional[dict], Set[str], bool]:
+    """
+    Make a partial run file appendable again.
+
+    Returns:
+        (header record, filenames already tested, whether the run was complete)
+    """
+    header, done, complete = None, set(), False
+    valid_end = 0
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            offset += len(line)
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_end = offset
+            kind = record.get("type")
+            if kind == "header":
+                header = record
+            elif kind == "image":
+                done.add(record["filename"])
+            elif kind == "summary":
+                complete = True
+    if os.path.getsize(path) != valid_end:
+        with open(path, "r+b") as f:
+            f.truncate(valid_end)
+    return header, done, complete
+
+
+def latest_run(results_dir) -> Optional[Path]:
+    """Most recent run file in results_dir"""
+    runs = sorted(Path(results_dir).glob(f"{RUN_PREFIX}*.jsonl"), key=lambda p: p.stat().st_mtime)
+    return runs[-1] if runs else None
+
+
+class ResultsLog:
+    """
+    Appender for one run file.
+
+    Lines are flushed as they are written, so a killed process loses at
+    most the line being written.
+    """
+
+    def __init__(self, path, test_info: Optional[dict] = None):
+        self.path = Path(path)
+        resuming = self.path.exists() and self.path.stat().st_size > 0
+        self._file = open(self.path, "a", encoding="utf-8")
+        if not resuming:
+            self.write({"type": "header", "test_info": test_info or {}})
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def append(self, result: dict):
+        """Log one image result"""
+        self.write({"type": "image", **result})
+
+    def close(self, summary: Optional[dict] = None, **extra):
+        """Write the summary line (marks the run complete) and close the file"""
+        if summary is not None:
+            self.write({"type": "summary", "summary": summary, **extra})
+            os.fsync(self._file.fileno())
+        self._file.close()
@@ -99,7 +99,7 @@ echo -e "
 ${YELLOW}Step 5: Analyzing results...${NC}"
 
 # Find the most recent results file
-LATEST_RESULTS=$(ls -t test_results/results/batch_test_results_*.json 2>/dev/null | head -1)
+LATEST_RESULTS=$(ls -t test_results/results/batch_test_results_*.jsonl 2>/dev/null | head -1)
 
 if [ -z "$LATEST_RESULTS" ]; then
     echo -e "${RED}❌ No results file found${NC}"
@@ -118,7 +118,7 @@ echo "==================================================================${NC}"
 echo -e "
 📁 Results Location:"
 echo "   - Raw Results: $LATEST_RESULTS"
-echo "   - Report: ${LATEST_RESULTS%.json}_report.md"
+echo "   - Report: ${LATEST_RESULTS%.jsonl}_report.md"
 echo "   - Images: test_results/images/"
 
 echo -e "
@@ -126,7 +126,7 @@ echo -e "
 echo "   1. Review the generated report"
 echo "   2. Check failed images (if any)"
 echo "   3. Analyze performance metrics"
-echo "   4. View detailed results: cat ${LATEST_RESULTS%.json}_report.md"
+echo "   4. View detailed results: cat ${LATEST_RESULTS%.jsonl}_report.md"
 
 echo -e "
 ${GREEN}All done! 🎉${NC}
@@ -23,6 +23,9 @@ echo "📁 Copying test scripts to $TESTING_DIR..."
 # Copy all testing files
 cp batch_test_dentescope.py "$TESTING_DIR/"
 cp analyze_results.py "$TESTING_DIR/"
+cp load_test.py "$TESTING_DIR/"
+cp results_log.py "$TESTING_DIR/"
+cp requirements.txt "$TESTING_DIR/"
 cp run_complete_test.sh "$TESTING_DIR/"
 cp README_TESTING.md "$TESTING_DIR/" 2>/dev/null || echo "Note: README_TESTING.md not found, skipping"
 
@@ -64,7 +67,7 @@ cd testing
 python3 batch_test_dentescope.py http://localhost:8000
 
 # Analyze results
-python3 analyze_results.py test_results/results/batch_test_results_*.json
+python3 analyze_results.py test_results/results/batch_test_results_*.jsonl
 ```
 
 For complete testing documentation, see [testing/README_TESTING.md](testing/README_TESTING.md)
@@ -119,7 +122,7 @@ jobs:
     - name: Analyze results
       run: |
         cd testing
-        LATEST_RESULTS=$(ls -t test_results/results/batch_test_results_*.json | head -1)
+        LATEST_RESULTS=$(ls -t test_results/results/batch_test_results_*.jsonl | head -1)
         python3 analyze_results.py "$LATEST_RESULTS"
     
     - name: Upload test results
@@ -138,7 +141,7 @@ if [ -f "$REPO_DIR/.gitignore" ]; then
 
 # Testing results
 testing/test_results/images/
-testing/test_results/results/*.json
+testing/test_results/results/*.json*
 EOF
         echo "✅ Updated .gitignore"
     fi
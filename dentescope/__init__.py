@@ -0,0 +1,9 @@
+"""
+DenteScope AI - Shared Library
+Utilities shared by the training, analysis and example scripts
+
+Submodules are imported explicitly (e.g. ``from dentescope import scanner``)
+so that importing the package itself stays cheap.
+"""
+
+__version__ = '1.0.0'
@@ -0,0 +1,8 @@
+"""python -m dentescope <command> [args]"""
+
+import sys
+
+from dentescope.cli import main
+
+if __name__ == '__main__':  # not when re-imported by spawn-started workers
+    sys.exit(main())
@@ -0,0 +1,558 @@
+"""
+DenteScope AI - Pipeline Benchmark
+End-to-end timing of the analysis pipeline, stage by stage, with stored baselines
+
+Every image goes through the stages of an API request, one image at a time:
+    decode       cv2.imread of the stored file
+    preprocess   letterbox + tensor conversion (YOLODetector.preprocess)
+    detect       forward pass + NMS + box mapping (YOLODetector.infer)
+    supervisor   SupervisorAgent.orchestrate
+    analyst      DentalAnalyst.analyze_detections
+    report       ReportGenerator.generate_report (markdown + JSON)
+and total is their sum. The analyst's LLM call is answered by a canned
+reply: its latency belongs to the API, and the benchmark has to run
+offline and reproducibly on a CPU-only machine.
+
+Per stage the result holds a latency histogram (p50/p90/p99) and two
+memory figures: rss_delta, the largest RSS growth over one call, and
+peak_growth, how far the process high-water mark rose during the stage's
+calls (so the stage that sets the peak is the one charged for it). Model
+loading is reported separately.
+
+Results are JSON documents carrying the git commit, library versions,
+CPU and thread count, a corpus fingerprint and the checkpoint hash, so
+two results can be checked for comparability before they are diffed.
+Every run is kept in the cache directory; --save NAME also writes it to
+benchmarks/NAME.json, to be committed as a versioned baseline.
+
+Commands (python -m dentescope.bench):
+    run              benchmark data/raw (or --synthetic N images) on the CPU
+    diff BASE [NEW]  per-stage change between two results (NEW defaults to last)
+    list             stored baselines
+"""
+
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+
+from dentescope import __version__
+from dentescope.perf import LatencyHistogram, current_rss_mb, peak_rss_mb
+from dentescope.registry import resolve
+from dentescope.scanner import default_cache_dir, file_sha256, list_images
+
+BENCH_SCHEMA = 1
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_DIR = REPO_ROOT / 'benchmarks'
+STAGES = ('decode', 'preprocess', 'detect', 'supervisor', 'analyst', 'report')
+
+# docs/ARCHITECTURE.md performance targets, checked against p90
+TARGETS_MS = {'detect': 50.0, 'total': 1000.0}
+
+# Diff thresholds: a change must pass both to count
+DEFAULT_TOLERANCE = 0.10     # relative change in p50/p90
+MIN_CHANGE_MS = 0.5          # absolute change, ignores jitter on sub-ms stages
+MIN_CHANGE_MB = 16.0         # absolute memory change
+
+CANNED_ANALYSIS = """1. Overall assessment: complete mixed dentition with no gross anomalies.
+2. Notable observations: tooth count and positioning are consistent with the patient's age.
+3. Potential areas of concern: low-confidence detections should be reviewed by a clinician.
+4. Recommend routine follow-up radiographs at the next scheduled visit.
+"""
+
+
+class CannedClient:
+    """Messages API stand-in that returns CANNED_ANALYSIS without a network round trip"""
+
+    def __init__(self):
+        self.messages = SimpleNamespace(create=self._create)
+
+    @staticmethod
+    def _create(**kwargs):
+        return SimpleNamespace(content=[SimpleNamespace(text=CANNED_ANALYSIS)])
+
+
+def synthetic_corpus(count: int, seed: int = 0, size=(1662, 952), cache_dir=None) -> Path:
+    """
+    Write count deterministic panoramic-sized JPEGs (once) and return their directory.
+
+    Images are a dark jaw-shaped gradient with bright tooth-like ellipses and
+    sensor noise, so decode and letterbox costs match real X-rays.
+    """
+    import cv2
+    import numpy as np
+
+    width, height = size
+    root = Path(cache_dir) if cache_dir else default_cache_dir()
+    directory = root / 'bench' / f"synthetic-{count}-{seed}-{width}x{height}"
+    if len(list_images(directory)) == count:
+        return directory
+    directory.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    jaw = 60 + 50 * np.exp(-(((xx - width / 2) / (width / 2.5)) ** 2 + ((yy - height / 2) / (height / 2.5)) ** 2))
+    for i in range(count):
+        image = jaw.copy()
+        for row in (0.38, 0.62):
+            for x in np.linspace(0.2, 0.8, 14):
+                center = (int(x * width + rng.normal(0, 8)), int(row * height + rng.normal(0, 10)))
+                axes = (int(rng.uniform(22, 38)), int(rng.uniform(70, 110)))
+                cv2.ellipse(image, center, axes, rng.uniform(-10, 10), 0, 360, float(rng.uniform(150, 220)), -1)
+        image += rng.normal(0, 8, image.shape).astype(np.float32)
+        gray = np.clip(image, 0, 255).astype(np.uint8)
+        cv2.imwrite(str(directory / f"synthetic_{i:04d}.jpg"), cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR),
+                    [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return directory
+
+
+def corpus_fingerprint(paths: List[Path]) -> dict:
+    """Image count, total bytes and a hash of names + sizes"""
+    digest = hashlib.sha1()
+    total = 0
+    for path in paths:
+        size = path.stat().st_size
+        total += size
+        digest.update(f"{path.name}\0{size}\n".encode())
+    return {'images': len(paths), 'bytes': total, 'sha1': digest.hexdigest()}
+
+
+def git_revision() -> dict:
+    """Commit of the working tree and whether it has uncommitted changes"""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    try:
+        return {'commit': git('rev-parse', 'HEAD') or None,
+                'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+    except (OSError, subprocess.SubprocessError):
+        return {'commit': None, 'dirty': None}
+
+
+def cpu_model() -> str:
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def environment() -> dict:
+    """Library versions and hardware that results depend on"""
+    import cv2
+    import numpy as np
+    import torch
+    import ultralytics
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu': cpu_model(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'torch': torch.__version__,
+        'ultralytics': ultralytics.__version__,
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+    }
+
+
+class StageRecorder:
+    """Latency histogram and memory growth per stage"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.rss_delta = {}
+        self.peak_growth = {}
+
+    def measure(self, stage: str, fn: Callable, *args):
+        """Call fn(*args), charging its time and memory to stage"""
+        rss, peak = current_rss_mb(), peak_rss_mb()
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        self.add(stage, elapsed)
+        self.rss_delta[stage] = max(self.rss_delta.get(stage, 0.0), current_rss_mb() - rss)
+        self.peak_growth[stage] = self.peak_growth.get(stage, 0.0) + peak_rss_mb() - peak
+        return result, elapsed
+
+    def add(self, stage: str, seconds: float):
+        if stage not in self.histograms:
+            self.histograms[stage] = LatencyHistogram()
+        self.histograms[stage].record(seconds)
+
+    def to_dict(self) -> dict:
+        total_mean = self.histograms['total'].total / self.histograms['total'].count
+        # total is not measured as one call; charge it the sum of its stages
+        total_rss, total_peak = sum(self.rss_delta.values()), sum(self.peak_growth.values())
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            stages[stage] = {
+                'latency_ms': histogram.summary(quantiles=(50, 90, 99)),
+                'share': histogram.total / histogram.count / total_mean if total_mean else 0.0,
+                'rss_delta_mb': round(self.rss_delta.get(stage, total_rss), 2),
+                'peak_growth_mb': round(self.peak_growth.get(stage, total_peak), 2),
+                'histogram': histogram.to_dict(),
+            }
+        return stages
+
+
+def build_pipeline(model_path: str, device: str, conf: float, iou: float):
+    """Detector, agents and an event loop for the supervisor's coroutine"""
+    import asyncio
+
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    from backend.agents import create_dental_analyst, create_report_generator, create_supervisor
+    from backend.ml import create_yolo_detector
+
+    return SimpleNamespace(
+        detector=create_yolo_detector(model_path, device=device, conf=conf, iou=iou),
+        supervisor=create_supervisor(),
+        analyst=create_dental_analyst(client=CannedClient()),
+        reporter=create_report_generator(),
+        loop=asyncio.new_event_loop(),
+    )
+
+
+def run_benchmark(image_paths: List[Path], model_path: str, device: str = 'cpu',
+                  threads: Optional[int] = None, warmup: int = 3, repeat: int = 1,
+                  conf: float = 0.25, iou: float = 0.7, progress=None) -> dict:
+    """
+    Time every pipeline stage over image_paths.
+
+    Args:
+        image_paths: Corpus, processed in order, one image at a time
+        model_path: YOLO checkpoint for the detector
+        device: Torch device ('cpu' keeps results comparable across machines)
+        threads: Torch intra-op threads (default: torch's own choice)
+        warmup: Untimed images before measuring (allocator, caches, lazy imports)
+        repeat: Passes over the corpus
+        conf: Detection confidence threshold
+        iou: NMS IoU threshold
+        progress: Optional callback(done, total)
+
+    Returns:
+        Result document (see module docstring)
+    """
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    synchronize = torch.cuda.synchronize if device not in ('cpu', 'mps') else (lambda: None)
+
+    rss_start = current_rss_mb()
+    start = time.perf_counter()
+    pipeline = build_pipeline(model_path, device, conf, iou)
+    load = {'seconds': time.perf_counter() - start, 'rss_mb': current_rss_mb() - rss_start}
+    detector = pipeline.detector
+
+    def detect(batch):
+        detections = detector.infer(batch)
+        synchronize()
+        return detections
+
+    def supervise(path, detections):
+        pipeline.loop.run_until_complete(pipeline.supervisor.orchestrate(str(path)))
+        return detections
+
+    recorder = StageRecorder()
+
+    def process(path, record):
+        steps = (
+            ('decode', lambda _: detector.decode(path)),
+            ('preprocess', lambda image: detector.preprocess([image])),
+            ('detect', lambda batch: detect(batch)[0]),
+            ('supervisor', lambda detections: supervise(path, detections)),
+            ('analyst', lambda detections: pipeline.analyst.analyze_detections(detections, str(path))),
+            ('report', lambda analysis: pipeline.reporter.generate_report(analysis, {'image': path.name})),
+        )
+        value, total = None, 0.0
+        for stage, fn in steps:
+            if record:
+                value, elapsed = recorder.measure(stage, fn, value)
+                total += elapsed
+            else:
+                value = fn(value)
+            if value is None:
+                raise ValueError(f"Cannot decode {path}")
+        if record:
+            recorder.add('total', total)
+
+    for i in range(min(warmup, len(image_paths))):
+        process(image_paths[i], record=False)
+
+    done, count = 0, len(image_paths) * repeat
+    for _ in range(repeat):
+        for path in image_paths:
+            process(path, record=True)
+            done += 1
+            if progress:
+                progress(done, count)
+    pipeline.loop.close()
+
+    stages = recorder.to_dict()
+    net = detector.net
+    return {
+        'schema': BENCH_SCHEMA,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'dentescope_version': __version__,
+        'git': git_revision(),
+        'environment': environment(),
+        'device': device,
+        'corpus': corpus_fingerprint(image_paths),
+        'model': {
+            'path': str(model_path),
+            'sha256': file_sha256(model_path),
+            'imgsz': detector.imgsz,
+            'parameters': sum(p.numel() for p in net.parameters()),
+        },
+        'settings': {'warmup': warmup, 'repeat': repeat, 'conf': conf, 'iou': iou},
+        'load': {k: round(v, 3) for k, v in load.items()},
+        'stages': stages,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'targets': check_targets(stages),
+    }
+
+
+def check_targets(stages: dict) -> dict:
+    return {stage: {'target_ms': target, 'p90_ms': stages[stage]['latency_ms']['p90'],
+                    'met': stages[stage]['latency_ms']['p90'] <= target}
+            for stage, target in TARGETS_MS.items() if stage in stages}
+
+
+def runs_dir() -> Path:
+    return default_cache_dir() / 'bench' / 'runs'
+
+
+def resolve_result(ref: str) -> Path:
+    """A result path, a baseline name in benchmarks/, or 'last' (latest run)"""
+    if ref == 'last':
+        runs = sorted(runs_dir().glob('bench_*.json'))
+        if not runs:
+            raise FileNotFoundError("No benchmark runs yet; use the run command first")
+        return runs[-1]
+    path = Path(ref)
+    if path.suffix == '.json' or path.exists():
+        return path
+    return BASELINE_DIR / f"{ref}.json"
+
+
+def load_result(ref: str) -> dict:
+    with open(resolve_result(ref)) as f:
+        result = json.load(f)
+    if result.get('schema') != BENCH_SCHEMA:
+        raise ValueError(f"{ref}: benchmark schema {result.get('schema')}, expected {BENCH_SCHEMA}")
+    return result
+
+
+def save_result(result: dict, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+        f.write('\n')
+    return path
+
+
+def comparability(base: dict, new: dict) -> List[str]:
+    """Differences that make a timing diff apples-to-oranges"""
+    warnings = []
+    for label, a, b in [
+        ('corpus', base['corpus']['sha1'], new['corpus']['sha1']),
+        ('model', base['model']['sha256'], new['model']['sha256']),
+        ('device', base['device'], new['device']),
+        ('settings', base['settings'], new['settings']),
+    ] + [(f"environment.{key}", base['environment'].get(key), new['environment'].get(key))
+         for key in ('cpu', 'cpu_count', 'torch_threads', 'torch', 'ultralytics', 'opencv')]:
+        if a != b:
+            warnings.append(f"{label} differs ({a} -> {b})" if not isinstance(a, str) or len(a) < 40
+                            else f"{label} differs")
+    return warnings
+
+
+def diff_results(base: dict, new: dict, tolerance: float = DEFAULT_TOLERANCE) -> dict:
+    """
+    Per-stage latency and memory change from base to new.
+
+    A stage regresses (or improves) when its p50 or p90 moves by more than
+    tolerance and by more than MIN_CHANGE_MS; memory when peak growth
+    moves by more than tolerance and MIN_CHANGE_MB.
+    """
+    rows, regressions, improvements = [], [], []
+    for stage in list(STAGES) + ['total']:
+        if stage not in base['stages'] or stage not in new['stages']:
+            continue
+        a, b = base['stages'][stage], new['stages'][stage]
+        row = {'stage': stage}
+        for key in ('p50', 'p90', 'mean'):
+            old, cur = a['latency_ms'][key], b['latency_ms'][key]
+            row[key] = (old, cur, cur / old - 1 if old else 0.0)
+            if key == 'mean':
+                continue
+            if abs(cur - old) > MIN_CHANGE_MS and abs(row[key][2]) > tolerance:
+                (regressions if cur > old else improvements).append(f"{stage} {key} {row[key][2]:+.0%}")
+        old, cur = a['peak_growth_mb'], b['peak_growth_mb']
+        row['peak_growth_mb'] = (old, cur)
+        if abs(cur - old) > MIN_CHANGE_MB and abs(cur - old) > tolerance * max(old, 1.0):
+            (regressions if cur > old else improvements).append(f"{stage} memory {cur - old:+.0f} MB")
+        rows.append(row)
+    return {'rows': rows, 'regressions': regressions, 'improvements': improvements,
+            'warnings': comparability(base, new),
+            'peak_rss_mb': (base['peak_rss_mb'], new['peak_rss_mb'])}
+
+
+def describe(result: dict) -> str:
+    git = result['git']
+    commit = (git['commit'] or 'unknown')[:10] + ('+dirty' if git['dirty'] else '')
+    return (f"{result['created']} @ {commit}, {result['corpus']['images']} images, "
+            f"{Path(result['model']['path']).name}, {result['device']} x{result['environment']['torch_threads']}")
+
+
+def print_result(result: dict):
+    print(f"\n{'stage':<12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'share':>8}"
+          f"{'ΔRSS MB':>10}{'peak+ MB':>10}")
+    print("-" * 80)
+    for stage, data in result['stages'].items():
+        latency = data['latency_ms']
+        print(f"{stage:<12}{latency['p50']:>10.2f}{latency['p90']:>10.2f}{latency['p99']:>10.2f}"
+              f"{latency['mean']:>10.2f}{data['share']:>8.1%}{data['rss_delta_mb']:>10.1f}"
+              f"{data['peak_growth_mb']:>10.1f}")
+    print(f"\n   Model load: {result['load']['seconds']:.2f}s, +{result['load']['rss_mb']:.0f} MB RSS; "
+          f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    for stage, target in result['targets'].items():
+        mark = '✅' if target['met'] else '❌'
+        print(f"   {mark} {stage} p90 {target['p90_ms']:.1f} ms (target <{target['target_ms']:g} ms)")
+
+
+def print_diff(diff: dict, base_label: str, new_label: str):
+    print(f"   base: {base_label}")
+    print(f"   new:  {new_label}")
+    for warning in diff['warnings']:
+        print(f"   ⚠️  {warning}")
+    print(f"\n{'stage':<12}{'p50 ms':>22}{'p90 ms':>22}{'mean':>9}{'peak+ MB':>16}")
+    print("-" * 81)
+    for row in diff['rows']:
+        cells = ''.join(f"{old:>8.2f} → {cur:<7.2f}{change:>+5.0%}" for old, cur, change in
+                        (row['p50'], row['p90']))
+        old, cur = row['peak_growth_mb']
+        print(f"{row['stage']:<12}{cells}{row['mean'][2]:>+9.0%}{old:>8.0f} → {cur:<6.0f}")
+    old, cur = diff['peak_rss_mb']
+    print(f"\n   Peak RSS: {old:.0f} → {cur:.0f} MB")
+    if diff['improvements']:
+        print(f"   🚀 Faster: {', '.join(diff['improvements'])}")
+    if diff['regressions']:
+        print(f"   ❌ Regressions: {', '.join(diff['regressions'])}")
+    else:
+        print("   ✅ No regressions")
+
+
+def list_baselines():
+    baselines = sorted(BASELINE_DIR.glob('*.json'))
+    if not baselines:
+        print(f"No baselines in {BASELINE_DIR} (save one with: run --save NAME)")
+    for path in baselines:
+        try:
+            print(f"   {path.stem:<24} {describe(load_result(str(path)))}")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"   {path.stem:<24} unreadable: {e}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='DenteScope AI - Pipeline Benchmark')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='Benchmark the pipeline stage by stage')
+    corpus = p.add_mutually_exclusive_group()
+    corpus.add_argument('--images', default=str(REPO_ROOT / 'data' / 'raw'), help='Corpus directory')
+    corpus.add_argument('--synthetic', type=int, metavar='N', help='Use N generated images instead')
+    p.add_argument('--limit', type=int, help='Use only the first N corpus images')
+    p.add_argument('--model', default='runs/train/tooth_detection/weights/best.pt',
+                   help='Detector checkpoint or registry name')
+    p.add_argument('--device', default='cpu', help="Torch device (default 'cpu')")
+    p.add_argument('--threads', type=int, help='Torch intra-op threads')
+    p.add_argument('--warmup', type=int, default=3, help='Untimed warm-up images')
+    p.add_argument('--repeat', type=int, default=1, help='Passes over the corpus')
+    p.add_argument('--conf', type=float, default=0.25, help='Confidence threshold')
+    p.add_argument('--iou', type=float, default=0.7, help='NMS IoU threshold')
+    p.add_argument('--seed', type=int, default=0, help='Synthetic corpus seed')
+    p.add_argument('--save', metavar='NAME', help='Also store as baseline benchmarks/NAME.json')
+    p.add_argument('--baseline', metavar='REF', help='Diff against this result afterwards')
+    p.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Relative change to flag')
+
+    p = sub.add_parser('diff', help='Compare two benchmark results')
+    p.add_argument('base', help="Baseline name, result path or 'last'")
+    p.add_argument('new', nargs='?', default='last', help="Result to compare (default: last run)")
+    p.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Relative change to flag')
+    p.add_argument('--json', action='store_true', help='Print the diff as JSON')
+
+    sub.add_parser('list', help='List stored baselines')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        list_baselines()
+        return 0
+
+    if args.command == 'diff':
+        base, new = load_result(args.base), load_result(args.new)
+        diff = diff_results(base, new, args.tolerance)
+        if args.json:
+            print(json.dumps(diff, indent=2))
+        else:
+            print_diff(diff, describe(base), describe(new))
+        return 1 if diff['regressions'] else 0
+
+    source = synthetic_corpus(args.synthetic, args.seed) if args.synthetic else Path(args.images)
+    images = list_images(source)[:args.limit]
+    if not images:
+        print(f"❌ No images in {source}")
+        return 1
+    args.model = resolve(args.model)
+    if not Path(args.model).exists():
+        print(f"❌ Model not found: {args.model}")
+        return 1
+
+    print("=" * 80)
+    print("⏱️  DenteScope AI - Pipeline Benchmark")
+    print("=" * 80)
+    print(f"   Corpus: {source} ({len(images)} images x {args.repeat})")
+    print(f"   Model: {args.model} on {args.device}")
+
+    def progress(done, total):
+        print(f"\r   {done}/{total} images", end='' if done < total else '\n', flush=True)
+
+    result = run_benchmark(images, args.model, args.device, args.threads, args.warmup,
+                           args.repeat, args.conf, args.iou, progress)
+    result['corpus']['source'] = 'synthetic' if args.synthetic else str(source)
+    print_result(result)
+
+    path = save_result(result, runs_dir() / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    print(f"\n📁 Result: {path}")
+    if args.save:
+        saved = save_result(result, Path(args.save) if args.save.endswith('.json')
+                            else BASELINE_DIR / f"{args.save}.json")
+        print(f"📌 Baseline saved: {saved}")
+
+    if args.baseline:
+        print()
+        base = load_result(args.baseline)
+        diff = diff_results(base, result, args.tolerance)
+        print_diff(diff, describe(base), describe(result))
+        return 1 if diff['regressions'] else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+"""
+DenteScope AI - Command Line
+One entry point for the repo's tools: python -m dentescope <command> [args]
+
+The top-level parser only knows command names and one-line help. A
+command's module is imported when that command runs, and its own
+argparse parser handles the remaining arguments, so `dentescope scan`
+or `dentescope merge` never load torch, ultralytics, pandas or
+matplotlib, and shell pipelines can call them cheaply:
+
+    python -m dentescope scan data/raw --json | ...
+    python -m dentescope merge --output results/batch
+    python -m dentescope report results/widths/tooth_width_analysis.csv --formats stats
+
+Every tool also keeps working as a standalone script.
+"""
+
+import importlib
+import sys
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+class Command(NamedTuple):
+    """A subcommand: 'package.module:function' or 'path/to/script.py:function' plus fixed leading args"""
+    target: str
+    help: str
+    prefix: Tuple[str, ...] = ()
+
+
+COMMANDS: Dict[str, Command] = {
+    # Data
+    'scan': Command('dentescope.scanner:main', 'Index a corpus (sizes, dimensions, hashes)'),
+    'dedupe': Command('dentescope.dedupe:main', 'Group near-duplicate images', ('dedupe',)),
+    'leakage': Command('dentescope.dedupe:main', 'Near-duplicates across train/val/test', ('leakage',)),
+    'download': Command('dentescope.download:main', 'Download sample X-rays'),
+    'prepare': Command('prepare_data.py:main', 'Split images into a YOLO dataset'),
+    # Training
+    'train': Command('train_tooth_model.py:main', 'Train the tooth detector'),
+    'train-simple': Command('train_model.py:main', 'Minimal tooth detector training'),
+    'sweep': Command('sweep.py:main', 'Hyperparameter sweep'),
+    'pathology-train': Command('pathology-detection/train_pathology_model.py:main',
+                               'Train or clinically validate the pathology model'),
+    # Inference and reports
+    'predict': Command('predict.py:main', 'Detect teeth in X-rays'),
+    'batch': Command('examples/batch_process.py:main', 'Batch width measurement (sharded)'),
+    'merge': Command('examples/batch_process.py:merge_main', 'Merge batch shards into one report'),
+    'widths': Command('width-analysis/analyze_tooth_widths.py:main', 'Tooth width analysis with reports'),
+    'report': Command('width-analysis/analyze_tooth_widths.py:report_main',
+                      'Re-render width reports from a measurements CSV'),
+    'pathology': Command('pathology-detection/detect_pathology.py:main', 'Pathology analysis'),
+    'compare': Command('examples/compare_models.py:main', 'Compare detection models'),
+    'bench': Command('dentescope.bench:main', 'Per-stage pipeline benchmark'),
+    'models': Command('dentescope.registry:main', 'Model registry (list, add, verify, ...)'),
+}
+
+
+def load_target(target: str):
+    """Import a command's module (by dotted name or script path) and return its function"""
+    module_name, function = target.rsplit(':', 1)
+    if module_name.endswith('.py'):
+        # Import scripts by file stem with their directory on sys.path (which
+        # spawn-started workers inherit), so functions sent to process pools
+        # unpickle in the workers
+        path = REPO_ROOT / module_name
+        if str(path.parent) not in sys.path:
+            sys.path.insert(0, str(path.parent))
+        module_name = path.stem
+    return getattr(importlib.import_module(module_name), function)
+
+
+def _usage() -> str:
+    width = max(len(name) for name in COMMANDS)
+    lines = ['usage: dentescope <command> [args]', '', 'commands:']
+    lines += [f"  {name:<{width}}  {command.help}" for name, command in COMMANDS.items()]
+    lines += ['', "Run 'dentescope <command> --help' for a command's options."]
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print(_usage())
+        return 0
+    name, rest = argv[0], argv[1:]
+    command = COMMANDS.get(name)
+    if command is None:
+        print(f"dentescope: unknown command '{name}'\n\n{_usage()}", file=sys.stderr)
+        return 2
+
+    # Parsers default their prog to sys.argv[0]; show the command instead
+    # (commands with a prefix name their own sub-parser after it)
+    prog = 'dentescope' if command.prefix else f"dentescope {name}"
+    sys.argv = [prog, *command.prefix, *rest]
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    result = load_target(command.target)([*command.prefix, *rest])
+    return result if isinstance(result, int) else 0
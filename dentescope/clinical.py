@@ -0,0 +1,308 @@
+"""
+DenteScope AI - Clinical Validation Metrics
+Streaming per-class detection and per-study metrics for pathology models
+
+Two views of the same predictions:
+
+    lesion level  every predicted box is matched to a labeled box of the
+                  same class (IoU >= iou); precision/recall curves and AP.
+    study level   "does this X-ray show class c?": the study's score for c
+                  is its highest-scoring box of class c. Gives ROC AUC and
+                  sensitivity, specificity, PPV and NPV at operating points.
+
+plus a multi-class confusion matrix (lesions, background included) at the
+reporting confidence.
+
+ClinicalMetrics.update() is called once per batch of studies. Lesion
+matches go into fixed score histograms (classes x SCORE_BINS), so memory
+does not grow with the number of boxes. Study scores go into arrays
+preallocated for the whole test set. compute() derives every curve from
+cumulative sums over those arrays in one vectorized pass.
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from dentescope.matching import match_boxes, pack_boxes
+
+SCORE_BINS = 1000
+CURVE_POINTS = 101
+
+# Study-level targets from the pathology README (sensitivity, specificity),
+# by class-name prefix
+CLINICAL_TARGETS = {
+    "cavity_": (0.90, 0.85),
+    "bone_loss_": (0.85, 0.80),
+    "infection": (0.95, 0.90),
+    "root_canal": (0.80, 0.85),
+}
+
+
+def target_for(name: str):
+    """(sensitivity, specificity) target of a class, or None"""
+    for prefix, target in CLINICAL_TARGETS.items():
+        if name.startswith(prefix):
+            return target
+    return None
+
+
+def _ratio(num, den):
+    """Elementwise num / den with NaN where den is 0"""
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def _value(x) -> Optional[float]:
+    """JSON-friendly float (None for NaN)"""
+    x = float(x)
+    return None if np.isnan(x) else round(x, 6)
+
+
+class ClinicalMetrics:
+    """
+    Streaming accumulator for pathology validation.
+
+    Args:
+        names: Class names, index = class id
+        n_studies: Number of studies in the test set (sizes the study arrays)
+        iou: Minimum IoU for a lesion to count as found
+        conf: Reporting confidence (confusion matrix and default operating point)
+    """
+
+    def __init__(self, names: Sequence[str], n_studies: int, iou: float = 0.5, conf: float = 0.25):
+        self.names = list(names)
+        self.iou = iou
+        self.conf = conf
+        n_classes = len(self.names)
+        self.tp_hist = np.zeros((n_classes, SCORE_BINS), dtype=np.int64)
+        self.fp_hist = np.zeros((n_classes, SCORE_BINS), dtype=np.int64)
+        self.lesions = np.zeros(n_classes, dtype=np.int64)
+        self.study_scores = np.zeros((n_studies, n_classes), dtype=np.float32)
+        self.study_truth = np.zeros((n_studies, n_classes), dtype=bool)
+        self.study_seen = np.zeros(n_studies, dtype=bool)
+        # Rows: labeled class (last = background), columns: predicted class
+        self.confusion = np.zeros((n_classes + 1, n_classes + 1), dtype=np.int64)
+
+    def update(self, study_ids: Sequence[int], truths: Sequence, predictions: Sequence):
+        """
+        Add a batch of studies.
+
+        Args:
+            study_ids: Row of each study in the test set
+            truths: Per study, (boxes N x 4 xyxy, classes N)
+            predictions: Per study, (boxes M x 4 xyxy, scores M, classes M)
+        """
+        n_classes = len(self.names)
+        study_ids = np.asarray(study_ids, dtype=np.int64)
+        self.study_seen[study_ids] = True
+
+        gt_classes = [np.asarray(c, dtype=np.int64) for _, c in truths]
+        pred_classes = [np.asarray(c, dtype=np.int64) for _, _, c in predictions]
+        pred_scores = [np.asarray(s, dtype=np.float32) for _, s, _ in predictions]
+        # Shift every class into its own coordinate range so one IoU match is class-aware
+        extent = max([float(np.max(b, initial=0)) for b, _ in truths]
+                     + [float(np.max(b, initial=0)) for b, _, _ in predictions]) + 1.0
+        gt = pack_boxes([np.asarray(b, np.float32) + (c * extent)[:, None]
+                         for (b, _), c in zip(truths, gt_classes)])
+        pred = pack_boxes([(np.asarray(b, np.float32) + (c * extent)[:, None], s)
+                           for (b, _, _), s, c in zip(predictions, pred_scores, pred_classes)])
+        match = match_boxes(gt, pred, self.iou)
+
+        valid = pred.valid
+        tp = np.zeros(valid.shape, dtype=bool)
+        tp[match.image, match.index_b] = True
+        cls = np.zeros(valid.shape, dtype=np.int64)
+        for i, c in enumerate(pred_classes):
+            cls[i, :len(c)] = c
+        bins = np.minimum((pred.scores * SCORE_BINS).astype(np.int64), SCORE_BINS - 1)
+        flat = (cls * SCORE_BINS + bins)[valid]
+        size = n_classes * SCORE_BINS
+        self.tp_hist += np.bincount(flat, weights=tp[valid], minlength=size).astype(np.int64).reshape(n_classes, -1)
+        self.fp_hist += np.bincount(flat, weights=~tp[valid], minlength=size).astype(np.int64).reshape(n_classes, -1)
+        all_gt = np.concatenate(gt_classes) if gt_classes else np.zeros(0, np.int64)
+        self.lesions += np.bincount(all_gt, minlength=n_classes)
+
+        # Study level: highest score per class, presence of each labeled class
+        rows = np.repeat(study_ids, [len(c) for c in pred_classes])
+        if len(rows):
+            np.maximum.at(self.study_scores, (rows, np.concatenate(pred_classes)), np.concatenate(pred_scores))
+        rows = np.repeat(study_ids, [len(c) for c in gt_classes])
+        self.study_truth[rows, all_gt] = True
+
+        # Confusion matrix at the reporting confidence, matched regardless of class
+        kept = [s >= self.conf for s in pred_scores]
+        gt_plain = pack_boxes([np.asarray(b, np.float32) for b, _ in truths])
+        pred_plain = pack_boxes([np.asarray(b, np.float32)[k] for (b, _, _), k in zip(predictions, kept)])
+        plain = match_boxes(gt_plain, pred_plain, self.iou)
+        gt_cls = np.full(gt_plain.valid.shape, n_classes, dtype=np.int64)
+        kept_cls = np.full(pred_plain.valid.shape, n_classes, dtype=np.int64)
+        for i, (c, k) in enumerate(zip(gt_classes, kept)):
+            gt_cls[i, :len(c)] = c
+            kept_cls[i, :int(k.sum())] = pred_classes[i][k]
+        gt_hit = np.zeros(gt_plain.valid.shape, dtype=bool)
+        pred_hit = np.zeros(pred_plain.valid.shape, dtype=bool)
+        gt_hit[plain.image, plain.index_a] = True
+        pred_hit[plain.image, plain.index_b] = True
+        np.add.at(self.confusion, (gt_cls[plain.image, plain.index_a], kept_cls[plain.image, plain.index_b]), 1)
+        np.add.at(self.confusion, (gt_cls[gt_plain.valid & ~gt_hit], n_classes), 1)
+        np.add.at(self.confusion, (n_classes, kept_cls[pred_plain.valid & ~pred_hit]), 1)
+
+    def _lesion_metrics(self) -> dict:
+        """PR curves and AP per class from the score histograms"""
+        # Cumulative counts from the highest score bin down: index k = score >= 1 - (k + 1) / SCORE_BINS
+        tp = np.cumsum(self.tp_hist[:, ::-1], axis=1)
+        fp = np.cumsum(self.fp_hist[:, ::-1], axis=1)
+        recall = _ratio(tp, self.lesions[:, None])
+        precision = _ratio(tp, tp + fp)
+        precision = np.nan_to_num(precision, nan=0.0)
+        # AP as ultralytics computes it: precision envelope (best precision at any
+        # recall >= r, 1 at r = 0), interpolated at 101 recall points
+        n_classes = len(self.names)
+        mrec = np.hstack([np.zeros((n_classes, 1)), np.nan_to_num(recall, nan=0.0), np.ones((n_classes, 1))])
+        mpre = np.hstack([np.ones((n_classes, 1)), precision, np.zeros((n_classes, 1))])
+        envelope = np.maximum.accumulate(mpre[:, ::-1], axis=1)[:, ::-1]
+        grid = np.linspace(0, 1, 101)
+        interpolated = np.stack([np.interp(grid, mrec[c], envelope[c]) for c in range(n_classes)])
+        areas = ((interpolated[:, 1:] + interpolated[:, :-1]) * np.diff(grid)).sum(axis=1) / 2
+        ap = np.where(self.lesions > 0, areas, np.nan)
+
+        thresholds = 1.0 - (np.arange(SCORE_BINS) + 1) / SCORE_BINS
+        points = np.linspace(0, SCORE_BINS - 1, CURVE_POINTS).round().astype(int)
+        at_conf = min(int((1.0 - self.conf) * SCORE_BINS + 1e-9), SCORE_BINS) - 1
+        results = {}
+        for c, name in enumerate(self.names):
+            results[name] = {
+                "lesions": int(self.lesions[c]),
+                "predictions": int(tp[c, -1] + fp[c, -1]),
+                "ap50" if self.iou == 0.5 else "ap": _value(ap[c]),
+                "precision": _value(precision[c, at_conf]) if at_conf >= 0 else None,
+                "recall": _value(recall[c, at_conf]) if at_conf >= 0 else None,
+                "pr_curve": {
+                    "threshold": [round(float(t), 4) for t in thresholds[points]],
+                    "precision": [_value(v) for v in precision[c, points]],
+                    "recall": [_value(v) for v in recall[c, points]],
+                },
+            }
+        return {"per_class": results, "map": _value(np.nanmean(ap)) if np.isfinite(ap).any() else None}
+
+    def _study_metrics(self, sensitivities: Sequence[float]) -> dict:
+        """ROC AUC and operating points per class from the study arrays"""
+        scores = self.study_scores[self.study_seen]
+        truth = self.study_truth[self.study_seen]
+        n = len(scores)
+        results = {}
+        for c, name in enumerate(self.names):
+            order = np.argsort(-scores[:, c], kind='stable')
+            s, t = scores[order, c], truth[order, c]
+            positives = int(t.sum())
+            negatives = n - positives
+            # ROC points at each distinct score (last index of every run of ties)
+            last = np.r_[np.nonzero(np.diff(s))[0], n - 1] if n else np.zeros(0, np.int64)
+            tps = np.cumsum(t)[last]
+            fps = (last + 1) - tps
+            tpr = np.r_[0.0, _ratio(tps, positives)]
+            fpr = np.r_[0.0, _ratio(fps, negatives)]
+            auc = float((np.diff(fpr) * (tpr[1:] + tpr[:-1])).sum() / 2) if positives and negatives else float('nan')
+
+            def point(index, label):
+                """Operating point predicting positive for scores >= s[last[index]]"""
+                if index is None:
+                    tp_, fp_, threshold = 0, 0, None
+                else:
+                    tp_, fp_, threshold = int(tps[index]), int(fps[index]), float(s[last[index]])
+                fn_, tn_ = positives - tp_, negatives - fp_
+                return {
+                    "operating_point": label,
+                    "reachable": True,
+                    "threshold": None if threshold is None else round(threshold, 4),
+                    "sensitivity": _value(_ratio(tp_, positives)),
+                    "specificity": _value(_ratio(tn_, negatives)),
+                    "ppv": _value(_ratio(tp_, tp_ + fp_)),
+                    "npv": _value(_ratio(tn_, tn_ + fn_)),
+                    "confusion": {"tp": tp_, "fp": fp_, "fn": fn_, "tn": tn_},
+                }
+
+            # Scores of 0 mean "no box of this class": never a positive call
+            callable_ = s[last] > 0 if n else np.zeros(0, bool)
+            points = []
+            above = np.nonzero(callable_ & (s[last] >= self.conf))[0]
+            points.append(point(above[-1] if len(above) else None, f"conf>={self.conf}"))
+            sensitivity = _ratio(tps, positives)
+            for target in sensitivities:
+                reach = np.nonzero(callable_ & (sensitivity >= target))[0]
+                if len(reach):
+                    points.append(point(reach[0], f"sensitivity>={target}"))
+                else:
+                    # No threshold gets there: report it, not the "call nothing" point
+                    points.append({"operating_point": f"sensitivity>={target}", "reachable": False,
+                                   "threshold": None, "sensitivity": None, "specificity": None,
+                                   "ppv": None, "npv": None, "confusion": None})
+            youden = sensitivity + (1.0 - _ratio(fps, negatives)) - 1.0
+            youden = np.where(callable_, np.nan_to_num(youden, nan=-1.0), -1.0)
+            points.append(point(int(youden.argmax()) if len(youden) and youden.max() > -1 else None, "youden"))
+
+            target = target_for(name)
+            default = points[0]
+            results[name] = {
+                "positive_studies": positives,
+                "negative_studies": negatives,
+                "auc": _value(auc),
+                "operating_points": points,
+                "target": None if target is None else {
+                    "sensitivity": target[0], "specificity": target[1],
+                    # None when the test set has no positive (or no negative) studies of the class
+                    "met": None if default["sensitivity"] is None or default["specificity"] is None
+                    else default["sensitivity"] >= target[0] and default["specificity"] >= target[1],
+                },
+            }
+        aucs = np.array([r["auc"] for r in results.values() if r["auc"] is not None])
+        return {"studies": int(n), "per_class": results,
+                "mean_auc": _value(aucs.mean()) if len(aucs) else None}
+
+    def compute(self, sensitivities: Sequence[float] = (0.90, 0.95)) -> dict:
+        """
+        All metrics as a JSON-serializable dict.
+
+        Args:
+            sensitivities: Study-level sensitivity targets to find thresholds for
+
+        Returns:
+            {'lesion': ..., 'study': ..., 'confusion_matrix': ...}
+        """
+        return {
+            "iou": self.iou,
+            "conf": self.conf,
+            "lesion": self._lesion_metrics(),
+            "study": self._study_metrics(sensitivities),
+            "confusion_matrix": {
+                "labels": self.names + ["background"],
+                "rows": "labeled",
+                "columns": "predicted",
+                "matrix": self.confusion.tolist(),
+            },
+        }
+
+
+def format_summary(metrics: dict) -> List[str]:
+    """Per-class text table of the headline numbers"""
+    lines = [f"{'class':<20} {'lesions':>7} {'AP50':>6} {'studies+':>8} {'AUC':>6} "
+             f"{'sens':>6} {'spec':>6}  target"]
+
+    def fmt(x):
+        return f"{x:6.3f}" if x is not None else f"{'-':>6}"
+
+    for name, lesion in metrics["lesion"]["per_class"].items():
+        study = metrics["study"]["per_class"][name]
+        default = study["operating_points"][0]
+        target = study["target"]
+        mark = "" if target is None or target["met"] is None else ("✅" if target["met"] else "❌")
+        lines.append(f"{name:<20} {lesion['lesions']:>7} {fmt(lesion.get('ap50', lesion.get('ap')))} "
+                     f"{study['positive_studies']:>8} {fmt(study['auc'])} {fmt(default['sensitivity'])} "
+                     f"{fmt(default['specificity'])}  {mark}")
+        for unreachable in (p for p in study["operating_points"] if not p["reachable"]):
+            lines.append(f"{'':<20} {unreachable['operating_point']}: unreachable")
+    return lines
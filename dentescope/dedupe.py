@@ -0,0 +1,428 @@
+"""
+DenteScope AI - Near-Duplicate Detection
+Perceptual-hash index for deduplicating X-rays and checking split leakage
+
+Every image gets two 64-bit perceptual hashes, stored as packed uint64:
+    dHash   sign of horizontal gradients on a 9x8 thumbnail (fast, robust
+            to brightness/contrast changes and re-encoding)
+    pHash   sign of the low-frequency 8x8 DCT block of a 32x32 thumbnail
+            against its median (robust to mild blur and noise)
+Images are decoded at reduced resolution (JPEG DCT scaling) in a thread
+pool, and hashes are cached per file (size + mtime), so re-runs only hash
+new or changed files.
+
+Near-duplicate pairs are found with multi-index hashing: split the 64 bits
+into m chunks; two hashes within Hamming distance t differ by at most
+t // m bits in some chunk. Each chunk is sorted once and probed with every
+key within that radius (searchsorted, no Python loops over images), and
+the candidates are checked with a vectorized popcount of XORed uint64s.
+
+Commands (python -m dentescope.dedupe):
+    dedupe <dir>       group near-duplicates, pick a keeper per group,
+                       optionally move the rest aside
+    leakage <dataset>  report near-duplicates that span train/val/test
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np  # imported where used, so --help and usage errors start fast
+
+from dentescope.metadata import parse_filename
+from dentescope.scanner import default_cache_dir, scan_images
+
+HASH_VERSION = 1
+DEFAULT_THRESHOLD = 6
+SPLITS = ('train', 'val', 'test')
+
+# Candidate pairs expanded at once (bounds memory for huge identical groups)
+MAX_BLOCK_ELEMENTS = 16_000_000
+# Chunks up to this width use a direct bucket table (2^bits entries)
+MAX_TABLE_BITS = 24
+
+
+@lru_cache(maxsize=None)
+def _popcount_table():
+    import numpy as np
+    return np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Bit count of each uint64 (numpy >= 2 ufunc, byte lookup table otherwise)"""
+    import numpy as np
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.uint8)
+    as_bytes = values.astype(np.uint64).view(np.uint8).reshape(-1, 8)
+    return _popcount_table()[as_bytes].sum(axis=1, dtype=np.uint8)
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    import numpy as np
+    return int(np.packbits(bits.astype(np.uint8).ravel()).view('>u8')[0])
+
+
+def image_hashes(path) -> Optional[tuple]:
+    """(dhash, phash) of an image as Python ints, or None if it can't be read"""
+    import numpy as np
+    import cv2  # only needed for files not in the hash cache
+
+    gray = cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    dhash = _pack_bits(small[:, 1:] > small[:, :-1])
+
+    thumb = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(thumb)[:8, :8]
+    phash = _pack_bits(low > np.median(low.ravel()[1:]))  # median without the DC term
+    return dhash, phash
+
+
+class HashIndex(NamedTuple):
+    """Hashes for a set of images; row i describes paths[i]"""
+    paths: List[str]
+    dhash: np.ndarray  # uint64
+    phash: np.ndarray  # uint64
+
+    def hashes(self, kind: str) -> np.ndarray:
+        return getattr(self, kind)
+
+
+def _cache_path(root, cache_dir=None) -> Path:
+    key = hashlib.sha1(str(Path(root).resolve()).encode()).hexdigest()[:16]
+    return Path(cache_dir or default_cache_dir()) / f'phash-{key}.npz'
+
+
+def build_index(root, recursive: bool = True, workers: Optional[int] = None,
+                cache_dir=None) -> HashIndex:
+    """
+    Perceptual hashes for every image under root, reusing cached hashes.
+
+    Unreadable images are skipped.
+    """
+    import numpy as np
+    records = scan_images(root, recursive=recursive, with_hash=False, cache_dir=cache_dir)
+    cache_path = _cache_path(root, cache_dir)
+
+    cached = {}
+    if cache_path.exists():
+        data = np.load(cache_path)
+        if int(data['version']) == HASH_VERSION:
+            for path, size, mtime, dh, ph in zip(data['paths'].tolist(), data['size'],
+                                                 data['mtime_ns'], data['dhash'], data['phash']):
+                cached[path] = (int(size), int(mtime), dh, ph)
+
+    n = len(records)
+    dhash = np.zeros(n, dtype=np.uint64)
+    phash = np.zeros(n, dtype=np.uint64)
+    ok = np.ones(n, dtype=bool)
+    todo = []
+    for i, record in enumerate(records):
+        hit = cached.get(record.path)
+        if hit is not None and hit[0] == record.size and hit[1] == record.mtime_ns:
+            dhash[i], phash[i] = hit[2], hit[3]
+        else:
+            todo.append(i)
+
+    if todo:
+        # cv2 releases the GIL while decoding and resizing
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for i, result in zip(todo, pool.map(lambda i: image_hashes(records[i].path), todo)):
+                if result is None:
+                    ok[i] = False
+                else:
+                    dhash[i], phash[i] = result
+
+    # Rewrite the cache when files were hashed or deleted ones are still in it
+    current = {record.path for record in records}
+    if todo or any(path not in current for path in cached):
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.stem + f'.tmp{os.getpid()}.npz')
+        np.savez(tmp_path, version=HASH_VERSION,
+                 paths=np.array([r.path for r in records])[ok],
+                 size=np.array([r.size for r in records], dtype=np.int64)[ok],
+                 mtime_ns=np.array([r.mtime_ns for r in records], dtype=np.int64)[ok],
+                 dhash=dhash[ok], phash=phash[ok])
+        os.replace(tmp_path, cache_path)
+
+    return HashIndex([r.path for r, good in zip(records, ok) if good], dhash[ok], phash[ok])
+
+
+def concat_indexes(indexes: Sequence[HashIndex]) -> HashIndex:
+    import numpy as np
+    return HashIndex([p for index in indexes for p in index.paths],
+                     np.concatenate([index.dhash for index in indexes]),
+                     np.concatenate([index.phash for index in indexes]))
+
+
+def _flip_masks(width: int, radius: int) -> np.ndarray:
+    """Every XOR mask of up to `radius` set bits within `width` bits"""
+    import numpy as np
+    from itertools import combinations
+    masks = [sum(1 << b for b in bits)
+             for r in range(radius + 1) for bits in combinations(range(width), r)]
+    return np.array(masks, dtype=np.uint64)
+
+
+def _plan_chunks(n: int, threshold: int):
+    """
+    Pick the number of chunks m for multi-index search.
+
+    With m chunks, any pair within `threshold` differs by at most
+    threshold // m bits in some chunk, so each chunk is probed with all
+    keys within that radius. Wider chunks mean smaller buckets but more
+    probes; m is chosen to minimize probes + expected candidates.
+    """
+    import numpy as np
+    from math import comb
+    best = None
+    for m in range(1, min(threshold + 1, 64) + 1):
+        width = -(-64 // m)
+        radius = threshold // m
+        probes = sum(comb(width, r) for r in range(radius + 1))
+        cost = m * n * probes * (1 + n / 2.0 ** width)
+        if best is None or cost < best[0]:
+            best = (cost, m, radius)
+    _, m, radius = best
+    bounds = np.linspace(0, 64, m + 1).astype(int)
+    return [(int(lo), int(hi - lo)) for lo, hi in zip(bounds[:-1], bounds[1:])], radius
+
+
+def _close_pairs(hashes, a, b, threshold):
+    """Candidate pairs (a, b) that are within the threshold, as i < j codes"""
+    import numpy as np
+    distance = popcount64(hashes[a] ^ hashes[b])
+    keep = (distance <= threshold) & (a != b)
+    a, b = a[keep], b[keep]
+    return np.minimum(a, b).astype(np.int64) * len(hashes) + np.maximum(a, b)
+
+
+def find_pairs(hashes: np.ndarray, threshold: int = DEFAULT_THRESHOLD):
+    """
+    All pairs of hashes within a Hamming distance.
+
+    Args:
+        hashes: (N,) uint64
+        threshold: Maximum Hamming distance (inclusive)
+
+    Returns:
+        (i, j, distance) arrays with i < j
+    """
+    import numpy as np
+    hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+    n = len(hashes)
+    found = [np.zeros(0, dtype=np.int64)]
+    chunks, radius = _plan_chunks(n, threshold)
+    for shift, width in chunks:
+        keys = (hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        if width <= MAX_TABLE_BITS:
+            # Bucket offsets by direct lookup: cheaper than binary searches
+            bucket_counts = np.bincount(keys.astype(np.int64), minlength=1 << width)
+            bucket_starts = np.cumsum(bucket_counts) - bucket_counts
+        for flip in _flip_masks(width, radius):
+            probe = keys ^ flip
+            if width <= MAX_TABLE_BITS:
+                lo = bucket_starts[probe.astype(np.int64)]
+                counts = bucket_counts[probe.astype(np.int64)]
+            else:
+                lo = np.searchsorted(sorted_keys, probe, side='left')
+                counts = np.searchsorted(sorted_keys, probe, side='right') - lo
+            items = np.flatnonzero(counts)
+            if not len(items):
+                continue
+            # Expand (item, bucket member) pairs in blocks of bounded size
+            ends = np.cumsum(counts[items])
+            block_ids = (ends - 1) // MAX_BLOCK_ELEMENTS
+            for block in np.unique(block_ids):
+                sel = items[block_ids == block]
+                c = counts[sel]
+                a = np.repeat(sel, c)
+                offsets = np.arange(len(a)) - np.repeat(np.cumsum(c) - c, c)
+                b = order[np.repeat(lo[sel], c) + offsets]
+                found.append(_close_pairs(hashes, a, b, threshold))
+
+    codes = np.unique(np.concatenate(found))
+    i, j = codes // n, codes % n
+    return i, j, popcount64(hashes[i] ^ hashes[j])
+
+
+def connected_groups(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Component label (smallest member index) per item, via min-label propagation"""
+    import numpy as np
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, low)
+        np.minimum.at(updated, j, low)
+        updated = updated[updated]  # pointer jumping
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def near_duplicates(index: HashIndex, threshold: int = DEFAULT_THRESHOLD,
+                    kind: str = 'both'):
+    """
+    Near-duplicate pairs in an index.
+
+    kind='both' requires both dHash and pHash to be within the threshold,
+    which removes most look-alike false positives between different patients.
+
+    Returns:
+        (i, j, dhash distance, phash distance)
+    """
+    primary = 'dhash' if kind in ('both', 'dhash') else 'phash'
+    i, j, _ = find_pairs(index.hashes(primary), threshold)
+    d_dist = popcount64(index.dhash[i] ^ index.dhash[j])
+    p_dist = popcount64(index.phash[i] ^ index.phash[j])
+    if kind == 'both':
+        keep = p_dist <= threshold
+        i, j, d_dist, p_dist = i[keep], j[keep], d_dist[keep], p_dist[keep]
+    return i, j, d_dist, p_dist
+
+
+def _keeper_rank(path: str):
+    """Keep the original shot (no '(2)' suffix), then the largest file"""
+    meta = parse_filename(Path(path).name)
+    return (meta.copy if meta else 1, -os.path.getsize(path), path)
+
+
+def duplicate_groups(index: HashIndex, threshold: int = DEFAULT_THRESHOLD,
+                     kind: str = 'both') -> List[List[str]]:
+    """Groups of near-duplicate paths, keeper first"""
+    import numpy as np
+    i, j, _, _ = near_duplicates(index, threshold, kind)
+    labels = connected_groups(len(index.paths), i, j)
+    members = {}
+    for item in np.unique(np.concatenate([i, j])):
+        members.setdefault(int(labels[item]), []).append(index.paths[item])
+    return [sorted(group, key=_keeper_rank) for group in members.values()]
+
+
+def leakage_report(dataset_dir, threshold: int = DEFAULT_THRESHOLD, kind: str = 'both',
+                   workers: Optional[int] = None) -> List[dict]:
+    """
+    Near-duplicate pairs that span different splits of a prepared dataset.
+
+    Supports both the prepare_data layout (images/<split>/) and the
+    <split>/images/ layout used by train_tooth_model.py.
+    """
+    import numpy as np
+    dataset_dir = Path(dataset_dir)
+    split_dirs = [(split, d) for split in SPLITS
+                  for d in (dataset_dir / 'images' / split, dataset_dir / split / 'images')
+                  if d.is_dir()]
+    if not split_dirs:
+        raise ValueError(f"No images/<split> or <split>/images directories in {dataset_dir}")
+
+    # Each image's split is that of the directory it was indexed from; the
+    # path itself may contain train/val/test above the dataset
+    indexes = [build_index(d, workers=workers) for _, d in split_dirs]
+    index = concat_indexes(indexes)
+    splits = np.array([split for (split, _), part in zip(split_dirs, indexes) for _ in part.paths])
+    i, j, d_dist, p_dist = near_duplicates(index, threshold, kind)
+    cross = splits[i] != splits[j]
+    return [
+        {'split_a': splits[a], 'image_a': index.paths[a],
+         'split_b': splits[b], 'image_b': index.paths[b],
+         'dhash_distance': int(dd), 'phash_distance': int(pd)}
+        for a, b, dd, pd in zip(i[cross], j[cross], d_dist[cross], p_dist[cross])
+    ]
+
+
+def _write_csv(rows, path, fields):
+    import csv
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    import argparse
+    import shutil
+    import time
+
+    parser = argparse.ArgumentParser(description='DenteScope AI - Near-Duplicate Detection')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p):
+        p.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD,
+                       help='Max Hamming distance between 64-bit hashes')
+        p.add_argument('--hash', dest='kind', default='both', choices=['both', 'dhash', 'phash'],
+                       help='Hash(es) that must match')
+        p.add_argument('--workers', type=int, help='Hashing threads')
+        p.add_argument('--report', help='Write a CSV report here')
+
+    p = sub.add_parser('dedupe', help='Group near-duplicates in a directory')
+    p.add_argument('root', help='Image directory')
+    p.add_argument('--no-recursive', action='store_true', help='Only the top level')
+    p.add_argument('--move-to', help='Move duplicates (all but the keeper) into this directory')
+    common(p)
+
+    p = sub.add_parser('leakage', help='Report near-duplicates across train/val/test')
+    p.add_argument('dataset', help='Prepared dataset directory')
+    common(p)
+
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+
+    if args.command == 'dedupe':
+        index = build_index(args.root, recursive=not args.no_recursive, workers=args.workers)
+        groups = duplicate_groups(index, args.threshold, args.kind)
+        duplicates = sum(len(g) - 1 for g in groups)
+        print(f"🔍 {len(index.paths)} images, {len(groups)} duplicate groups, "
+              f"{duplicates} duplicates ({time.perf_counter() - start:.2f}s)")
+        for group in groups:
+            print(f"\n   ✓ keep {Path(group[0]).name}")
+            for path in group[1:]:
+                print(f"     ✗ {Path(path).name}")
+        if args.report:
+            _write_csv([{'group': g, 'keep': k == 0, 'image': path}
+                        for g, group in enumerate(groups) for k, path in enumerate(group)],
+                       args.report, ['group', 'keep', 'image'])
+            print(f"\n📄 Report: {args.report}")
+        if args.move_to:
+            target = Path(args.move_to)
+            target.mkdir(parents=True, exist_ok=True)
+            for group in groups:
+                for path in group[1:]:
+                    shutil.move(path, target / Path(path).name)
+            print(f"\n📦 Moved {duplicates} duplicates to {target}")
+        return 0
+
+    leaks = leakage_report(args.dataset, args.threshold, args.kind, args.workers)
+    print(f"🔍 Leakage check for {args.dataset} ({time.perf_counter() - start:.2f}s)")
+    if args.report:
+        _write_csv(leaks, args.report, ['split_a', 'image_a', 'split_b', 'image_b',
+                                        'dhash_distance', 'phash_distance'])
+        print(f"📄 Report: {args.report}")
+    if not leaks:
+        print("✅ No near-duplicates across splits")
+        return 0
+    by_pair = {}
+    for leak in leaks:
+        key = '/'.join(sorted((leak['split_a'], leak['split_b'])))
+        by_pair[key] = by_pair.get(key, 0) + 1
+    print(f"⚠️  {len(leaks)} near-duplicate pairs span splits: "
+          + ', '.join(f"{k}: {v}" for k, v in sorted(by_pair.items())))
+    for leak in leaks[:20]:
+        print(f"   {leak['split_a']}/{Path(leak['image_a']).name} ~ "
+              f"{leak['split_b']}/{Path(leak['image_b']).name} (d={leak['dhash_distance']})")
+    return 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
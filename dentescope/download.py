@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+DenteScope AI - Dataset Downloader
+Concurrent, resumable downloads of sample images from GitHub or a mirror
+
+Sources are listed once and fetched by a bounded thread pool sharing one
+pooled HTTP session. Each file streams to <name>.part in 64 KiB chunks and
+is renamed into place only after its size and hash check out, so an
+interrupted run resumes with a Range request where it stopped.
+
+A .download_state.json in the output directory remembers what was fetched
+(remote SHA, ETag/Last-Modified and the local size/mtime). Re-runs skip a
+file without any request when the listing's SHA is unchanged, or with a
+conditional request (304 Not Modified) against mirrors that only send
+validators.
+
+Supported listings:
+    GitHub contents API   https://api.github.com/repos/<owner>/<repo>/contents/<path>
+    JSON manifest         [{"name", "url" or "download_url", "size"?, "sha"?, "sha256"?}]
+    HTML directory index  e.g. python3 -m http.server on a mirror host
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional
+from urllib.parse import unquote, urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dentescope.scanner import HASH_CHUNK_SIZE, file_sha256, is_image_file
+
+GITHUB_SAMPLES_URL = "https://api.github.com/repos/ajeetraina/dentescope-ai/contents/data/samples"
+STATE_NAME = '.download_state.json'
+STATE_VERSION = 1
+CHUNK_SIZE = 1 << 16        # bytes per write; at most this much is lost on a broken connection
+STATE_SAVE_INTERVAL = 2.0  # seconds between state checkpoints during a run
+
+
+class RemoteFile(NamedTuple):
+    """One file in a remote listing"""
+    name: str
+    url: str
+    size: Optional[int] = None
+    sha: Optional[str] = None      # git blob SHA-1, as reported by the GitHub API
+    sha256: Optional[str] = None   # from a mirror manifest
+
+
+class DownloadError(Exception):
+    """A file failed to download or failed verification"""
+
+
+def git_blob_sha(path) -> str:
+    """Git blob SHA-1 of a local file (what the GitHub contents API reports as 'sha')"""
+    digest = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+
+
+def make_session(pool_size: int = 8, retries: int = 3) -> requests.Session:
+    """Session with a connection pool sized for pool_size threads and retries on 429/5xx"""
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({'GET', 'HEAD'}))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'dentescope-downloader'
+    token = os.environ.get('GITHUB_TOKEN')
+    if token:
+        session.headers['Authorization'] = f"Bearer {token}"
+    return session
+
+
+def list_remote(url: str, session: requests.Session, timeout: float = 30,
+                images_only: bool = True) -> List[RemoteFile]:
+    """
+    List downloadable files at url (GitHub contents API, JSON manifest or HTML index).
+
+    Returns:
+        RemoteFile entries, sorted by name
+    """
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+
+    files = []
+    try:
+        entries = response.json()
+    except ValueError:
+        entries = None
+
+    if isinstance(entries, list):
+        for entry in entries:
+            if entry.get('type', 'file') != 'file':
+                continue
+            file_url = entry.get('download_url') or entry.get('url')
+            files.append(RemoteFile(
+                name=entry['name'],
+                url=urljoin(url, file_url),
+                size=entry.get('size'),
+                sha=entry.get('sha'),
+                sha256=entry.get('sha256')
+            ))
+    else:
+        parser = _LinkParser()
+        parser.feed(response.text)
+        base = url if url.endswith('/') else url + '/'
+        for href in parser.links:
+            file_url = urljoin(base, href)
+            name = unquote(urlparse(file_url).path.rsplit('/', 1)[-1])
+            # Directory index: only direct children, no sub-directories or parent links
+            if not name or not file_url.startswith(base):
+                continue
+            files.append(RemoteFile(name=name, url=file_url))
+
+    if images_only:
+        files = [f for f in files if is_image_file(f.name)]
+    unique = {f.name: f for f in files}
+    return sorted(unique.values(), key=lambda f: f.name)
+
+
+class Downloader:
+    """
+    Fetch RemoteFiles into a directory with a shared session and thread pool.
+
+    Args:
+        output_dir: Destination directory
+        workers: Concurrent downloads
+        session: Shared session (default: make_session(workers))
+        timeout: Connect/read timeout per request in seconds
+        attempts: Tries per file; later tries resume from the partial file
+    """
+
+    def __init__(self, output_dir, workers: int = 8, session: Optional[requests.Session] = None,
+                 timeout: float = 30, attempts: int = 3):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.session = session or make_session(workers)
+        self.timeout = timeout
+        self.attempts = attempts
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self.state = self._load_state()
+
+    # --- state -------------------------------------------------------------
+
+    def _load_state(self) -> dict:
+        path = self.output_dir / STATE_NAME
+        if path.exists():
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+                if state.get('version') == STATE_VERSION:
+                    return state['files']
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def save_state(self):
+        path = self.output_dir / STATE_NAME
+        with self._lock:
+            snapshot = json.dumps({'version': STATE_VERSION, 'files': self.state}, indent=1)
+            self._last_save = time.monotonic()
+        tmp_path = path.with_name(f"{STATE_NAME}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(snapshot)
+        os.replace(tmp_path, path)
+
+    def _record(self, name, entry):
+        with self._lock:
+            if entry is None:
+                self.state.pop(name, None)
+            else:
+                self.state[name] = entry
+            due = time.monotonic() - self._last_save > STATE_SAVE_INTERVAL
+        if due:
+            self.save_state()
+
+    # --- single file ---------------------------------------------------------
+
+    def _unchanged_without_request(self, remote: RemoteFile, path: Path) -> Optional[bool]:
+        """True/False when the listing alone decides; None when the server must be asked"""
+        if not path.exists():
+            return False
+        st = path.stat()
+        entry = self.state.get(remote.name)
+        local_matches = entry is not None and entry.get('local') == [st.st_size, st.st_mtime_ns]
+
+        if remote.size is not None and st.st_size != remote.size:
+            return False
+        if remote.sha or remote.sha256:
+            if local_matches and (entry.get('sha'), entry.get('sha256')) == (remote.sha, remote.sha256):
+                return True
+            # Unknown or touched local file: hash it once instead of downloading
+            if remote.sha and git_blob_sha(path) != remote.sha:
+                return False
+            if remote.sha256 and file_sha256(path) != remote.sha256:
+                return False
+            self._record(remote.name, self._entry(remote, path, entry or {}))
+            return True
+        if local_matches and (entry.get('etag') or entry.get('last_modified')):
+            return None  # ask with a conditional request
+        if remote.size is not None:
+            self._record(remote.name, self._entry(remote, path, entry or {}))
+            return True
+        return None if local_matches else False
+
+    @staticmethod
+    def _entry(remote: RemoteFile, path: Path, validators: dict) -> dict:
+        st = path.stat()
+        return {
+            'url': remote.url,
+            'sha': remote.sha,
+            'sha256': remote.sha256,
+            'etag': validators.get('etag'),
+            'last_modified': validators.get('last_modified'),
+            'local': [st.st_size, st.st_mtime_ns]
+        }
+
+    def fetch(self, remote: RemoteFile) -> str:
+        """
+        Download one file unless the local copy is current.
+
+        Returns:
+            'skipped', 'downloaded' or 'resumed'
+
+        Raises:
+            DownloadError: after all attempts failed or verification failed
+        """
+        path = self.output_dir / remote.name
+        decided = self._unchanged_without_request(remote, path)
+        if decided:
+            return 'skipped'
+        conditional = decided is None
+
+        error = None
+        for attempt in range(self.attempts):
+            try:
+                return self._download(remote, path, conditional)
+            except DownloadError:
+                raise
+            except (requests.RequestException, OSError) as e:
+                error = e
+                time.sleep(min(2 ** attempt, 8) * 0.25)
+        raise DownloadError(f"{remote.name}: {error}")
+
+    def _download(self, remote: RemoteFile, path: Path, conditional: bool) -> str:
+        part = path.with_name(path.name + '.part')
+        offset = part.stat().st_size if part.exists() else 0
+        entry = self.state.get(remote.name, {})
+        partial = entry.get('partial', {})
+
+        headers = {}
+        if offset and partial:
+            headers['Range'] = f"bytes={offset}-"
+            # Only resume if the remote file is still the one the partial came from
+            validator = partial.get('etag') or partial.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+        elif offset:
+            offset = 0  # partial of unknown origin
+        if conditional and not offset:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        with self.session.get(remote.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                self._record(remote.name, {**entry, **self._entry(remote, path, entry)})
+                return 'skipped'
+            if response.status_code == 416 and remote.size is not None and offset >= remote.size:
+                response.close()
+                return self._finish(remote, path, part, entry, partial, resumed=True)
+            response.raise_for_status()
+
+            resumed = response.status_code == 206
+            if resumed and not response.headers.get('Content-Range', '').startswith(f"bytes {offset}-"):
+                resumed = False
+            if not resumed:
+                offset = 0
+            validators = {'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+            partial = validators if not resumed else partial
+            self._record(remote.name, {**entry, 'partial': partial})
+
+            with open(part, 'r+b' if resumed else 'wb') as f:
+                f.seek(offset)
+                f.truncate()
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+
+            expected = remote.size
+            if expected is None and not response.headers.get('Content-Encoding'):
+                length = response.headers.get('Content-Length')
+                expected = offset + int(length) if length is not None else None
+        return self._finish(remote._replace(size=expected), path, part, entry, partial, resumed)
+
+    def _finish(self, remote, path, part, entry, partial, resumed) -> str:
+        size = part.stat().st_size
+        failure = None
+        if remote.size is not None and size != remote.size:
+            if size < remote.size:
+                raise requests.ConnectionError(f"incomplete: {size}/{remote.size} bytes")
+            failure = f"size {size} != {remote.size}"
+        elif remote.sha and git_blob_sha(part) != remote.sha:
+            failure = "SHA-1 mismatch"
+        elif remote.sha256 and file_sha256(part) != remote.sha256:
+            failure = "SHA-256 mismatch"
+        if failure:
+            part.unlink()
+            self._record(remote.name, {k: v for k, v in entry.items() if k != 'partial'} or None)
+            raise DownloadError(f"{remote.name}: {failure}")
+
+        os.replace(part, path)
+        self._record(remote.name, self._entry(remote, path, partial))
+        return 'resumed' if resumed else 'downloaded'
+
+    # --- many files ----------------------------------------------------------
+
+    def fetch_all(self, files: List[RemoteFile],
+                  progress: Optional[Callable[[RemoteFile, str, Optional[Exception]], None]] = None) -> dict:
+        """
+        Fetch files concurrently.
+
+        Args:
+            files: Files from list_remote
+            progress: Called as progress(remote, status, error) when each file finishes
+
+        Returns:
+            Counts per status ('skipped', 'downloaded', 'resumed', 'failed')
+        """
+        counts = dict.fromkeys(['downloaded', 'resumed', 'skipped', 'failed'], 0)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self.fetch, remote): remote for remote in files}
+                for future in as_completed(futures):
+                    remote = futures[future]
+                    try:
+                        status, error = future.result(), None
+                    except DownloadError as e:
+                        status, error = 'failed', e
+                    counts[status] += 1
+                    if progress:
+                        progress(remote, status, error)
+        finally:
+            self.save_state()
+        return counts
+
+
+def download(url: str = GITHUB_SAMPLES_URL, output_dir='./data/raw', workers: int = 8,
+             progress=None) -> dict:
+    """
+    List url and download every image into output_dir.
+
+    Returns:
+        {'files': [RemoteFile], 'counts': {...}}
+    """
+    downloader = Downloader(output_dir, workers=workers)
+    files = list_remote(url, downloader.session, timeout=downloader.timeout)
+    counts = downloader.fetch_all(files, progress)
+    return {'files': files, 'counts': counts}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='DenteScope AI - Dataset Downloader')
+    parser.add_argument('--url', default=os.environ.get('DENTESCOPE_MIRROR', GITHUB_SAMPLES_URL),
+                        help='GitHub contents API URL, JSON manifest or mirror directory '
+                             '(default: $DENTESCOPE_MIRROR or the GitHub samples)')
+    parser.add_argument('--output', default='./data/raw', help='Output directory')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent downloads')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    def report(remote, status, error):
+        if error:
+            print(f"   ❌ {error}")
+
+    result = download(args.url, args.output, args.workers, progress=report)
+    counts = result['counts']
+    icon = '⚠️ ' if counts['failed'] else '✅'
+    print(f"{icon} {len(result['files'])} files in {args.output} ({time.perf_counter() - start:.1f}s): "
+          f"{counts['downloaded']} downloaded, {counts['resumed']} resumed, "
+          f"{counts['skipped']} unchanged, {counts['failed']} failed")
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+"""
+DenteScope AI - Backbone Feature Cache
+Precomputed backbone feature maps for training only the neck and head
+
+With a frozen backbone, every epoch would recompute the same backbone
+outputs for the same (unaugmented) images. This cache runs the backbone
+once per (dataset, imgsz, checkpoint) and stores the feature maps the
+neck reads (for YOLOv8: the outputs of layers 4, 6 and 9), so an epoch
+is only neck + head forward/backward on memory-mapped float16 arrays,
+with no image decoding at all.
+
+Images are letterboxed exactly like dentescope.inference.letterbox_batch,
+the same preprocessing the detectors use at inference time. Labels are
+converted to normalized xywh in the letterboxed square.
+
+Layout of <cache_dir>/features/<key>/:
+    layer<i>.f16  float16 (N, C, H, W) output of backbone layer i
+    labels.npy    float32 (M, 6): image row, class, x, y, w, h
+    meta.json     files, imgsz, layers, checkpoint; written last (marks the cache valid)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from dentescope.inference import decode_images, letterbox_batch
+from dentescope.matching import label_path_for
+from dentescope.scanner import default_cache_dir
+
+CACHE_VERSION = 1
+CACHE_SUBDIR = 'features'
+
+
+def backbone_split(model) -> Tuple[int, List[int]]:
+    """
+    Where a DetectionModel's backbone ends and which of its outputs the rest reads.
+
+    Returns:
+        (number of backbone layers, backbone layer indices consumed by the neck/head)
+    """
+    n = len(model.yaml['backbone'])
+    needed = {n - 1}
+    for layer in model.model[n:]:
+        sources = [layer.f] if isinstance(layer.f, int) else layer.f
+        needed.update(j for j in sources if j != -1 and j < n)
+    return n, sorted(needed)
+
+
+def forward_head(model, features: Dict[int, torch.Tensor], n_backbone: int):
+    """Run layers n_backbone.. of a DetectionModel from cached backbone outputs"""
+    y = [features.get(i) for i in range(n_backbone)]
+    x = features[n_backbone - 1]
+    for layer in model.model[n_backbone:]:
+        if layer.f != -1:
+            x = y[layer.f] if isinstance(layer.f, int) else [x if j == -1 else y[j] for j in layer.f]
+        x = layer(x)
+        y.append(x if layer.i in model.save else None)
+    return x
+
+
+def read_labels(image_path) -> np.ndarray:
+    """(N, 5) class, x, y, w, h rows from the image's YOLO label file (empty if none)"""
+    label_path = label_path_for(image_path)
+    if label_path is None:
+        return np.zeros((0, 5), dtype=np.float32)
+    data = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+    return data[:, :5] if data.size else np.zeros((0, 5), dtype=np.float32)
+
+
+def cache_key(image_files: Sequence, imgsz: int, checkpoint: str) -> str:
+    """Key for an ordered image list, input size and backbone weights (paths, sizes, mtimes)"""
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f"v{CACHE_VERSION}:{imgsz}:{checkpoint}\n".encode())
+    for path in image_files:
+        stat = os.stat(path)
+        label = label_path_for(path)
+        label_stamp = os.stat(label).st_mtime_ns if label else 0
+        digest.update(f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{label_stamp}\n".encode())
+    return f"{imgsz}-{digest.hexdigest()}"
+
+
+class FeatureCache:
+    """
+    Read-only view of built backbone features.
+
+    Batches are returned as float32 tensors plus the label dict that
+    ultralytics' v8DetectionLoss expects.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        with open(self.directory / 'meta.json') as f:
+            self.meta = json.load(f)
+        self.imgsz = self.meta['imgsz']
+        self.layers = {int(i): tuple(shape) for i, shape in self.meta['layers'].items()}
+        n = len(self)
+        self.features = {i: np.memmap(self.directory / f"layer{i}.f16", dtype=np.float16, mode='r',
+                                      shape=(n, *shape)) for i, shape in self.layers.items()}
+        labels = np.load(self.directory / 'labels.npy')
+        # Label rows of image i are labels[starts[i]:starts[i + 1]]
+        self.labels = labels
+        self.starts = np.searchsorted(labels[:, 0], np.arange(n + 1))
+
+    def __len__(self):
+        return len(self.meta['files'])
+
+    def batch(self, indices: Sequence[int], device='cpu'):
+        """(features {layer: float32 tensor}, loss batch dict) for the given image rows"""
+        indices = np.sort(np.asarray(indices))  # sequential reads from the maps
+        features = {i: torch.from_numpy(np.asarray(m[indices], dtype=np.float32)).to(device)
+                    for i, m in self.features.items()}
+        rows = [self.labels[self.starts[i]:self.starts[i + 1]] for i in indices]
+        counts = [len(r) for r in rows]
+        labels = np.concatenate(rows) if rows else np.zeros((0, 6), np.float32)
+        batch = {
+            'batch_idx': torch.from_numpy(np.repeat(np.arange(len(indices)), counts).astype(np.float32)).to(device),
+            'cls': torch.from_numpy(labels[:, 1:2].copy()).to(device),
+            'bboxes': torch.from_numpy(labels[:, 2:6].copy()).to(device),
+        }
+        return features, batch
+
+    @classmethod
+    @torch.inference_mode()
+    def build(cls, model, image_files: Sequence, imgsz: int, checkpoint: str,
+              cache_dir=None, batch_size: int = 16, device='cpu', prefix: str = '') -> Optional['FeatureCache']:
+        """
+        Open the features for these images, running the backbone first if needed.
+
+        Args:
+            model: DetectionModel whose (frozen) backbone produces the features
+            image_files: Ordered image paths (row i = image_files[i])
+            imgsz: Training input size
+            checkpoint: Identifier of the backbone weights (e.g. file hash)
+            cache_dir: Cache root (default: default_cache_dir())
+            batch_size: Images per backbone pass
+            device: Torch device for the backbone pass
+            prefix: Log prefix
+
+        Returns:
+            FeatureCache, or None if there is not enough free disk space
+        """
+        root = Path(cache_dir or default_cache_dir()) / CACHE_SUBDIR
+        directory = root / cache_key(image_files, imgsz, checkpoint)
+        if (directory / 'meta.json').exists():
+            print(f"{prefix}⚡ Using feature cache {directory}")
+            return cls(directory)
+
+        n_backbone, keep = backbone_split(model)
+        backbone = model.model[:n_backbone].to(device).float().eval()
+        probe = torch.zeros(1, 3, imgsz, imgsz, device=device)
+        shapes = {}
+        x = probe
+        for layer in backbone:
+            x = layer(x)
+            if layer.i in keep:
+                shapes[layer.i] = tuple(x.shape[1:])
+
+        n = len(image_files)
+        needed = n * sum(int(np.prod(s)) for s in shapes.values()) * 2
+        root.mkdir(parents=True, exist_ok=True)
+        free = shutil.disk_usage(root).free
+        if needed * 1.05 > free:
+            print(f"{prefix}⚠️  Feature cache needs {needed / 1e9:.1f} GB, only "
+                  f"{free / 1e9:.1f} GB free in {root}")
+            return None
+
+        print(f"{prefix}📦 Caching backbone features of {n} images at {imgsz}px "
+              f"({needed / 1e9:.2f} GB) in {directory}")
+        tmp = root / f"{directory.name}.tmp{os.getpid()}"
+        tmp.mkdir(parents=True, exist_ok=True)
+        try:
+            maps = {i: np.memmap(tmp / f"layer{i}.f16", dtype=np.float16, mode='w+', shape=(n, *s))
+                    for i, s in shapes.items()}
+            labels = []
+            for start in range(0, n, batch_size):
+                paths = image_files[start:start + batch_size]
+                images = decode_images(paths)
+                for path, image in zip(paths, images):
+                    if image is None:
+                        raise FileNotFoundError(f"Image Not Found {path}")
+                tensor, transforms = letterbox_batch(images, imgsz)
+                x = tensor.to(device)
+                for layer in backbone:
+                    x = layer(x)
+                    if layer.i in maps:
+                        maps[layer.i][start:start + len(paths)] = x.cpu().numpy().astype(np.float16)
+                for k, (path, image, (ratio, pad_x, pad_y)) in enumerate(zip(paths, images, transforms)):
+                    rows = read_labels(path)
+                    if not len(rows):
+                        continue
+                    h, w = image.shape[:2]
+                    boxes = rows[:, 1:5].copy()
+                    boxes[:, [0, 2]] *= w * ratio / imgsz
+                    boxes[:, [1, 3]] *= h * ratio / imgsz
+                    boxes[:, 0] += pad_x / imgsz
+                    boxes[:, 1] += pad_y / imgsz
+                    labels.append(np.column_stack([np.full(len(rows), start + k, np.float32),
+                                                   rows[:, :1], boxes]))
+            for m in maps.values():
+                m.flush()
+            del maps
+            np.save(tmp / 'labels.npy', np.concatenate(labels).astype(np.float32) if labels
+                    else np.zeros((0, 6), np.float32))
+            with open(tmp / 'meta.json', 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'imgsz': imgsz, 'checkpoint': checkpoint,
+                           'files': [os.path.abspath(p) for p in image_files],
+                           'layers': {str(i): list(s) for i, s in shapes.items()},
+                           'created': datetime.now().isoformat()}, f)
+            try:
+                os.rename(tmp, directory)
+            except OSError:
+                # Another process finished the same cache first
+                if not (directory / 'meta.json').exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        return cls(directory)
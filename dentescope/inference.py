@@ -0,0 +1,180 @@
+"""
+DenteScope AI - Inference Helpers
+Decode, letterbox and batched YOLO forward passes without the predictor
+
+ultralytics' YOLO.predict() decodes, letterboxes, runs and post-processes
+in one call. These helpers split those steps so callers can decode once,
+batch across images and time every stage separately:
+
+    images = decode_images(paths)
+    tensor, transforms = letterbox_batch(images, model_input_size(model))
+    detections = detect_batch(net, tensor, transforms, shapes, conf, iou)
+
+detect_rois() is the second stage of a cascade: it runs a model only on
+regions of interest (e.g. tooth boxes from the tooth detector) and maps
+the results back to the full image.
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.utils import ops
+
+
+def resolve_device(device: str) -> torch.device:
+    """'cpu', a CUDA index such as '0', or any torch device string"""
+    if device.isdigit():
+        return torch.device(f'cuda:{device}')
+    return torch.device(device)
+
+
+def model_input_size(model, default: int = 640) -> int:
+    """Training image size stored in the checkpoint (falls back to 640)"""
+    args = getattr(model.model, 'args', None) or {}
+    imgsz = args.get('imgsz', default) if isinstance(args, dict) else getattr(args, 'imgsz', default)
+    if isinstance(imgsz, (list, tuple)):
+        imgsz = max(imgsz)
+    return int(imgsz)
+
+
+def load_network(model, device: torch.device):
+    """The checkpoint's nn.Module in eval mode on device (model is a YOLO instance)"""
+    return model.model.to(device).float().eval()
+
+
+def decode_images(paths: list, workers: int = 8) -> list:
+    """Decode a chunk of images once (BGR uint8, OpenCV releases the GIL)"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda p: cv2.imread(str(p), cv2.IMREAD_COLOR), paths))
+
+
+def letterbox_batch(images: list, imgsz: int):
+    """
+    Letterbox decoded images to a square imgsz batch.
+
+    Returns:
+        (float tensor B x 3 x imgsz x imgsz in [0, 1], list of (ratio, pad_x, pad_y))
+    """
+    batch = np.full((len(images), imgsz, imgsz, 3), 114, dtype=np.uint8)
+    transforms = []
+    for i, image in enumerate(images):
+        h, w = image.shape[:2]
+        ratio = min(imgsz / h, imgsz / w)
+        new_w, new_h = round(w * ratio), round(h * ratio)
+        pad_x, pad_y = (imgsz - new_w) // 2, (imgsz - new_h) // 2
+        batch[i, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+            image, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+        )
+        transforms.append((ratio, pad_x, pad_y))
+    # BGR -> RGB, BHWC -> BCHW
+    tensor = torch.from_numpy(np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2)))
+    return tensor.float().div_(255.0), transforms
+
+
+@torch.inference_mode()
+def detect_batch(net, tensor, transforms, shapes, conf: float, iou: float) -> list:
+    """
+    Run one forward pass + NMS and map boxes back to original pixels.
+
+    Returns:
+        List of (xyxy float32 N x 4, confidence float32 N, class int N) per image
+    """
+    preds = ops.non_max_suppression(net(tensor), conf_thres=conf, iou_thres=iou)
+    detections = []
+    for pred, (ratio, pad_x, pad_y), (h, w) in zip(preds, transforms, shapes):
+        pred = pred.cpu().numpy()
+        boxes = pred[:, :4].copy()
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / ratio).clip(0, w)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / ratio).clip(0, h)
+        detections.append((boxes.astype(np.float32), pred[:, 4].astype(np.float32),
+                           pred[:, 5].astype(np.int64)))
+    return detections
+
+
+def _no_detections(pixels: int):
+    return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64), pixels
+
+
+@torch.inference_mode()
+def detect_rois(net, image, rois, imgsz: int, conf: float, iou: float, margin: float = 0.15,
+                max_batch: int = 32, stride: int = 32, device='cpu', max_pixels: int = None):
+    """
+    Run a detector on regions of interest of one image instead of all of it.
+
+    The image is scaled once by the ratio letterbox_batch would use for
+    imgsz, so objects keep the size the model was trained on. Each ROI is
+    grown by margin (context for e.g. periapical lesions) and cut out of
+    the scaled image. Crops are sorted by area and batched, each batch
+    padded to the stride-aligned size of its largest crop. Detections are
+    mapped back to original pixels and merged across overlapping ROIs
+    with class-aware NMS. Work is proportional to ROI area, and an image
+    without ROIs costs nothing.
+
+    Args:
+        rois: ROI boxes (N x 4 xyxy, original pixels)
+        margin: Fraction of the ROI size added on every side
+        max_pixels: Give up (return None) when the padded crops would exceed
+            this many input pixels, e.g. imgsz**2 for a full-image pass
+
+    Returns:
+        (xyxy float32 N x 4, confidence float32 N, class int N, input pixels processed),
+        or None when over max_pixels
+    """
+    import torchvision
+
+    h, w = image.shape[:2]
+    rois = np.asarray(rois, dtype=np.float32).reshape(-1, 4)
+    if not len(rois):
+        return _no_detections(0)
+
+    ratio = min(imgsz / h, imgsz / w)
+    scaled = cv2.resize(image, (round(w * ratio), round(h * ratio)), interpolation=cv2.INTER_LINEAR)
+    sh, sw = scaled.shape[:2]
+    rois = rois * ratio
+    grow = (rois[:, 2:] - rois[:, :2]) * margin
+    corners = np.floor(np.maximum(rois[:, :2] - grow, 0)).astype(np.int64)
+    ends = np.ceil(np.minimum(rois[:, 2:] + grow, [sw, sh])).astype(np.int64)
+    sizes = ends - corners
+    keep = (sizes > 0).all(axis=1)
+    corners, ends, sizes = corners[keep], ends[keep], sizes[keep]
+
+    found_boxes, found_scores, found_classes = [], [], []
+    order = np.argsort(sizes[:, 0] * sizes[:, 1], kind='stable')
+    groups = []
+    for start in range(0, len(order), max_batch):
+        group = order[start:start + max_batch]
+        groups.append((group, int(math.ceil(sizes[group, 0].max() / stride) * stride),
+                       int(math.ceil(sizes[group, 1].max() / stride) * stride)))
+    pixels = sum(len(group) * batch_w * batch_h for group, batch_w, batch_h in groups)
+    if max_pixels is not None and pixels > max_pixels:
+        return None
+
+    for group, batch_w, batch_h in groups:
+        batch = np.full((len(group), batch_h, batch_w, 3), 114, dtype=np.uint8)
+        for k, i in enumerate(group):
+            (x1, y1), (x2, y2) = corners[i], ends[i]
+            batch[k, :y2 - y1, :x2 - x1] = scaled[y1:y2, x1:x2]
+
+        tensor = torch.from_numpy(np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2)))
+        tensor = tensor.to(device).float().div_(255.0)
+        preds = ops.non_max_suppression(net(tensor), conf_thres=conf, iou_thres=iou)
+        for i, pred in zip(group, preds):
+            if len(pred):
+                pred = pred.cpu().numpy()
+                found_boxes.append((pred[:, :4] + np.tile(corners[i], 2)) / ratio)
+                found_scores.append(pred[:, 4])
+                found_classes.append(pred[:, 5])
+
+    if not found_boxes:
+        return _no_detections(pixels)
+    boxes = np.concatenate(found_boxes).astype(np.float32)
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+    scores = np.concatenate(found_scores).astype(np.float32)
+    classes = np.concatenate(found_classes).astype(np.int64)
+    merged = torchvision.ops.batched_nms(torch.from_numpy(boxes), torch.from_numpy(scores),
+                                         torch.from_numpy(classes), iou).numpy()
+    return boxes[merged], scores[merged], classes[merged], pixels
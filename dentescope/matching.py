@@ -0,0 +1,250 @@
+"""
+DenteScope AI - Box Matching
+Vectorized IoU matching between detection sets (model vs model, model vs labels)
+
+Boxes are stored per image in padded arrays (images x max_boxes x 4), so
+IoU matrices for thousands of images are computed with one broadcast and
+matched without Python loops over boxes.
+
+Matching is greedy by IoU, computed as rounds of mutual-best pairs: a pair
+(a, b) where b is a's best box and a is b's best box is always part of the
+greedy matching, so every round commits all such pairs at once and the
+number of rounds stays small.
+"""
+
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# Budget for one IoU block (images x boxes_a x boxes_b float32 values)
+IOU_BLOCK_ELEMENTS = 16_000_000
+
+
+class BoxSet(NamedTuple):
+    """Padded per-image boxes: boxes (I, M, 4) xyxy, scores (I, M), valid (I, M)"""
+    boxes: np.ndarray
+    scores: np.ndarray
+    valid: np.ndarray
+
+    @property
+    def counts(self) -> np.ndarray:
+        return self.valid.sum(axis=1)
+
+    @property
+    def widths(self) -> np.ndarray:
+        return self.boxes[..., 2] - self.boxes[..., 0]
+
+
+class MatchResult(NamedTuple):
+    """Matched pairs (flat arrays) plus per-image box counts"""
+    image: np.ndarray      # image index of each pair
+    index_a: np.ndarray    # box index in set A
+    index_b: np.ndarray    # box index in set B
+    iou: np.ndarray
+    counts_a: np.ndarray   # boxes per image in A
+    counts_b: np.ndarray   # boxes per image in B
+
+    @property
+    def matched_per_image(self) -> np.ndarray:
+        return np.bincount(self.image, minlength=len(self.counts_a))
+
+
+def pack_boxes(per_image: Sequence, min_size: int = 1) -> BoxSet:
+    """
+    Pad a list of per-image detections into a BoxSet.
+
+    Args:
+        per_image: For each image, an (N, 4) xyxy array or a (boxes, scores) tuple
+    """
+    items = [d if isinstance(d, tuple) else (d, None) for d in per_image]
+    counts = np.array([len(b) for b, _ in items], dtype=np.int64)
+    max_boxes = max(int(counts.max()) if len(counts) else 0, min_size)
+
+    boxes = np.zeros((len(items), max_boxes, 4), dtype=np.float32)
+    scores = np.zeros((len(items), max_boxes), dtype=np.float32)
+    valid = np.arange(max_boxes)[None, :] < counts[:, None]
+    for i, (b, s) in enumerate(items):
+        if len(b):
+            boxes[i, :len(b)] = b
+            scores[i, :len(b)] = 1.0 if s is None else s
+    return BoxSet(boxes, scores, valid)
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray, valid_a: np.ndarray,
+                 valid_b: np.ndarray) -> np.ndarray:
+    """
+    IoU matrices for a batch of images.
+
+    Args:
+        a: (I, Ma, 4) xyxy boxes
+        b: (I, Mb, 4) xyxy boxes
+        valid_a, valid_b: (I, Ma) / (I, Mb) masks of real (non-padding) boxes
+
+    Returns:
+        (I, Ma, Mb) IoU, -1 where either box is padding
+    """
+    top_left = np.maximum(a[:, :, None, :2], b[:, None, :, :2])
+    bottom_right = np.minimum(a[:, :, None, 2:], b[:, None, :, 2:])
+    wh = np.clip(bottom_right - top_left, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a[:, :, None] + area_b[:, None, :] - inter
+    iou = inter / np.maximum(union, 1e-9)
+    iou[~(valid_a[:, :, None] & valid_b[:, None, :])] = -1.0
+    return iou.astype(np.float32, copy=False)
+
+
+def _greedy_match(iou: np.ndarray, threshold: float):
+    """Greedy IoU matching via rounds of mutual-best pairs; mutates iou"""
+    n_images, n_a, n_b = iou.shape
+    images, rows, cols, values = [], [], [], []
+    image_ids = np.arange(n_images)[:, None]
+    a_ids = np.arange(n_a)[None, :]
+
+    while True:
+        best_b = iou.argmax(axis=2)                       # (I, Ma)
+        best_b_iou = np.take_along_axis(iou, best_b[..., None], axis=2)[..., 0]
+        best_a = iou.argmax(axis=1)                       # (I, Mb)
+        mutual = (best_a[image_ids, best_b] == a_ids) & (best_b_iou >= threshold)
+        if not mutual.any():
+            break
+        img, row = np.nonzero(mutual)
+        col = best_b[img, row]
+        images.append(img)
+        rows.append(row)
+        cols.append(col)
+        values.append(best_b_iou[img, row])
+        iou[img, row, :] = -1.0
+        iou[img, :, col] = -1.0
+
+    if not images:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0, dtype=np.float32)
+    return (np.concatenate(images), np.concatenate(rows),
+            np.concatenate(cols), np.concatenate(values))
+
+
+def match_boxes(a: BoxSet, b: BoxSet, threshold: float = 0.5) -> MatchResult:
+    """
+    Match two detection sets image by image.
+
+    Args:
+        a: Reference boxes (e.g. ground truth or baseline model)
+        b: Candidate boxes, same image order as a
+        threshold: Minimum IoU for a match
+
+    Returns:
+        MatchResult with one entry per matched pair
+    """
+    n_images = len(a.boxes)
+    if len(b.boxes) != n_images:
+        raise ValueError(f"Box sets cover different image counts: {n_images} vs {len(b.boxes)}")
+
+    # Trim padding to the widest image, then process in memory-bounded blocks
+    max_a = max(int(a.counts.max()) if n_images else 0, 1)
+    max_b = max(int(b.counts.max()) if n_images else 0, 1)
+    block = max(1, IOU_BLOCK_ELEMENTS // (max_a * max_b))
+
+    parts = []
+    for start in range(0, n_images, block):
+        stop = min(start + block, n_images)
+        iou = pairwise_iou(a.boxes[start:stop, :max_a], b.boxes[start:stop, :max_b],
+                           a.valid[start:stop, :max_a], b.valid[start:stop, :max_b])
+        img, row, col, value = _greedy_match(iou, threshold)
+        parts.append((img + start, row, col, value))
+
+    return MatchResult(
+        image=np.concatenate([p[0] for p in parts]) if parts else np.zeros(0, np.int64),
+        index_a=np.concatenate([p[1] for p in parts]) if parts else np.zeros(0, np.int64),
+        index_b=np.concatenate([p[2] for p in parts]) if parts else np.zeros(0, np.int64),
+        iou=np.concatenate([p[3] for p in parts]) if parts else np.zeros(0, np.float32),
+        counts_a=a.counts,
+        counts_b=b.counts
+    )
+
+
+def summarize_match(a: BoxSet, b: BoxSet, match: MatchResult) -> dict:
+    """
+    Agreement statistics for a matched pair of box sets (A = reference).
+
+    missed = boxes in A without a partner in B; extra = boxes in B without
+    a partner in A. Width deltas are B - A in pixels over matched pairs.
+    """
+    total_a = int(match.counts_a.sum())
+    total_b = int(match.counts_b.sum())
+    matched = len(match.image)
+    width_delta = (b.widths[match.image, match.index_b]
+                   - a.widths[match.image, match.index_a])
+    per_image = match.matched_per_image
+    return {
+        "boxes_a": total_a,
+        "boxes_b": total_b,
+        "matched": matched,
+        "missed": total_a - matched,
+        "extra": total_b - matched,
+        "recall": matched / total_a if total_a else float('nan'),
+        "precision": matched / total_b if total_b else float('nan'),
+        "agreement": 2 * matched / (total_a + total_b) if total_a + total_b else float('nan'),
+        "mean_iou": float(match.iou.mean()) if matched else float('nan'),
+        "width_delta_mean_px": float(width_delta.mean()) if matched else float('nan'),
+        "width_delta_std_px": float(width_delta.std()) if matched else float('nan'),
+        "width_delta_abs_mean_px": float(np.abs(width_delta).mean()) if matched else float('nan'),
+        "images_full_agreement": int(((per_image == match.counts_a)
+                                      & (per_image == match.counts_b)).sum()),
+    }
+
+
+def match_table(a: BoxSet, b: BoxSet, match: MatchResult) -> dict:
+    """Per-tooth columns for matched pairs (dict of equal-length arrays)"""
+    width_a = a.widths[match.image, match.index_a]
+    width_b = b.widths[match.image, match.index_b]
+    return {
+        "image_index": match.image,
+        "box_a": match.index_a,
+        "box_b": match.index_b,
+        "iou": match.iou,
+        "width_a_px": width_a,
+        "width_b_px": width_b,
+        "width_delta_px": width_b - width_a,
+    }
+
+
+def label_path_for(image_path) -> Optional[Path]:
+    """
+    YOLO label file for an image: .../images/x.jpg -> .../labels/x.txt,
+    falling back to x.txt next to the image.
+    """
+    image_path = Path(image_path)
+    parts = list(image_path.parts)
+    if 'images' in parts:
+        i = len(parts) - 1 - parts[::-1].index('images')
+        parts[i] = 'labels'
+        candidate = Path(*parts).with_suffix('.txt')
+        if candidate.exists():
+            return candidate
+    candidate = image_path.with_suffix('.txt')
+    return candidate if candidate.exists() else None
+
+
+def load_yolo_labels(image_path, shape) -> Optional[np.ndarray]:
+    """
+    Ground-truth boxes for an image in pixel xyxy.
+
+    Args:
+        image_path: Image file
+        shape: (height, width) of the image
+
+    Returns:
+        (N, 4) float32 array, or None if no label file exists
+    """
+    label_path = label_path_for(image_path)
+    if label_path is None:
+        return None
+    data = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+    if data.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    h, w = shape
+    cx, cy, bw, bh = data[:, 1] * w, data[:, 2] * h, data[:, 3] * w, data[:, 4] * h
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+DenteScope AI - Patient Metadata
+Parse patient details encoded in X-ray filenames and filter cohorts
+
+Filenames in data/raw follow the clinic export convention:
+
+    AARUSH 7 YRS MALE_DR DEEPAK K_2017_07_31_2D_Image_Shot.jpg
+    EESHAN 10YRS MALE_DR GANESH PRASAD B R_2015_06_24_2D_Image_Shot.jpg
+    ALFIYA TAJ 11 YRS FEMALE_DR RAZA_2014_01_01_2D_Image_Shot (2).jpg
+
+Each file is parsed once into a MetadataTable, a columnar table with
+inverted indexes on age, sex and doctor, so cohort selection is a set
+intersection instead of a string scan per row.
+"""
+
+import re
+from array import array
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+_FILENAME_RE = re.compile(
+    r'^(?P<name>.+?)\s*(?P<age>\d{1,3})\s*Y[A-Z]*\s+'    # YRS, YEARS, YERAS, 10YRS ...
+    r'(?P<sex>FEMALE|MALE|F|M)\s*_\s*'
+    r'DR\.?\s*(?P<doctor>.+?)_'
+    r'(?P<year>\d{4})_(?P<month>\d{1,2})_(?P<day>\d{1,2})'
+    r'(?:_(?P<shot>.+?))?'
+    r'(?:\s*\((?P<copy>\d+)\))?$',
+    re.IGNORECASE
+)
+
+SEX_CODES = {'MALE': 'M', 'M': 'M', 'FEMALE': 'F', 'F': 'F'}
+
+
+class PatientMetadata(NamedTuple):
+    """Patient details parsed from one filename"""
+    patient: str
+    age: Optional[int]
+    sex: Optional[str]
+    doctor: Optional[str]
+    study_date: Optional[str]
+    shot: Optional[str]
+    copy: int
+
+
+def _clean(text: str) -> str:
+    return ' '.join(text.split()).upper()
+
+
+def parse_filename(filename) -> Optional[PatientMetadata]:
+    """
+    Parse a clinic export filename.
+
+    Args:
+        filename: File name or path (extension is ignored)
+
+    Returns:
+        PatientMetadata, or None if the name doesn't follow the convention
+    """
+    stem = Path(str(filename)).stem
+    match = _FILENAME_RE.match(stem.strip())
+    if not match:
+        return None
+
+    try:
+        study_date = date(int(match['year']), int(match['month']), int(match['day'])).isoformat()
+    except ValueError:
+        study_date = None
+
+    return PatientMetadata(
+        patient=_clean(match['name']),
+        age=int(match['age']),
+        sex=SEX_CODES[match['sex'].upper()],
+        doctor=_clean(match['doctor']),
+        study_date=study_date,
+        shot=match['shot'],
+        copy=int(match['copy']) if match['copy'] else 1
+    )
+
+
+def describe_file(path) -> PatientMetadata:
+    """parse_filename(), falling back to the bare stem as patient for unknown layouts"""
+    meta = parse_filename(path)
+    if meta is None:
+        meta = PatientMetadata(Path(str(path)).stem, None, None, None, None, None, 1)
+    return meta
+
+
+def parse_age_range(text: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Parse an age filter: '8', '7-9', '10+' or '-9'.
+
+    Returns:
+        (min_age, max_age), either bound may be None
+
+    Raises:
+        ValueError: If the text is not one of those forms
+    """
+    text = text.strip()
+    try:
+        if text.endswith('+'):
+            return int(text[:-1]), None
+        if '-' in text:
+            low, high = text.split('-', 1)
+            return (int(low) if low.strip() else None,
+                    int(high) if high.strip() else None)
+        return int(text), int(text)
+    except ValueError:
+        raise ValueError(f"invalid age {text!r}, expected e.g. 8, 7-9, 10+ or -9") from None
+
+
+def _age_argument(text: str) -> str:
+    import argparse
+    try:
+        parse_age_range(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+
+def _date_argument(text: str) -> str:
+    import argparse
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {text!r}, expected YYYY-MM-DD")
+    return text
+
+
+class MetadataTable:
+    """
+    Columnar, indexed patient metadata for a set of image paths.
+
+    Columns are plain lists/arrays aligned by row; categorical columns
+    (doctor, sex) are stored as integer codes.
+    """
+
+    def __init__(self, paths):
+        self.paths: List[Path] = []
+        self.patients: List[str] = []
+        self.ages = array('h')          # -1 = unknown
+        self.dates = array('l')         # date ordinal, 0 = unknown
+        self.doctor_codes = array('H')  # index into self.doctors, 0 = unknown
+        self.sex_codes = array('b')     # 0 = unknown, 1 = M, 2 = F
+        self.shots: List[Optional[str]] = []
+        self.copies = array('H')
+        self.doctors: List[Optional[str]] = [None]
+
+        self._row_by_path: Dict[str, int] = {}
+        self._doctor_lookup: Dict[str, int] = {}
+        self._by_age: Dict[int, List[int]] = {}
+        self._by_sex: Dict[int, List[int]] = {}
+        self._by_doctor: Dict[int, List[int]] = {}
+
+        for path in paths:
+            self._append(Path(path))
+
+    def _append(self, path: Path):
+        row = len(self.paths)
+        meta = describe_file(path)
+
+        doctor_code = 0
+        if meta.doctor:
+            doctor_code = self._doctor_lookup.get(meta.doctor)
+            if doctor_code is None:
+                doctor_code = len(self.doctors)
+                self.doctors.append(meta.doctor)
+                self._doctor_lookup[meta.doctor] = doctor_code
+        sex_code = {'M': 1, 'F': 2}.get(meta.sex, 0)
+        age = meta.age if meta.age is not None else -1
+
+        self.paths.append(path)
+        self.patients.append(meta.patient)
+        self.ages.append(age)
+        self.dates.append(date.fromisoformat(meta.study_date).toordinal() if meta.study_date else 0)
+        self.doctor_codes.append(doctor_code)
+        self.sex_codes.append(sex_code)
+        self.shots.append(meta.shot)
+        self.copies.append(meta.copy)
+
+        self._row_by_path[str(path)] = row
+        self._by_age.setdefault(age, []).append(row)
+        self._by_sex.setdefault(sex_code, []).append(row)
+        self._by_doctor.setdefault(doctor_code, []).append(row)
+
+    @classmethod
+    def from_directory(cls, root, recursive: bool = False) -> 'MetadataTable':
+        """Build a table for every image found by the dataset scanner"""
+        from dentescope.scanner import list_images
+        return cls(list_images(root, recursive=recursive))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def row(self, index: int) -> PatientMetadata:
+        """Metadata for one row"""
+        ordinal = self.dates[index]
+        sex = {1: 'M', 2: 'F'}.get(self.sex_codes[index])
+        return PatientMetadata(
+            patient=self.patients[index],
+            age=self.ages[index] if self.ages[index] >= 0 else None,
+            sex=sex,
+            doctor=self.doctors[self.doctor_codes[index]],
+            study_date=date.fromordinal(ordinal).isoformat() if ordinal else None,
+            shot=self.shots[index],
+            copy=self.copies[index]
+        )
+
+    def get(self, path) -> PatientMetadata:
+        """Metadata for a path in the table (parsed on the fly if absent)"""
+        index = self._row_by_path.get(str(path))
+        if index is None:
+            return describe_file(path)
+        return self.row(index)
+
+    def select_rows(self, age=None, sex=None, doctor=None, patient=None,
+                    since=None, until=None) -> List[int]:
+        """
+        Row indices matching every given filter.
+
+        Args:
+            age: (min, max) tuple or an age string such as '7-9'
+            sex: 'M', 'F', 'MALE' or 'FEMALE'
+            doctor: Doctor name, case-insensitive, with or without 'DR'
+            patient: Substring of the patient name, case-insensitive
+            since: Earliest study date (YYYY-MM-DD), inclusive
+            until: Latest study date (YYYY-MM-DD), inclusive
+        """
+        candidates = None
+
+        def narrow(rows):
+            nonlocal candidates
+            rows = set(rows)
+            candidates = rows if candidates is None else candidates & rows
+
+        if doctor:
+            name = _clean(re.sub(r'^DR\.?\s+', '', doctor.strip(), flags=re.IGNORECASE))
+            narrow(self._by_doctor.get(self._doctor_lookup.get(name, -1), []))
+        if sex:
+            code = {'M': 1, 'F': 2}.get(SEX_CODES.get(sex.strip().upper()), -1)
+            narrow(self._by_sex.get(code, []))
+        if age:
+            low, high = parse_age_range(age) if isinstance(age, str) else age
+            rows = []
+            for value, age_rows in self._by_age.items():
+                if value < 0:
+                    continue
+                if (low is None or value >= low) and (high is None or value <= high):
+                    rows.extend(age_rows)
+            narrow(rows)
+
+        rows = sorted(candidates) if candidates is not None else range(len(self))
+
+        if since or until or patient:
+            first = date.fromisoformat(since).toordinal() if since else None
+            last = date.fromisoformat(until).toordinal() if until else None
+            needle = _clean(patient) if patient else None
+            rows = [
+                i for i in rows
+                if (first is None or (self.dates[i] and self.dates[i] >= first))
+                and (last is None or (self.dates[i] and self.dates[i] <= last))
+                and (needle is None or needle in self.patients[i])
+            ]
+        return list(rows)
+
+    def select(self, **filters) -> List[Path]:
+        """Paths matching the filters (see select_rows)"""
+        return [self.paths[i] for i in self.select_rows(**filters)]
+
+
+def add_filter_arguments(parser):
+    """Add the shared cohort filter options to an argparse parser"""
+    group = parser.add_argument_group('cohort filters')
+    group.add_argument('--age', type=_age_argument, help="Patient age or range, e.g. 8, 7-9, 10+")
+    group.add_argument('--sex', choices=['M', 'F', 'MALE', 'FEMALE'], type=str.upper,
+                       help='Patient sex')
+    group.add_argument('--doctor', help='Referring doctor, e.g. "RATAN SALECHA"')
+    group.add_argument('--patient', help='Patient name (substring match)')
+    group.add_argument('--since', type=_date_argument, help='Earliest study date (YYYY-MM-DD)')
+    group.add_argument('--until', type=_date_argument, help='Latest study date (YYYY-MM-DD)')
+    return group
+
+
+def filters_from_args(args) -> dict:
+    """Collect the cohort filters set on parsed args"""
+    names = ['age', 'sex', 'doctor', 'patient', 'since', 'until']
+    return {name: getattr(args, name) for name in names if getattr(args, name, None)}
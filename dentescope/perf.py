@@ -0,0 +1,172 @@
+"""
+DenteScope AI - Performance Helpers
+Latency percentiles and process memory readings shared by the benchmarks
+"""
+
+import math
+import os
+import resource
+import sys
+from typing import Dict, Iterable, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of pre-sorted samples"""
+    if not sorted_samples:
+        return float('nan')
+    position = (len(sorted_samples) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    weight = position - lower
+    return sorted_samples[lower] * (1 - weight) + sorted_samples[upper] * weight
+
+
+def summarize_latencies(samples: Iterable[float], scale: float = 1000.0,
+                        quantiles=(50, 90, 95, 99)) -> Dict[str, float]:
+    """
+    Summarize latency samples given in seconds.
+
+    Args:
+        samples: Latencies in seconds
+        scale: Multiplier for the reported values (1000 -> milliseconds)
+        quantiles: Percentiles to report as p50, p95, ...
+
+    Returns:
+        Dict with count, mean, min, max and the requested percentiles
+    """
+    values = sorted(s * scale for s in samples)
+    if not values:
+        return {'count': 0}
+    summary = {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'min': values[0],
+        'max': values[-1],
+    }
+    for q in quantiles:
+        key = f"p{q:g}".replace('.', '')
+        summary[key] = percentile(values, q)
+    return summary
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb() -> float:
+    """Current resident set size in MB (falls back to the peak off Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear latency histogram with constant memory.
+
+    Values are recorded in integer microseconds into power-of-two buckets,
+    each split into 2^sub_bits linear sub-buckets, so every recorded value
+    is kept to within 1/2^(sub_bits-1) relative error (0.8% by default)
+    however many samples are recorded. Histograms merge by adding counts
+    and serialize to a sparse dict.
+    """
+
+    def __init__(self, sub_bits: int = 8):
+        self.sub_bits = sub_bits
+        self.sub_half = 1 << (sub_bits - 1)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, micros: int) -> int:
+        # OR-ing the sub-bucket mask keeps bit_length >= sub_bits, so bucket >= 0
+        bucket = (micros | ((1 << self.sub_bits) - 1)).bit_length() - self.sub_bits
+        return bucket * self.sub_half + (micros >> bucket)
+
+    def _value(self, index: int) -> float:
+        """Midpoint (in microseconds) of the values that map to index"""
+        bucket = max(index // self.sub_half - 1, 0)
+        sub = index - bucket * self.sub_half
+        return ((sub << bucket) + ((sub + 1) << bucket) - 1) / 2
+
+    def record(self, seconds: float, count: int = 1):
+        """Record a latency given in seconds"""
+        micros = int(seconds * 1e6)
+        index = self._index(micros if micros > 0 else 0)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + count
+        self.count += count
+        self.total += seconds * count
+        # Plain comparisons: this is the per-sample hot path
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Add other's samples to this histogram (same sub_bits)"""
+        if other.sub_bits != self.sub_bits:
+            raise ValueError("Histograms with different precision cannot be merged")
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q: float) -> float:
+        """Latency in seconds at percentile q (0..100)"""
+        if not self.count:
+            return float('nan')
+        rank = max(math.ceil(self.count * q / 100.0), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                value = self._value(index) / 1e6
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def buckets(self):
+        """(bucket midpoints in seconds, counts), ascending; the input for resampling"""
+        indexes = sorted(self.counts)
+        return [self._value(i) / 1e6 for i in indexes], [self.counts[i] for i in indexes]
+
+    def summary(self, scale: float = 1000.0, quantiles=(50, 90, 99, 99.9)) -> Dict[str, float]:
+        """Same keys as summarize_latencies (p999 for 99.9)"""
+        if not self.count:
+            return {'count': 0}
+        summary = {
+            'count': self.count,
+            'mean': self.total / self.count * scale,
+            'min': self.min * scale,
+            'max': self.max * scale,
+        }
+        for q in quantiles:
+            key = f"p{q:g}".replace('.', '')
+            summary[key] = self.percentile(q) * scale
+        return summary
+
+    def to_dict(self) -> dict:
+        return {'sub_bits': self.sub_bits, 'count': self.count, 'total': self.total,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None,
+                'counts': {str(k): v for k, v in sorted(self.counts.items())}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        histogram = cls(data['sub_bits'])
+        histogram.counts = {int(k): v for k, v in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        if data['count']:
+            histogram.min, histogram.max = data['min'], data['max']
+        return histogram
@@ -0,0 +1,551 @@
+"""
+DenteScope AI - Model Registry
+Named checkpoints with content hashes, training metadata and benchmarks
+
+models/registry.json records the models the tools use: checkpoint path,
+SHA-256, task, classes, input size, training metadata, validation metrics
+and benchmark figures. Every tool that takes a checkpoint path also takes
+a registry name or alias, and plain paths keep working:
+
+    path = resolve('tooth')        # checkpoint path of the 'tooth' alias
+    model = load_model('tooth')    # shared, inference-ready YOLO instance
+
+load_model() keeps one loaded model per checkpoint content in the
+process, so tools, the predict daemon and the API that ask for the same
+model share one load. The first load of a checkpoint also writes an
+inference copy to the cache directory (fp32, Conv+BN fused, torch zip
+format). Later loads memory-map that copy, so spawned workers and
+concurrent tools read the weights from the shared page cache instead of
+each unpickling and casting a private copy.
+
+Commands (python -m dentescope.registry, or dentescope models):
+    list                  registered models and the state of their files
+    show NAME             one entry as JSON
+    path NAME             checkpoint path, for shell use
+    add PATH --name NAME  register a checkpoint (hash and metadata from the file)
+    update NAME           re-read hash and metadata after retraining
+    bench NAME [RESULT]   attach figures from a dentescope.bench result
+    verify [NAME ...]     check files against recorded hashes (exit 1 on mismatch)
+"""
+
+import csv
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dentescope.scanner import default_cache_dir, file_sha256
+
+REGISTRY_SCHEMA = 1
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+_MODELS: Dict[str, object] = {}          # sha256 -> YOLO instance
+_PATHS: Dict[str, str] = {}              # sha256 -> checkpoint path it was loaded from
+_HASHES: Dict[Tuple[str, int, int], str] = {}
+_LOCK = threading.Lock()
+
+
+def registry_path() -> Path:
+    """Registry file ($DENTESCOPE_REGISTRY or models/registry.json in the repo)"""
+    return Path(os.environ.get('DENTESCOPE_REGISTRY', REPO_ROOT / 'models' / 'registry.json'))
+
+
+def load_registry(path=None) -> dict:
+    path = Path(path) if path else registry_path()
+    try:
+        with open(path) as f:
+            registry = json.load(f)
+    except FileNotFoundError:
+        return {'schema': REGISTRY_SCHEMA, 'default': None, 'models': {}}
+    if registry.get('schema') != REGISTRY_SCHEMA:
+        raise ValueError(f"{path}: unsupported registry schema {registry.get('schema')}")
+    return registry
+
+
+def save_registry(registry: dict, path=None) -> Path:
+    """Write the registry atomically"""
+    path = Path(path) if path else registry_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f'.tmp{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(registry, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+def find_entry(registry: dict, ref: str) -> Optional[Tuple[str, dict]]:
+    """(name, entry) for a registry name or alias (case-insensitive), else None"""
+    models = registry['models']
+    if ref in models:
+        return ref, models[ref]
+    ref = ref.lower()
+    for name, entry in models.items():
+        if ref == name.lower() or ref in (alias.lower() for alias in entry.get('aliases', [])):
+            return name, entry
+    return None
+
+
+def entry_path(entry: dict) -> Path:
+    """Checkpoint path of an entry (relative paths are relative to the repo root)"""
+    path = Path(entry['path'])
+    return path if path.is_absolute() else REPO_ROOT / path
+
+
+def resolve(ref: Optional[str] = None, registry: Optional[dict] = None) -> str:
+    """
+    Checkpoint path for a registry name, alias or path.
+
+    An existing file wins over a registered name, and unknown references
+    are returned unchanged, so callers report a missing file as before.
+
+    Args:
+        ref: Name, alias or path (None: the registry's default model)
+        registry: Registry to use (default: load_registry())
+
+    Returns:
+        Checkpoint path
+    """
+    if ref is not None and Path(ref).is_file():
+        return str(ref)
+    registry = registry if registry is not None else load_registry()
+    ref = ref if ref is not None else registry.get('default')
+    if ref is None:
+        raise ValueError("No model given and the registry has no default")
+    found = find_entry(registry, str(ref))
+    return str(entry_path(found[1])) if found else str(ref)
+
+
+def display_name(ref: str, registry: Optional[dict] = None) -> str:
+    """Registry name for a reference or checkpoint path, else the run directory's name"""
+    registry = registry if registry is not None else load_registry()
+    found = find_entry(registry, str(ref))
+    if found:
+        return found[0]
+    path = Path(ref).resolve()
+    for name, entry in registry['models'].items():
+        if entry_path(entry).resolve() == path:
+            return name
+    # runs/train/<name>/weights/best.pt
+    return path.parent.parent.name if path.parent.name == 'weights' else path.stem
+
+
+def checkpoint_hash(path) -> str:
+    """file_sha256, remembered for the process while the file's size and mtime are unchanged"""
+    stat = os.stat(path)
+    key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+    if key not in _HASHES:
+        _HASHES[key] = file_sha256(path)
+    return _HASHES[key]
+
+
+def training_metrics(weights_path) -> Optional[dict]:
+    """
+    Validation metrics of the best epoch from the run's results.csv.
+
+    Returns:
+        {'epoch', 'mAP50', 'mAP50-95', 'precision', 'recall'}, or None when
+        the run directory has no ultralytics-style metrics
+    """
+    results_csv = Path(weights_path).parent.parent / 'results.csv'
+    try:
+        with open(results_csv, newline='') as f:
+            rows = [{k.strip(): v.strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+    except OSError:
+        return None
+    columns = {'mAP50': 'metrics/mAP50(B)', 'mAP50-95': 'metrics/mAP50-95(B)',
+               'precision': 'metrics/precision(B)', 'recall': 'metrics/recall(B)'}
+    rows = [row for row in rows if all(row.get(c) for c in columns.values())]
+    if not rows:
+        return None
+    # ultralytics' fitness: 0.1 * mAP50 + 0.9 * mAP50-95
+    best = max(rows, key=lambda row: 0.1 * float(row[columns['mAP50']])
+               + 0.9 * float(row[columns['mAP50-95']]))
+    metrics = {'epoch': int(float(best['epoch']))}
+    metrics.update({key: round(float(best[column]), 4) for key, column in columns.items()})
+    return metrics
+
+
+def describe_checkpoint(path) -> dict:
+    """Hash, task, classes, input size and training metadata read from a checkpoint"""
+    import torch
+
+    ckpt = torch.load(path, map_location='cpu', weights_only=False)
+    model = ckpt.get('ema') or ckpt['model']
+    args = ckpt.get('train_args') or {}
+    names = getattr(model, 'names', None) or {}
+    imgsz = args.get('imgsz', 640)
+    yaml_file = (getattr(model, 'yaml', None) or {}).get('yaml_file')
+    return {
+        'sha256': checkpoint_hash(path),
+        'size_mb': round(os.path.getsize(path) / 2**20, 1),
+        'task': getattr(model, 'task', None) or args.get('task', 'detect'),
+        'architecture': Path(yaml_file).stem if yaml_file else None,
+        'imgsz': max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz),
+        'parameters': sum(p.numel() for p in model.parameters()),
+        'classes': [names[i] for i in sorted(names)] if isinstance(names, dict) else list(names),
+        'training': {
+            'date': ckpt.get('date'),
+            'ultralytics': ckpt.get('version'),
+            'base_model': args.get('model'),
+            'data': args.get('data'),
+            'epochs': args.get('epochs'),
+            'batch': args.get('batch'),
+            'device': args.get('device'),
+            'best_fitness': ckpt.get('best_fitness'),
+        },
+        'metrics': training_metrics(path),
+    }
+
+
+def register(path, name: str, aliases: Iterable[str] = (), notes: Optional[str] = None,
+             default: bool = False, registry_file=None) -> dict:
+    """
+    Add a checkpoint to the registry, or refresh an existing entry.
+
+    Aliases, notes and benchmarks of an existing entry are kept; benchmarks
+    are dropped when the checkpoint's content changed.
+
+    Returns:
+        The stored entry
+    """
+    path = Path(path)
+    if not path.is_file():
+        raise FileNotFoundError(f"Checkpoint not found: {path}")
+    registry = load_registry(registry_file)
+    entry = dict(registry['models'].get(name, {}))
+    aliases = list(dict.fromkeys([*entry.get('aliases', []), *aliases]))
+    for ref in (name, *aliases):
+        found = find_entry(registry, ref)
+        if found and found[0] != name:
+            raise ValueError(f"'{ref}' already refers to {found[0]}")
+
+    described = describe_checkpoint(path)
+    if entry.get('sha256') and entry['sha256'] != described['sha256'] and entry.get('benchmarks'):
+        print(f"⚠️  {name}: checkpoint changed, dropping {len(entry['benchmarks'])} stale benchmark(s)")
+        entry['benchmarks'] = []
+    if described['metrics'] is None:
+        described['metrics'] = entry.get('metrics')  # keep metrics recorded by hand
+    try:
+        stored_path = path.resolve().relative_to(REPO_ROOT)
+    except ValueError:
+        stored_path = path.resolve()
+
+    entry.update(described)
+    entry.update({'path': str(stored_path), 'aliases': aliases,
+                  'registered': datetime.now().isoformat(timespec='seconds')})
+    if notes is not None:
+        entry['notes'] = notes
+    entry.setdefault('benchmarks', [])
+    registry['models'][name] = entry
+    if default or not registry.get('default'):
+        registry['default'] = name
+    save_registry(registry, registry_file)
+    return entry
+
+
+def benchmark_figures(result: dict, source: str) -> dict:
+    """The registry's summary of a dentescope.bench result"""
+    stages = result['stages']
+    return {
+        'source': source,
+        'created': result['created'],
+        'commit': (result['git']['commit'] or '')[:10] or None,
+        'device': result['device'],
+        'cpu': result['environment']['cpu'],
+        'threads': result['environment']['torch_threads'],
+        'images': result['corpus']['images'],
+        'load_s': result['load']['seconds'],
+        'detect_ms': round(stages['detect']['latency_ms']['p50'], 2),
+        'detect_p90_ms': round(stages['detect']['latency_ms']['p90'], 2),
+        'total_ms': round(stages['total']['latency_ms']['p50'], 2),
+        'total_p90_ms': round(stages['total']['latency_ms']['p90'], 2),
+    }
+
+
+def attach_benchmark(name: str, result_ref: str = 'last', registry_file=None) -> dict:
+    """
+    Record a benchmark result's figures on a registry entry.
+
+    A result for the same device, CPU and thread count replaces the older one.
+
+    Args:
+        name: Registry name or alias
+        result_ref: Result path, baseline name or 'last' (see dentescope.bench)
+    """
+    from dentescope.bench import load_result, resolve_result
+
+    registry = load_registry(registry_file)
+    found = find_entry(registry, name)
+    if found is None:
+        raise KeyError(f"Unknown model: {name}")
+    name, entry = found
+    result = load_result(result_ref)
+    if result['model']['sha256'] != entry.get('sha256'):
+        raise ValueError(f"{result_ref} benchmarked a different checkpoint than {name} "
+                         f"({result['model']['sha256'][:12]} vs {(entry.get('sha256') or 'unhashed')[:12]})")
+    source = resolve_result(result_ref)
+    try:
+        source = source.resolve().relative_to(REPO_ROOT)
+    except ValueError:
+        pass
+    figures = benchmark_figures(result, str(source))
+    same_setup = ('device', 'cpu', 'threads')
+    entry['benchmarks'] = [b for b in entry.get('benchmarks', [])
+                           if any(b.get(k) != figures[k] for k in same_setup)] + [figures]
+    save_registry(registry, registry_file)
+    return figures
+
+
+def verify(names: Optional[List[str]] = None, registry: Optional[dict] = None) -> Dict[str, str]:
+    """
+    State of registered checkpoints: 'ok', 'changed', 'missing' or 'unhashed'.
+
+    Args:
+        names: Names or aliases to check (default: all)
+    """
+    registry = registry if registry is not None else load_registry()
+    states = {}
+    for ref in names or list(registry['models']):
+        found = find_entry(registry, ref)
+        if found is None:
+            raise KeyError(f"Unknown model: {ref}")
+        name, entry = found
+        path = entry_path(entry)
+        if not path.is_file():
+            states[name] = 'missing'
+        elif not entry.get('sha256'):
+            states[name] = 'unhashed'
+        else:
+            states[name] = 'ok' if checkpoint_hash(path) == entry['sha256'] else 'changed'
+    return states
+
+
+@contextmanager
+def _mmap_loads():
+    """Make torch.load memory-map zip checkpoints (torch >= 2.5), including ultralytics' own calls"""
+    try:
+        from torch.utils.serialization import config
+    except ImportError:
+        yield
+        return
+    previous = config.load.mmap
+    config.load.mmap = True
+    try:
+        yield
+    finally:
+        config.load.mmap = previous
+
+
+def inference_copy(path, sha256: str) -> Optional[Path]:
+    """
+    Cached fp32, fused, memory-mappable copy of a checkpoint.
+
+    Returns:
+        Path of the copy, or None when it cannot be written (the caller
+        loads the original checkpoint instead)
+    """
+    import torch
+    import ultralytics
+    from ultralytics.nn.tasks import attempt_load_one_weight
+
+    cache_dir = default_cache_dir() / 'models'
+    copy_path = cache_dir / f"{sha256[:32]}-ultralytics{ultralytics.__version__}.pt"
+    if copy_path.exists():
+        return copy_path
+
+    model, ckpt = attempt_load_one_weight(str(path))
+    model = model.fuse(verbose=False) if hasattr(model, 'fuse') else model
+    tmp_path = copy_path.with_suffix(f'.tmp{os.getpid()}')
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        torch.save({'model': model, 'ema': None, 'train_args': ckpt.get('train_args'),
+                    'date': ckpt.get('date'), 'version': ckpt.get('version'),
+                    'source': str(path), 'sha256': sha256}, tmp_path)
+        os.replace(tmp_path, copy_path)
+    except OSError as e:
+        print(f"⚠️  Cannot cache inference copy of {path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return None
+    return copy_path
+
+
+def _warn_if_changed(path: str, sha256: str):
+    """Point out a registered checkpoint whose file no longer matches its hash"""
+    registry = load_registry()
+    path = Path(path).resolve()
+    for name, entry in registry['models'].items():
+        if entry.get('sha256') and entry['sha256'] != sha256 and entry_path(entry).resolve() == path:
+            print(f"⚠️  {path} no longer matches registered model '{name}' "
+                  f"(run: python -m dentescope models update {name})")
+
+
+def load_model(ref: Optional[str] = None, cache: bool = True):
+    """
+    Shared inference model for a registry name, alias or checkpoint path.
+
+    One instance per checkpoint content and process; later calls (from any
+    thread) return the same instance. It is fused and shared, so don't
+    train, export or otherwise modify it; use YOLO(resolve(ref)) for that.
+
+    Args:
+        ref: Name, alias or path (None: the registry's default model)
+        cache: Load through the memory-mapped inference copy
+
+    Returns:
+        ultralytics YOLO instance
+    """
+    path = resolve(ref)
+    if not Path(path).is_file():
+        raise FileNotFoundError(f"Model not found: {path}")
+    sha256 = checkpoint_hash(path)
+    with _LOCK:
+        model = _MODELS.get(sha256)
+        if model is None:
+            from ultralytics import YOLO
+
+            _warn_if_changed(path, sha256)
+            copy_path = inference_copy(path, sha256) if cache else None
+            if copy_path is not None:
+                try:
+                    with _mmap_loads():
+                        model = YOLO(str(copy_path))
+                except Exception as e:  # truncated or written by an incompatible version
+                    print(f"⚠️  Rebuilding inference copy of {path}: {type(e).__name__}: {e}")
+                    copy_path.unlink(missing_ok=True)
+                    copy_path = inference_copy(path, sha256)
+                    if copy_path is not None:
+                        with _mmap_loads():
+                            model = YOLO(str(copy_path))
+            if model is None:
+                model = YOLO(path)
+            _MODELS[sha256] = model
+            _PATHS[sha256] = str(path)
+    return model
+
+
+def loaded_models() -> Dict[str, str]:
+    """Checkpoint path -> sha256 of the models loaded in this process"""
+    with _LOCK:
+        return {_PATHS[sha256]: sha256 for sha256 in _MODELS}
+
+
+STATE_MARKS = {'ok': '✅', 'changed': '⚠️ ', 'missing': '⚪', 'unhashed': '❔'}
+
+
+def print_models(registry: dict):
+    states = verify(registry=registry)
+    default = registry.get('default')
+    print(f"{'':3}{'name':<20}{'aliases':<22}{'imgsz':>6}{'mAP50':>8}{'detect ms':>11}  path")
+    print("-" * 100)
+    for name, entry in registry['models'].items():
+        metrics = entry.get('metrics') or {}
+        bench = (entry.get('benchmarks') or [{}])[-1]
+        mAP50 = f"{metrics['mAP50']:.1%}" if metrics.get('mAP50') is not None else '-'
+        detect = f"{bench['detect_ms']:.1f}" if bench.get('detect_ms') is not None else '-'
+        label = name + (' *' if name == default else '')
+        print(f"{STATE_MARKS[states[name]]:<3}{label:<20}{', '.join(entry.get('aliases', [])):<22}"
+              f"{entry.get('imgsz') or '-':>6}{mAP50:>8}{detect:>11}  {entry['path']}")
+    print(f"\n   * default   ✅ matches hash   ⚠️  changed since registered   "
+          f"❔ not hashed yet   ⚪ file not present")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='DenteScope AI - Model Registry')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('list', help='Registered models and the state of their files')
+
+    p = sub.add_parser('show', help='Print one entry as JSON')
+    p.add_argument('name', help='Name or alias')
+
+    p = sub.add_parser('path', help='Print the checkpoint path of a model')
+    p.add_argument('name', nargs='?', help='Name or alias (default: the default model)')
+
+    p = sub.add_parser('add', help='Register a checkpoint')
+    p.add_argument('checkpoint', help='Checkpoint path (e.g. runs/train/tooth_detection/weights/best.pt)')
+    p.add_argument('--name', required=True, help='Registry name')
+    p.add_argument('--alias', action='append', default=[], help='Alias (repeatable)')
+    p.add_argument('--notes', help='Free-text notes')
+    p.add_argument('--default', action='store_true', help='Make this the default model')
+
+    p = sub.add_parser('update', help='Re-read hash and metadata of a registered checkpoint')
+    p.add_argument('name', help='Name or alias')
+    p.add_argument('--path', help='New checkpoint path')
+
+    p = sub.add_parser('bench', help='Attach figures from a benchmark result')
+    p.add_argument('name', help='Name or alias')
+    p.add_argument('result', nargs='?', default='last',
+                   help="Result path, baseline name or 'last' (default)")
+
+    p = sub.add_parser('verify', help='Check files against recorded hashes')
+    p.add_argument('names', nargs='*', help='Names or aliases (default: all)')
+
+    args = parser.parse_args(argv)
+    registry = load_registry()
+
+    if args.command == 'list':
+        if not registry['models']:
+            print(f"No models in {registry_path()} (register one with: add PATH --name NAME)")
+            return 0
+        print_models(registry)
+        return 0
+
+    if args.command == 'path':
+        print(resolve(args.name, registry))
+        return 0
+
+    if args.command in ('show', 'update', 'bench'):
+        found = find_entry(registry, args.name)
+        if found is None:
+            print(f"❌ Unknown model: {args.name}")
+            return 1
+        name, entry = found
+
+    if args.command == 'show':
+        print(json.dumps({name: entry}, indent=2))
+        return 0
+
+    if args.command == 'verify':
+        try:
+            states = verify(args.names, registry)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            return 1
+        for name, state in states.items():
+            print(f"{STATE_MARKS[state]} {name}: {state}")
+        return 1 if 'changed' in states.values() else 0
+
+    if args.command == 'bench':
+        try:
+            figures = attach_benchmark(name, args.result)
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"✅ {name}: detect p50 {figures['detect_ms']:.1f} ms, total p50 {figures['total_ms']:.1f} ms "
+              f"({figures['device']}, {figures['cpu']} x{figures['threads']})")
+        return 0
+
+    if args.command == 'update':
+        checkpoint, aliases, notes, default = args.path or entry_path(entry), (), None, False
+    else:
+        name, checkpoint, aliases, notes, default = (args.name, args.checkpoint, args.alias,
+                                                     args.notes, args.default)
+    try:
+        entry = register(checkpoint, name, aliases, notes, default)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {name}: {entry['path']} (sha256 {entry['sha256'][:12]}, imgsz {entry['imgsz']}, "
+          f"{len(entry['classes'])} classes)")
+    print(f"📁 Registry: {registry_path()}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+DenteScope AI - Dataset Scanner
+One place to discover dental X-rays on disk
+
+Walks a corpus with os.scandir and keeps a cached index of every supported
+image (path, size, mtime, content hash and pixel dimensions). Dimensions are
+read from the file header, never by decoding the image. Files whose size and
+mtime are unchanged since the last scan are served from the cache, so a
+re-scan costs one stat per file.
+"""
+
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+SUPPORTED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp'
+})
+
+INDEX_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class ImageRecord(NamedTuple):
+    """One indexed image"""
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+
+
+def is_image_file(name) -> bool:
+    """True if the file name has a supported image extension (case-insensitive)"""
+    return os.path.splitext(str(name))[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def iter_image_entries(root, recursive: bool = True) -> Iterator[os.DirEntry]:
+    """
+    Yield os.DirEntry objects for every supported image under root.
+
+    Hidden files and directories (leading '.') are skipped.
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif is_image_file(entry.name) and entry.is_file():
+                        yield entry
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+
+def file_sha256(path) -> str:
+    """SHA-256 of a file, streamed in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _jpeg_size(f) -> Optional[Tuple[int, int]]:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        # SOF0-SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _tiff_size(f, head: bytes) -> Optional[Tuple[int, int]]:
+    endian = '<' if head[:2] == b'II' else '>'
+    offset = struct.unpack(endian + 'I', head[4:8])[0]
+    f.seek(offset)
+    count_bytes = f.read(2)
+    if len(count_bytes) < 2:
+        return None
+    count = struct.unpack(endian + 'H', count_bytes)[0]
+    entries = f.read(count * 12)
+    dims = {}
+    for i in range(0, len(entries) - 11, 12):
+        tag, field_type = struct.unpack(endian + 'HH', entries[i:i + 4])
+        if tag not in (256, 257):
+            continue
+        if field_type == 3:
+            value = struct.unpack(endian + 'H', entries[i + 8:i + 10])[0]
+        else:
+            value = struct.unpack(endian + 'I', entries[i + 8:i + 12])[0]
+        dims[tag] = value
+    if 256 in dims and 257 in dims:
+        return dims[256], dims[257]
+    return None
+
+
+def read_image_size(path) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Read (width, height) from the image header without decoding pixels.
+
+    Handles PNG, JPEG, TIFF and BMP directly; other formats fall back to
+    Pillow's lazy header parsing when Pillow is installed.
+
+    Returns:
+        (width, height), or (None, None) if the header can't be parsed
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(32)
+            size = None
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                size = struct.unpack('>II', head[16:24])
+            elif head[:2] == b'\xff\xd8':
+                size = _jpeg_size(f)
+            elif head[:4] in (b'II*\x00', b'MM\x00*'):
+                size = _tiff_size(f, head)
+            elif head[:2] == b'BM' and len(head) >= 26:
+                width, height = struct.unpack('<ii', head[18:26])
+                size = (width, abs(height))
+            if size:
+                return int(size[0]), int(size[1])
+    except (OSError, struct.error):
+        return None, None
+
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None, None
+
+
+def default_cache_dir() -> Path:
+    """Index cache directory ($DENTESCOPE_CACHE or ~/.cache/dentescope)"""
+    return Path(os.environ.get('DENTESCOPE_CACHE', Path.home() / '.cache' / 'dentescope'))
+
+
+class DatasetIndex:
+    """
+    Cached file index for one image corpus.
+
+    The index lives in the cache directory, keyed by the corpus' absolute
+    path, and stores entries relative to the corpus root.
+    """
+
+    def __init__(self, root, cache_dir=None):
+        self.root = Path(root).resolve()
+        cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        key = hashlib.sha1(str(self.root).encode()).hexdigest()[:16]
+        self.cache_path = cache_dir / f"index-{key}.json"
+        self.entries = {}
+        self.stats = {'cached': 0, 'indexed': 0, 'removed': 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == INDEX_VERSION and data.get('root') == str(self.root):
+            self.entries = data.get('entries', {})
+
+    def save(self):
+        """Write the index atomically"""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(f'.tmp{os.getpid()}')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'root': str(self.root),
+                'entries': self.entries
+            }, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def _index_file(self, rel_path, size, mtime_ns, with_hash):
+        path = self.root / rel_path
+        width, height = read_image_size(path)
+        sha256 = file_sha256(path) if with_hash else None
+        return rel_path, [size, mtime_ns, sha256, width, height]
+
+    def scan(self, recursive: bool = True, with_hash: bool = True,
+             workers: int = None) -> List[ImageRecord]:
+        """
+        Scan the corpus, refreshing only new or modified files.
+
+        Args:
+            recursive: Descend into sub-directories
+            with_hash: Compute content hashes (cached entries without one are filled in)
+            workers: Threads for hashing/header reads (default: min(32, 4 x CPUs))
+
+        Returns:
+            ImageRecords sorted by path
+        """
+        self.stats = {'cached': 0, 'indexed': 0, 'removed': 0}
+        root_str = str(self.root)
+        seen = set()
+        pending = []
+
+        for entry in iter_image_entries(self.root, recursive=recursive):
+            rel_path = os.path.relpath(entry.path, root_str)
+            seen.add(rel_path)
+            st = entry.stat()
+            cached = self.entries.get(rel_path)
+            if (cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns
+                    and (cached[2] or not with_hash)):
+                self.stats['cached'] += 1
+                continue
+            pending.append((rel_path, st.st_size, st.st_mtime_ns))
+
+        if pending:
+            workers = workers or min(32, (os.cpu_count() or 1) * 4)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for rel_path, values in pool.map(
+                        lambda item: self._index_file(*item, with_hash), pending):
+                    self.entries[rel_path] = values
+            self.stats['indexed'] = len(pending)
+
+        # Forget files that disappeared from the scanned scope
+        for rel_path in list(self.entries):
+            in_scope = recursive or os.sep not in rel_path
+            if in_scope and rel_path not in seen:
+                del self.entries[rel_path]
+                self.stats['removed'] += 1
+
+        if self.stats['indexed'] or self.stats['removed']:
+            self.save()
+
+        return [
+            ImageRecord(os.path.join(root_str, rel_path), *self.entries[rel_path])
+            for rel_path in sorted(seen)
+        ]
+
+
+def scan_images(root, recursive: bool = True, with_hash: bool = True,
+                cache_dir=None, workers: int = None) -> List[ImageRecord]:
+    """
+    Scan a corpus through its cached index.
+
+    Args:
+        root: Corpus directory
+        recursive: Descend into sub-directories
+        with_hash: Compute content hashes
+        cache_dir: Override the index cache directory
+        workers: Threads for new/changed files
+
+    Returns:
+        ImageRecords sorted by path
+    """
+    return DatasetIndex(root, cache_dir=cache_dir).scan(
+        recursive=recursive, with_hash=with_hash, workers=workers
+    )
+
+
+def list_images(root, recursive: bool = False) -> List[Path]:
+    """
+    Sorted image paths under root, for scripts that only need the file list.
+
+    Content hashes are skipped here; they are filled in by the next full scan.
+    """
+    return [Path(record.path)
+            for record in scan_images(root, recursive=recursive, with_hash=False)]
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='DenteScope AI - Dataset Scanner')
+    parser.add_argument('root', help='Corpus directory to scan')
+    parser.add_argument('--no-recursive', action='store_true', help='Only scan the top level')
+    parser.add_argument('--no-hash', action='store_true', help='Skip content hashes')
+    parser.add_argument('--json', action='store_true', help='Print the index as JSON lines')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = DatasetIndex(args.root)
+    records = index.scan(recursive=not args.no_recursive, with_hash=not args.no_hash)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        for record in records:
+            print(json.dumps(record._asdict()))
+        return
+
+    total_bytes = sum(r.size for r in records)
+    by_ext = {}
+    for r in records:
+        ext = os.path.splitext(r.path)[1].lower()
+        by_ext[ext] = by_ext.get(ext, 0) + 1
+
+    print(f"📸 {len(records)} images ({total_bytes / 1e6:.1f} MB) in {index.root}")
+    for ext, count in sorted(by_ext.items()):
+        print(f"   {ext:6s} {count}")
+    print(f"⏱️  {elapsed * 1000:.1f} ms "
+          f"({index.stats['cached']} cached, {index.stats['indexed']} indexed, "
+          f"{index.stats['removed']} removed)")
+
+
+if __name__ == '__main__':
+    main()
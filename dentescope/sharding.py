@@ -0,0 +1,142 @@
+"""
+DenteScope AI - Sharding
+Split a corpus into N stable shards and track per-shard outputs
+
+Shard membership depends only on the image path relative to the corpus
+root, so every machine computes the same partition without coordination.
+Each shard writes its partial results plus a small JSON manifest; the
+manifest is written last and marks the shard as complete.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+SHARD_DIR = 'shards'
+
+
+def parse_shard_spec(spec: str) -> Tuple[List[int], int]:
+    """
+    Parse a shard spec.
+
+    Accepted forms: 'i/N', 'i-j/N' (inclusive range) and 'i,j,k/N'.
+
+    Returns:
+        (shard indices, shard count)
+    """
+    try:
+        indices_part, count_part = spec.split('/')
+        count = int(count_part)
+        indices = []
+        for part in indices_part.split(','):
+            if '-' in part:
+                start, end = part.split('-')
+                indices.extend(range(int(start), int(end) + 1))
+            else:
+                indices.append(int(part))
+    except ValueError:
+        raise ValueError(f"Invalid shard spec '{spec}', expected i/N, i-j/N or i,j/N")
+
+    if count < 1 or any(i < 0 or i >= count for i in indices):
+        raise ValueError(f"Shard indices in '{spec}' must be in 0..{count - 1}")
+    return sorted(set(indices)), count
+
+
+def shard_key(path, root=None) -> str:
+    """Stable key for a path: POSIX path relative to root (or the bare name)"""
+    path = Path(path)
+    if root is not None:
+        try:
+            return path.resolve().relative_to(Path(root).resolve()).as_posix()
+        except ValueError:
+            pass
+    return path.name
+
+
+def shard_of(key: str, count: int) -> int:
+    """Shard index for a key; identical on every machine and Python run"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count
+
+
+def select_shard(paths: Sequence, index: int, count: int, root=None) -> list:
+    """Paths that belong to shard `index` of `count`"""
+    if count == 1:
+        return list(paths)
+    return [p for p in paths if shard_of(shard_key(p, root), count) == index]
+
+
+def shard_name(index: int, count: int) -> str:
+    width = len(str(count - 1))
+    return f"shard-{index:0{width}d}-of-{count}"
+
+
+def shard_paths(output_dir, index: int, count: int, suffix: str = '.csv') -> Tuple[Path, Path]:
+    """(data file, manifest file) for one shard under output_dir/shards/"""
+    base = Path(output_dir) / SHARD_DIR / shard_name(index, count)
+    return base.with_suffix(suffix), base.with_suffix('.json')
+
+
+def is_shard_complete(output_dir, index: int, count: int) -> bool:
+    _, manifest_path = shard_paths(output_dir, index, count)
+    return manifest_path.exists()
+
+
+def write_manifest(manifest_path: Path, manifest: Dict):
+    """Write a shard manifest atomically; its presence marks the shard complete"""
+    manifest = dict(manifest, completed=datetime.now().isoformat())
+    tmp_path = manifest_path.with_suffix(f'.tmp{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def collect_shards(output_dir) -> Tuple[int, List[Dict], List[int]]:
+    """
+    Find shard manifests under output_dir/shards/.
+
+    Returns:
+        (shard count, manifests of complete shards sorted by index,
+         indices of missing shards)
+
+    Raises:
+        ValueError: no shards found, or shards from different shard counts
+    """
+    shard_dir = Path(output_dir) / SHARD_DIR
+    manifests = []
+    for manifest_path in sorted(shard_dir.glob('shard-*-of-*.json')):
+        with open(manifest_path) as f:
+            manifests.append(json.load(f))
+
+    if not manifests:
+        raise ValueError(f"No completed shards found in {shard_dir}")
+    counts = {m['shard_count'] for m in manifests}
+    if len(counts) > 1:
+        raise ValueError(f"Shards from different partitions found: N = {sorted(counts)}")
+
+    count = counts.pop()
+    manifests.sort(key=lambda m: m['shard_index'])
+    done = {m['shard_index'] for m in manifests}
+    missing = [i for i in range(count) if i not in done]
+    return count, manifests, missing
+
+
+def format_shard_spec(indices: Sequence[int], count: int) -> str:
+    """Compact shard spec for a set of indices, e.g. [1, 2, 3, 7] -> '1-3,7/N'"""
+    parts = []
+    indices = sorted(indices)
+    start = prev = None
+    for i in indices:
+        if start is None:
+            start = prev = i
+        elif i == prev + 1:
+            prev = i
+        else:
+            parts.append(f"{start}-{prev}" if prev > start else f"{start}")
+            start = prev = i
+    if start is not None:
+        parts.append(f"{start}-{prev}" if prev > start else f"{start}")
+    return f"{','.join(parts)}/{count}"
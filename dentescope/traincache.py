@@ -0,0 +1,267 @@
+"""
+DenteScope AI - Training Image Cache
+Persistent, memory-mapped cache of resized training images
+
+ultralytics' cache=True decodes and resizes every image into the RAM of
+each training process, and throws the result away when the run ends.
+This cache does the work once per (dataset, imgsz): images are resized
+exactly like ultralytics' load_image (long side = imgsz, INTER_LINEAR),
+placed top-left in fixed imgsz x imgsz uint8 slots of one flat file, and
+memory-mapped read-only by every later run and dataloader worker, so they
+all share the same page-cache copy.
+
+Labels are not duplicated here; ultralytics already keeps them in its
+persistent labels.cache next to the label files.
+
+Layout of <cache_dir>/train/<key>/:
+    images.u8     uint8 (N, imgsz, imgsz, 3) BGR slots
+    shapes.npy    int32 (N, 4): original h, w and resized h, w
+    meta.json     files, imgsz, created; written last (marks the cache valid)
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import colorstr
+from ultralytics.utils.torch_utils import de_parallel
+
+from dentescope.scanner import default_cache_dir
+
+CACHE_VERSION = 1
+CACHE_SUBDIR = 'train'
+
+
+def dataset_key(image_files: Sequence, imgsz: int) -> str:
+    """Cache key for an ordered image list at one input size (paths, sizes, mtimes)"""
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f"v{CACHE_VERSION}:{imgsz}\n".encode())
+    for path in image_files:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return f"{imgsz}-{digest.hexdigest()}"
+
+
+def resize_image(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """Resize so the long side is imgsz (same rounding as ultralytics' load_image)"""
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    return image
+
+
+class ImageCache:
+    """
+    Read-only view of a built cache.
+
+    Picklable without copying data: the memory maps are reopened lazily in
+    each process (dataloader workers started with spawn).
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        with open(self.directory / 'meta.json') as f:
+            self.meta = json.load(f)
+        self.imgsz = self.meta['imgsz']
+        self._images = None
+        self._shapes = None
+
+    def __getstate__(self):
+        return {'directory': self.directory, 'meta': self.meta, 'imgsz': self.imgsz,
+                '_images': None, '_shapes': None}
+
+    def __len__(self):
+        return len(self.meta['files'])
+
+    def _open(self):
+        n = len(self)
+        self._images = np.memmap(self.directory / 'images.u8', dtype=np.uint8, mode='r',
+                                 shape=(n, self.imgsz, self.imgsz, 3))
+        self._shapes = np.load(self.directory / 'shapes.npy', mmap_mode='r')
+
+    def load(self, i: int):
+        """(image copy, (h0, w0), (h, w)) for row i, as ultralytics' load_image returns"""
+        if self._images is None:
+            self._open()
+        h0, w0, h, w = (int(v) for v in self._shapes[i])
+        # Copy: augmentations may write into the array and the map is read-only
+        return np.ascontiguousarray(self._images[i, :h, :w]), (h0, w0), (h, w)
+
+    @classmethod
+    def build(cls, image_files: Sequence, imgsz: int, cache_dir=None,
+              workers: Optional[int] = None, prefix: str = '') -> Optional['ImageCache']:
+        """
+        Open the cache for these images, building it first if needed.
+
+        Args:
+            image_files: Ordered image paths (row i = image_files[i])
+            imgsz: Training input size
+            cache_dir: Cache root (default: default_cache_dir())
+            workers: Decode threads (default: all cores)
+            prefix: Log prefix
+
+        Returns:
+            ImageCache, or None if there is not enough free disk space
+        """
+        root = Path(cache_dir or default_cache_dir()) / CACHE_SUBDIR
+        directory = root / dataset_key(image_files, imgsz)
+        if (directory / 'meta.json').exists():
+            print(f"{prefix}⚡ Using image cache {directory}")
+            return cls(directory)
+
+        n = len(image_files)
+        needed = n * imgsz * imgsz * 3
+        root.mkdir(parents=True, exist_ok=True)
+        free = shutil.disk_usage(root).free
+        if needed * 1.05 > free:
+            print(f"{prefix}⚠️  Image cache needs {needed / 1e9:.1f} GB, only "
+                  f"{free / 1e9:.1f} GB free in {root}; training without it")
+            return None
+
+        print(f"{prefix}📦 Building image cache for {n} images at {imgsz}px "
+              f"({needed / 1e9:.2f} GB) in {directory}")
+        tmp = root / f"{directory.name}.tmp{os.getpid()}"
+        tmp.mkdir(parents=True, exist_ok=True)
+        try:
+            images = np.memmap(tmp / 'images.u8', dtype=np.uint8, mode='w+',
+                               shape=(n, imgsz, imgsz, 3))
+            shapes = np.zeros((n, 4), dtype=np.int32)
+
+            def fill(i):
+                image = cv2.imread(str(image_files[i]))  # BGR, like ultralytics
+                if image is None:
+                    raise FileNotFoundError(f"Image Not Found {image_files[i]}")
+                h0, w0 = image.shape[:2]
+                image = resize_image(image, imgsz)
+                h, w = image.shape[:2]
+                images[i, :h, :w] = image
+                shapes[i] = (h0, w0, h, w)
+
+            # cv2 releases the GIL in imread/resize, so threads scale
+            with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                list(pool.map(fill, range(n)))
+            images.flush()
+            del images
+            np.save(tmp / 'shapes.npy', shapes)
+            with open(tmp / 'meta.json', 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'imgsz': imgsz,
+                           'files': [os.path.abspath(p) for p in image_files],
+                           'created': datetime.now().isoformat()}, f)
+            try:
+                os.rename(tmp, directory)
+            except OSError:
+                # Another process finished the same cache first
+                if not (directory / 'meta.json').exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        return cls(directory)
+
+
+def list_caches(cache_dir=None) -> List[dict]:
+    """Built caches under cache_dir with their size on disk"""
+    root = Path(cache_dir or default_cache_dir()) / CACHE_SUBDIR
+    caches = []
+    for meta_path in sorted(root.glob('*/meta.json')):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        size = sum(p.stat().st_size for p in meta_path.parent.iterdir())
+        caches.append({'key': meta_path.parent.name, 'images': len(meta['files']),
+                       'imgsz': meta['imgsz'], 'bytes': size, 'created': meta['created']})
+    return caches
+
+
+class CachedYOLODataset(YOLODataset):
+    """YOLODataset that reads resized images from an ImageCache"""
+
+    def __init__(self, *args, cache_dir=None, cache_workers=None, **kwargs):
+        kwargs['cache'] = False  # replaces ultralytics' own RAM/disk cache
+        super().__init__(*args, **kwargs)
+        self.image_cache = ImageCache.build(self.im_files, self.imgsz, cache_dir,
+                                            cache_workers, prefix=self.prefix)
+
+    def load_image(self, i, rect_mode=True):
+        if self.image_cache is None or not rect_mode:
+            return super().load_image(i, rect_mode)
+        image, hw0, hw = self.image_cache.load(i)
+        # Mosaic samples partner images from the buffer of recent indices
+        if self.augment:
+            self.buffer.append(i)
+            if len(self.buffer) >= self.max_buffer_length:
+                self.buffer.pop(0)
+        return image, hw0, hw
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """DetectionTrainer whose train/val datasets use the memory-mapped image cache"""
+
+    cache_dir = None
+    cache_workers = None
+
+    @classmethod
+    def configured(cls, cache_dir=None, workers=None):
+        """Trainer class bound to a cache location (pass as YOLO.train(trainer=...))"""
+        return type(cls.__name__, (cls,), {'cache_dir': cache_dir, 'cache_workers': workers})
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        # Same arguments as ultralytics.data.build.build_yolo_dataset
+        cfg = self.args
+        stride = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+        return CachedYOLODataset(
+            img_path=img_path,
+            imgsz=cfg.imgsz,
+            batch_size=batch,
+            augment=mode == 'train',
+            hyp=cfg,
+            rect=cfg.rect or mode == 'val',
+            single_cls=cfg.single_cls or False,
+            stride=int(stride),
+            pad=0.0 if mode == 'train' else 0.5,
+            prefix=colorstr(f'{mode}: '),
+            use_segments=cfg.task == 'segment',
+            use_keypoints=cfg.task == 'pose',
+            classes=cfg.classes,
+            data=self.data,
+            fraction=cfg.fraction if mode == 'train' else 1.0,
+            cache_dir=self.cache_dir,
+            cache_workers=self.cache_workers
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='DenteScope AI - Training Image Cache')
+    parser.add_argument('--cache-dir', default=None, help='Cache root (default: ~/.cache/dentescope)')
+    parser.add_argument('--clear', action='store_true', help='Delete all training image caches')
+    args = parser.parse_args()
+
+    root = Path(args.cache_dir or default_cache_dir()) / CACHE_SUBDIR
+    caches = list_caches(args.cache_dir)
+    if args.clear:
+        shutil.rmtree(root, ignore_errors=True)
+        print(f"🗑️  Removed {len(caches)} caches from {root}")
+        return
+
+    print(f"📂 {root}")
+    for cache in caches:
+        print(f"   • {cache['key']}: {cache['images']} images at {cache['imgsz']}px, "
+              f"{cache['bytes'] / 1e9:.2f} GB ({cache['created'][:19]})")
+    print(f"   {len(caches)} caches, {sum(c['bytes'] for c in caches) / 1e9:.2f} GB total")
+
+
+if __name__ == '__main__':
+    main()
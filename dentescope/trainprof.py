@@ -0,0 +1,250 @@
+"""
+DenteScope AI - Training Profiler
+Per-epoch breakdown of where training time goes, via ultralytics callbacks
+
+For every epoch the profiler records:
+    data_wait   time the training loop blocked on the dataloader
+    augment     time spent in dataset transforms (mosaic, affine, HSV, ...)
+                inside the dataloader workers, summed over images
+    preprocess  batch transfer + normalization in the main process
+    step        forward, backward and optimizer step
+    validation  time between the end of training and the end of validation
+plus images/second, peak memory and worker/batch suggestions. Results are
+written to profile.json beside results.csv after every epoch.
+
+Enable with train_tooth_model.py --profile, or:
+
+    profiler = TrainingProfiler()
+    for event, callback in profiler.callbacks().items():
+        model.add_callback(event, callback)
+"""
+
+import json
+import math
+import os
+import time
+
+from dentescope.perf import current_rss_mb, peak_rss_mb
+
+# Thresholds for suggestions
+DATA_BOUND_FRACTION = 0.15    # data_wait share of the training loop
+GPU_HEADROOM_FRACTION = 0.5   # peak CUDA memory share before suggesting a bigger batch
+
+
+class TimedTransforms:
+    """Wrap a dataset's transforms and stamp each sample with its transform time"""
+
+    def __init__(self, transforms):
+        self.transforms = transforms
+
+    def __call__(self, labels):
+        start = time.perf_counter()
+        labels = self.transforms(labels)
+        labels['profile_augment_ms'] = (time.perf_counter() - start) * 1000
+        return labels
+
+    def __getattr__(self, name):
+        # Keep ultralytics' own transform attributes reachable. Unpickling and
+        # deepcopy look up __setstate__ before transforms is set
+        if name == 'transforms':
+            raise AttributeError(name)
+        return getattr(self.transforms, name)
+
+
+def _wrap_transforms(dataset):
+    if not isinstance(dataset.transforms, TimedTransforms):
+        dataset.transforms = TimedTransforms(dataset.transforms)
+
+
+class TrainingProfiler:
+    """Collects per-epoch timings from trainer callbacks and writes profile.json"""
+
+    def __init__(self, filename='profile.json'):
+        self.filename = filename
+        self.epochs = []
+        self.trainer = None
+        self._reset()
+
+    def callbacks(self):
+        """{event: callback} for YOLO.add_callback"""
+        return {
+            'on_pretrain_routine_start': self.on_pretrain_routine_start,
+            'on_pretrain_routine_end': self.on_pretrain_routine_end,
+            'on_train_epoch_start': self.on_train_epoch_start,
+            'on_train_batch_start': self.on_train_batch_start,
+            'on_train_batch_end': self.on_train_batch_end,
+            'on_train_epoch_end': self.on_train_epoch_end,
+            'on_fit_epoch_end': self.on_fit_epoch_end,
+        }
+
+    def _reset(self):
+        self.data_wait = self.step = self.preprocess = 0.0
+        self.augment_ms = []
+        self.images = self.batches = 0
+        self.epoch_start = self.last_batch_end = self.step_start = None
+        self.train_end = None
+
+    def _sync(self):
+        # CUDA runs asynchronously; synchronize so step time is not billed to data_wait
+        import torch
+        if torch.cuda.is_available() and self.trainer.device.type == 'cuda':
+            torch.cuda.synchronize(self.trainer.device)
+
+    # --- setup -----------------------------------------------------------
+
+    def on_pretrain_routine_start(self, trainer):
+        self.trainer = trainer
+        build_dataset = trainer.build_dataset
+        preprocess_batch = trainer.preprocess_batch
+
+        def profiled_build_dataset(img_path, mode='train', batch=None):
+            dataset = build_dataset(img_path, mode=mode, batch=batch)
+            if mode == 'train':
+                _wrap_transforms(dataset)  # before the loader starts its workers
+            return dataset
+
+        def profiled_preprocess_batch(batch):
+            start = time.perf_counter()
+            augment = batch.pop('profile_augment_ms', None)
+            if augment is not None:
+                self.augment_ms.extend(augment)
+            batch = preprocess_batch(batch)
+            self._sync()
+            self.preprocess += time.perf_counter() - start
+            self.images += len(batch['img'])
+            return batch
+
+        trainer.build_dataset = profiled_build_dataset
+        trainer.preprocess_batch = profiled_preprocess_batch
+
+    def on_pretrain_routine_end(self, trainer):
+        # close_mosaic rebuilds the transforms just before restarting the workers
+        loader = trainer.train_loader
+        reset = loader.reset
+
+        def profiled_reset():
+            _wrap_transforms(loader.dataset)
+            reset()
+
+        loader.reset = profiled_reset
+
+    # --- per batch -------------------------------------------------------
+
+    def on_train_epoch_start(self, trainer):
+        self._reset()
+        self.epoch_start = self.last_batch_end = time.perf_counter()
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def on_train_batch_start(self, trainer):
+        now = time.perf_counter()
+        self.data_wait += now - self.last_batch_end
+        self.step_start = now
+
+    def on_train_batch_end(self, trainer):
+        self._sync()
+        now = time.perf_counter()
+        self.step += now - self.step_start
+        self.batches += 1
+        self.last_batch_end = now
+
+    # --- per epoch -------------------------------------------------------
+
+    def on_train_epoch_end(self, trainer):
+        self.train_end = time.perf_counter()
+
+    def on_fit_epoch_end(self, trainer):
+        if self.train_end is None:
+            return  # final validation of best.pt re-fires this callback
+        now = time.perf_counter()
+        step = self.step - self.preprocess  # preprocess runs inside the step window
+        loop = self.data_wait + self.step
+        augment_total = sum(self.augment_ms) / 1000
+        record = {
+            'epoch': trainer.epoch + 1,
+            'batches': self.batches,
+            'images': self.images,
+            'train_s': round(self.train_end - self.epoch_start, 3),
+            'data_wait_s': round(self.data_wait, 3),
+            'preprocess_s': round(self.preprocess, 3),
+            'step_s': round(step, 3),
+            'validation_s': round(now - self.train_end, 3),
+            'data_wait_fraction': round(self.data_wait / loop, 4) if loop else None,
+            'augment_cpu_s': round(augment_total, 3) if self.augment_ms else None,
+            'augment_ms_per_image': (round(augment_total * 1000 / len(self.augment_ms), 2)
+                                     if self.augment_ms else None),
+            'images_per_s': round(self.images / loop, 2) if loop else None,
+            'step_ms_per_batch': round(step * 1000 / self.batches, 2) if self.batches else None,
+            'rss_mb': round(current_rss_mb(), 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+        import torch
+        if torch.cuda.is_available() and trainer.device.type == 'cuda':
+            record['peak_cuda_mb'] = round(torch.cuda.max_memory_allocated(trainer.device) / 2**20, 1)
+        self.epochs.append(record)
+        self.train_end = None
+        self.write(trainer)
+
+    # --- report ----------------------------------------------------------
+
+    def suggestions(self, trainer):
+        """Worker/batch suggestions from the most recent epochs"""
+        recent = [e for e in self.epochs[-3:] if e['batches']]
+        if not recent:
+            return {}
+        workers = trainer.train_loader.num_workers
+        batch = trainer.batch_size
+        cpus = os.cpu_count() or 1
+        wait = sum(e['data_wait_fraction'] or 0 for e in recent) / len(recent)
+        augment = [e['augment_ms_per_image'] for e in recent if e['augment_ms_per_image']]
+        step_ms = sum(e['step_ms_per_batch'] for e in recent) / len(recent)
+
+        notes = []
+        suggested_workers, suggested_batch = workers, batch
+        if augment:
+            # Workers needed so one batch is augmented while one step runs
+            needed = math.ceil(sum(augment) / len(augment) * batch / max(step_ms, 1e-6) * 1.2)
+            suggested_workers = max(1, min(needed, cpus))
+        if wait > DATA_BOUND_FRACTION:
+            notes.append(f"Data-bound: {wait:.0%} of the loop waits on the dataloader; "
+                         f"raise workers from {workers} to {suggested_workers}"
+                         + (" (augmentation dominates; consider lighter mosaic/affine)"
+                            if augment and suggested_workers >= cpus else ''))
+        elif augment and suggested_workers < workers:
+            notes.append(f"Compute-bound: {suggested_workers} workers keep up; the other "
+                         f"{workers - suggested_workers} could go to torch threads")
+        else:
+            suggested_workers = workers
+            notes.append("Compute-bound: dataloading keeps up with the model")
+
+        peak_cuda = recent[-1].get('peak_cuda_mb')
+        if peak_cuda is not None:
+            import torch
+            total = torch.cuda.get_device_properties(trainer.device).total_memory / 2**20
+            if peak_cuda < total * GPU_HEADROOM_FRACTION and wait <= DATA_BOUND_FRACTION:
+                suggested_batch = batch * 2
+                notes.append(f"GPU memory peak {peak_cuda:.0f}/{total:.0f} MB; "
+                             f"batch {suggested_batch} should fit")
+        return {'workers': suggested_workers, 'batch': suggested_batch,
+                'data_wait_fraction': round(wait, 4), 'notes': notes}
+
+    def write(self, trainer):
+        """Write profile.json into the run directory (beside results.csv)"""
+        report = {
+            'config': {
+                'batch': trainer.batch_size,
+                'workers': trainer.train_loader.num_workers,
+                'imgsz': trainer.args.imgsz,
+                'device': str(trainer.device),
+                'cpus': os.cpu_count(),
+            },
+            'epochs': self.epochs,
+            'suggestions': self.suggestions(trainer),
+        }
+        path = trainer.save_dir / self.filename
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
@@ -1,70 +1,67 @@
 #!/usr/bin/env python3
 """
 Download sample dental images from dentescope-ai repository
+
+Files are fetched concurrently and resumably by dentescope.download;
+re-running skips images that are already present and unchanged. Point
+--url (or $DENTESCOPE_MIRROR) at a local mirror to provision without GitHub.
 """
 
 import os
-import requests
 from pathlib import Path
 from tqdm import tqdm
 
-# GitHub repository information
-REPO_OWNER = "ajeetraina"
-REPO_NAME = "dentescope-ai"
-SAMPLES_PATH = "data/samples"
-API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{SAMPLES_PATH}"
+from dentescope.download import GITHUB_SAMPLES_URL, Downloader, list_remote
 
-def download_samples(output_dir="./data/raw"):
+def download_samples(output_dir="./data/raw", url=None, workers=8):
     """
     Download all sample dental images from the repository
+
+    Args:
+        output_dir: Destination directory
+        url: GitHub contents API URL, JSON manifest or mirror directory
+             (default: $DENTESCOPE_MIRROR or the GitHub samples)
+        workers: Concurrent downloads
     """
+    url = url or os.environ.get('DENTESCOPE_MIRROR', GITHUB_SAMPLES_URL)
     output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
     
     print("=" * 60)
     print("Downloading Sample Dental Images")
     print("=" * 60)
     
-    # Get list of files from GitHub API
-    print(f"\n📡 Fetching file list from {REPO_NAME}...")
-    response = requests.get(API_URL)
-    response.raise_for_status()
-    
-    files = response.json()
-    
-    # Filter only image files
-    image_extensions = {'.jpg', '.jpeg', '.png', '.tif', '.tiff'}
-    image_files = [f for f in files if Path(f['name']).suffix.lower() in image_extensions]
+    # Get list of files (GitHub API or mirror)
+    downloader = Downloader(output_path, workers=workers)
+    print(f"\n📡 Fetching file list from {url}...")
+    image_files = list_remote(url, downloader.session)
     
     print(f"✓ Found {len(image_files)} dental images")
     
-    # Download each file
+    # Download concurrently; unchanged files are skipped
     print(f"\n📥 Downloading images to {output_path}...")
-    for file_info in tqdm(image_files, desc="Downloading"):
-        file_name = file_info['name']
-        download_url = file_info['download_url']
-        
-        file_path = output_path / file_name
-        
-        # Skip if already downloaded
-        if file_path.exists():
-            continue
-        
-        # Download file
-        try:
-            response = requests.get(download_url)
-            response.raise_for_status()
-            
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-        except Exception as e:
-            print(f"⚠️  Error downloading {file_name}: {e}")
+    with tqdm(total=len(image_files), desc="Downloading") as bar:
+        def progress(remote, status, error):
+            if error:
+                tqdm.write(f"⚠️  Error downloading {remote.name}: {error}")
+            bar.update(1)
+
+        counts = downloader.fetch_all(image_files, progress)
     
     print(f"\n✅ Download complete!")
-    print(f"   Downloaded {len(image_files)} images to {output_path}")
-    print(f"   Total patients: 79")
+    print(f"   {counts['downloaded'] + counts['resumed']} downloaded, "
+          f"{counts['skipped']} already up to date, {counts['failed']} failed")
+    print(f"   {len(image_files)} images in {output_path}")
     
     return output_path
 
 if __name__ == "__main__":
-    download_samples()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Download sample dental images')
+    parser.add_argument('--output', default='./data/raw', help='Output directory')
+    parser.add_argument('--url', default=None,
+                        help='GitHub contents API URL, JSON manifest or mirror directory')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent downloads')
+    args = parser.parse_args()
+
+    download_samples(args.output, url=args.url, workers=args.workers)
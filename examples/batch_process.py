@@ -3,56 +3,51 @@
 DenteScope AI - Batch Processing Script
 Process multiple dental X-rays efficiently
 
+Large backfills can be split with --shard i/N: each shard processes the
+images whose path hashes to it and writes a partial result under
+<output>/shards/. Run `batch_process.py merge --output <dir>` once all
+shards are done to build the final CSV, Parquet, Excel and JSON outputs.
+
+pandas, tqdm and ultralytics are imported where they are used, so merge
+and --help start without them.
+
 Author: Ajeet Singh Raina
 Date: November 3, 2025
 """
 
 import argparse
+import csv
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import pandas as pd
-from ultralytics import YOLO
-from tqdm import tqdm
 import json
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from dentescope.metadata import MetadataTable, add_filter_arguments, filters_from_args
+from dentescope.registry import load_model, resolve
+from dentescope.scanner import list_images
+from dentescope import sharding
 
-def batch_process(model_path: str, input_dir: str, output_dir: str, 
-                  conf_threshold: float = 0.25, save_images: bool = True):
-    """
-    Process multiple dental X-rays in batch mode.
-    
-    Args:
-        model_path: Path to trained model weights
-        input_dir: Directory containing input images
-        output_dir: Directory for output results
-        conf_threshold: Confidence threshold for detections
-        save_images: Whether to save annotated images
-    """
-    # Load model
-    print(f"📦 Loading model: {model_path}")
-    model = YOLO(model_path)
-    
-    # Create output directory
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-    
-    if save_images:
-        (output_path / "images").mkdir(exist_ok=True)
-    
-    # Find all images
-    input_path = Path(input_dir)
-    image_files = list(input_path.glob("*.jpg")) + \
-                  list(input_path.glob("*.png")) + \
-                  list(input_path.glob("*.jpeg"))
-    
-    print(f"📸 Found {len(image_files)} images")
+RESULT_FIELDS = [
+    "image", "patient", "age", "sex", "doctor", "study_date",
+    "width_px", "width_mm", "height_px", "height_mm", "confidence",
+    "x1", "y1", "x2", "y2"
+]
+
+
+def process_images(model, image_files, metadata, conf_threshold: float,
+                   output_path: Path, save_images: bool) -> list:
+    """Run detection over image_files and return one row per detected tooth"""
+    from tqdm import tqdm
     
-    # Process images
     results_data = []
     
     for img_path in tqdm(image_files, desc="Processing"):
         # Run inference
         results = model(str(img_path), conf=conf_threshold, verbose=False)
+        meta = metadata.get(img_path)
         
         # Extract results
         for box in results[0].boxes:
@@ -67,7 +62,11 @@ def batch_process(model_path: str, input_dir: str, output_dir: str,
             
             results_data.append({
                 "image": img_path.name,
-                "patient": img_path.stem.split('_')[0],  # Extract patient ID
+                "patient": meta.patient,
+                "age": meta.age,
+                "sex": meta.sex,
+                "doctor": meta.doctor,
+                "study_date": meta.study_date,
                 "width_px": round(width_px, 2),
                 "width_mm": round(width_mm, 2),
                 "height_px": round(height_px, 2),
@@ -84,51 +83,275 @@ def batch_process(model_path: str, input_dir: str, output_dir: str,
             save_path = output_path / "images" / f"annotated_{img_path.name}"
             results[0].save(str(save_path))
     
-    # Save results
-    if results_data:
-        # CSV
-        df = pd.DataFrame(results_data)
-        csv_path = output_path / "batch_results.csv"
-        df.to_csv(csv_path, index=False)
-        print(f"📊 CSV saved: {csv_path}")
-        
-        # Excel
-        excel_path = output_path / "batch_results.xlsx"
-        with pd.ExcelWriter(excel_path) as writer:
-            df.to_excel(writer, sheet_name="Raw Data", index=False)
-            
-            # Summary statistics
-            summary = df[['width_mm', 'height_mm', 'confidence']].describe()
-            summary.to_excel(writer, sheet_name="Statistics")
-        
-        print(f"📈 Excel saved: {excel_path}")
-        
-        # JSON
-        json_path = output_path / "batch_results.json"
-        with open(json_path, 'w') as f:
-            json.dump({
-                "metadata": {
-                    "processed_date": datetime.now().isoformat(),
-                    "model": model_path,
-                    "total_images": len(image_files),
-                    "total_detections": len(results_data)
-                },
-                "results": results_data
-            }, f, indent=2)
-        
-        print(f"📝 JSON saved: {json_path}")
+    return results_data
+
+
+def save_results(df: 'pd.DataFrame', output_path: Path, run_info: dict):
+    """
+    Write the final CSV, Parquet, Excel and JSON outputs and print a summary.
+    
+    Args:
+        df: One row per detection (RESULT_FIELDS columns)
+        output_path: Output directory
+        run_info: Run metadata stored in the JSON (model, filters, total_images, ...)
+    """
+    import pandas as pd
+    
+    if df.empty:
+        print("⚠️  No detections found")
+        return
+    
+    # CSV
+    csv_path = output_path / "batch_results.csv"
+    df.to_csv(csv_path, index=False)
+    print(f"📊 CSV saved: {csv_path}")
+    
+    # Parquet (needs pyarrow or fastparquet)
+    parquet_path = output_path / "batch_results.parquet"
+    try:
+        df.to_parquet(parquet_path, index=False)
+        print(f"🧱 Parquet saved: {parquet_path}")
+    except ImportError:
+        print("⚠️  Parquet skipped (install pyarrow)")
+    
+    # Excel
+    excel_path = output_path / "batch_results.xlsx"
+    summary = df[['width_mm', 'height_mm', 'confidence']].describe()
+    with pd.ExcelWriter(excel_path) as writer:
+        df.to_excel(writer, sheet_name="Raw Data", index=False)
         
-        # Summary
-        print(f"\n🎯 Summary:")
-        print(f"  • Images processed: {len(image_files)}")
-        print(f"  • Total detections: {len(results_data)}")
-        print(f"  • Average confidence: {df['confidence'].mean():.1%}")
-        print(f"  • Mean width: {df['width_mm'].mean():.1f}mm (±{df['width_mm'].std():.2f})")
+        # Summary statistics
+        summary.to_excel(writer, sheet_name="Statistics")
+    
+    print(f"📈 Excel saved: {excel_path}")
+    
+    # JSON
+    json_path = output_path / "batch_results.json"
+    with open(json_path, 'w') as f:
+        json.dump({
+            "metadata": dict(
+                run_info,
+                processed_date=datetime.now().isoformat(),
+                total_detections=len(df)
+            ),
+            "summary": json.loads(summary.to_json()),
+            "results": json.loads(df.to_json(orient="records"))
+        }, f, indent=2)
+    
+    print(f"📝 JSON saved: {json_path}")
+    
+    # Summary
+    print(f"\n🎯 Summary:")
+    print(f"  • Images processed: {run_info['total_images']}")
+    print(f"  • Total detections: {len(df)}")
+    print(f"  • Average confidence: {df['confidence'].mean():.1%}")
+    print(f"  • Mean width: {df['width_mm'].mean():.1f}mm (±{df['width_mm'].std():.2f})")
+
+
+def batch_process(model_path: str, input_dir: str, output_dir: str, 
+                  conf_threshold: float = 0.25, save_images: bool = True,
+                  filters: dict = None, shard: tuple = None, force: bool = False):
+    """
+    Process multiple dental X-rays in batch mode.
+    
+    Args:
+        model_path: Path to trained model weights or registry name
+        input_dir: Directory containing input images
+        output_dir: Directory for output results
+        conf_threshold: Confidence threshold for detections
+        save_images: Whether to save annotated images
+        filters: Cohort filters (age, sex, doctor, patient, since, until)
+        shard: (index, count) to process one shard and write partial output
+        force: Re-run a shard even if it already completed
+    """
+    import pandas as pd
+    
+    # Create output directory
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    if shard:
+        shard_index, shard_count = shard
+        data_path, manifest_path = sharding.shard_paths(output_path, shard_index, shard_count)
+        if manifest_path.exists() and not force:
+            print(f"⏭️  {sharding.shard_name(shard_index, shard_count)} already complete")
+            return
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    if save_images:
+        (output_path / "images").mkdir(exist_ok=True)
+    
+    # Find all images
+    metadata = MetadataTable(list_images(input_dir))
+    image_files = metadata.select(**(filters or {}))
+    if shard:
+        image_files = sharding.select_shard(image_files, shard_index, shard_count, root=input_dir)
+    
+    print(f"📸 Found {len(image_files)} images")
+    if filters:
+        print(f"   Cohort: {filters} ({len(image_files)}/{len(metadata)} images)")
+    if shard:
+        print(f"   Shard: {sharding.shard_name(shard_index, shard_count)}")
+    
+    # Load model
+    model_path = resolve(model_path)
+    print(f"📦 Loading model: {model_path}")
+    model = load_model(model_path)
+    
+    # Process images
+    results_data = process_images(model, image_files, metadata, conf_threshold,
+                                  output_path, save_images)
+    
+    run_info = {
+        "model": model_path,
+        "input": str(input_dir),
+        "filters": filters or {},
+        "total_images": len(image_files)
+    }
+    
+    if shard:
+        # Partial output; the manifest is written last and marks completion
+        tmp_path = data_path.with_suffix(".csv.tmp")
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results_data)
+        tmp_path.replace(data_path)
+        sharding.write_manifest(manifest_path, dict(
+            run_info,
+            shard_index=shard_index,
+            shard_count=shard_count,
+            data_file=data_path.name,
+            total_detections=len(results_data)
+        ))
+        print(f"🧩 Shard saved: {data_path} ({len(results_data)} detections)")
+        return
+    
+    # Save results
+    save_results(pd.DataFrame(results_data, columns=RESULT_FIELDS), output_path, run_info)
+
+
+def _run_shard(kwargs: dict, shard: tuple, threads: int):
+    """Process-pool entry point for one local shard"""
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    batch_process(shard=shard, **kwargs)
+    return shard
+
+
+def run_shards(indices: list, count: int, jobs: int = None, threads: int = None, **kwargs):
+    """
+    Run several shards of one partition on this machine in parallel processes.
+    
+    Args:
+        indices: Shard indices to run
+        count: Total number of shards in the partition
+        jobs: Concurrent shard processes (default: min(len(indices), CPU count))
+        threads: Torch threads per shard process (default: CPU count / jobs)
+        **kwargs: Passed through to batch_process
+    
+    Returns:
+        Indices of the shards that failed
+    """
+    cpus = multiprocessing.cpu_count()
+    jobs = jobs or min(len(indices), cpus)
+    threads = threads or max(1, cpus // jobs)
+    
+    failed = []
+    if jobs == 1:
+        for index in indices:
+            try:
+                _run_shard(kwargs, (index, count), threads)
+            except Exception as e:
+                print(f"❌ {sharding.shard_name(index, count)} failed: {e}")
+                failed.append(index)
     else:
-        print("⚠️  No detections found")
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+            futures = {pool.submit(_run_shard, kwargs, (i, count), threads): i for i in indices}
+            for future, index in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ {sharding.shard_name(index, count)} failed: {e}")
+                    failed.append(index)
+    
+    if failed:
+        print(f"\n🔁 Re-run failed shards with: --shard {sharding.format_shard_spec(failed, count)}")
+    return failed
 
 
-def main():
+def merge_shards(output_dir: str) -> 'pd.DataFrame':
+    """
+    Combine completed shard outputs into the final results.
+    
+    Args:
+        output_dir: Output directory the shards were written to
+    
+    Returns:
+        Merged DataFrame, or None if shards are missing
+    """
+    output_path = Path(output_dir)
+    count, manifests, missing = sharding.collect_shards(output_path)
+    
+    print(f"🧩 {len(manifests)}/{count} shards complete")
+    if missing:
+        print(f"❌ Missing shards: {sharding.format_shard_spec(missing, count)}")
+        print(f"   Re-run them with: --shard {sharding.format_shard_spec(missing, count)}")
+        return None
+    
+    import pandas as pd
+    
+    shard_dir = output_path / sharding.SHARD_DIR
+    frames = [pd.read_csv(shard_dir / m["data_file"]) for m in manifests]
+    df = pd.concat(frames, ignore_index=True)
+    
+    first = manifests[0]
+    run_info = {
+        "model": first["model"],
+        "input": first["input"],
+        "filters": first["filters"],
+        "total_images": sum(m["total_images"] for m in manifests),
+        "shards": count
+    }
+    save_results(df, output_path, run_info)
+    return df
+
+
+def merge_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="batch_process.py merge",
+        description="DenteScope AI - Merge batch processing shards"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="results/batch",
+        help="Output directory the shards were written to"
+    )
+    args = parser.parse_args(argv)
+    
+    print("="*60)
+    print("🧩 DenteScope AI - Merge Shards")
+    print("="*60)
+    
+    try:
+        merged = merge_shards(args.output)
+    except ValueError as e:  # no shards, or shards from different partitions
+        print(f"❌ {e}")
+        sys.exit(1)
+    if merged is None:
+        sys.exit(1)
+    
+    print("\n✅ Merge complete!")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == "merge":
+        return merge_main(argv[1:])
+    
     parser = argparse.ArgumentParser(
         description="DenteScope AI - Batch Processing"
     )
@@ -136,7 +359,7 @@ def main():
         "--model",
         type=str,
         default="runs/train/tooth_detection3/weights/best.pt",
-        help="Path to model weights"
+        help="Path to model weights or registry name"
     )
     parser.add_argument(
         "--input",
@@ -161,21 +384,63 @@ def main():
         action="store_true",
         help="Don't save annotated images"
     )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        help="Process only shard(s) i/N, i-j/N or i,j/N, then run 'merge'"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Local shard processes when several shards are given"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Torch threads per shard process"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-run shards that already completed"
+    )
+    add_filter_arguments(parser)
+    
+    args = parser.parse_args(argv)
     
-    args = parser.parse_args()
+    shard_indices = None
+    if args.shard:
+        try:
+            shard_indices, shard_count = sharding.parse_shard_spec(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
     
     print("="*60)
     print("🦷 DenteScope AI - Batch Processing")
     print("="*60)
     
-    batch_process(
+    kwargs = dict(
         model_path=args.model,
         input_dir=args.input,
         output_dir=args.output,
         conf_threshold=args.conf,
-        save_images=not args.no_save_images
+        save_images=not args.no_save_images,
+        filters=filters_from_args(args),
+        force=args.force
     )
     
+    if shard_indices is None:
+        batch_process(**kwargs)
+    elif len(shard_indices) == 1:
+        batch_process(shard=(shard_indices[0], shard_count), **kwargs)
+    else:
+        failed = run_shards(shard_indices, shard_count, jobs=args.jobs, threads=args.threads, **kwargs)
+        if failed:
+            print(f"\n❌ {len(failed)}/{len(shard_indices)} shards failed")
+            sys.exit(1)
+    
     print("\n✅ Batch processing complete!")
 
 
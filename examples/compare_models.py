@@ -3,71 +3,123 @@
 DenteScope AI - Model Comparison Script
 Compare performance of different model versions
 
+numpy, pandas, torch, ultralytics and the plotting libraries are imported
+inside the functions that use them, so --help starts immediately.
+
 Author: Ajeet Singh Raina
 Date: November 3, 2025
 """
 
 import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
-import pandas as pd
-from ultralytics import YOLO
-import matplotlib.pyplot as plt
-import seaborn as sns
-from tqdm import tqdm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from dentescope.perf import current_rss_mb, peak_rss_mb, summarize_latencies
+from dentescope.registry import display_name, load_model, resolve
+from dentescope.scanner import list_images
 
 
-def compare_models(model_paths: list, test_images: str, output_dir: str):
+def compare_models(model_paths: list, test_images: str, output_dir: str,
+                   batch_size: int = 8, conf: float = 0.25, iou: float = 0.7,
+                   device: str = 'cpu', imgsz: int = None, match_iou: float = 0.5):
     """
     Compare multiple models on the same test set.
     
+    Images are decoded once per chunk and letterboxed once per distinct
+    model input size; every model then runs on the shared batch, so
+    comparing N checkpoints costs N forward passes, not N decodes.
+    
     Args:
-        model_paths: List of paths to model weights
+        model_paths: List of paths to model weights or registry names
         test_images: Directory containing test images
         output_dir: Directory for comparison results
+        batch_size: Images per decode chunk / forward pass
+        conf: Confidence threshold
+        iou: NMS IoU threshold
+        device: Torch device ('cpu', '0', ...)
+        imgsz: Override the input size stored in each checkpoint
+        match_iou: IoU threshold for the box-level agreement analysis
     """
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+    from tqdm import tqdm
+
+    from dentescope.inference import (decode_images, detect_batch, letterbox_batch,
+                                      load_network, model_input_size, resolve_device)
+    from dentescope.matching import load_yolo_labels
+
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
+    torch_device = resolve_device(device)
     
     # Load all models
     models = {}
-    for model_path in model_paths:
-        model_name = Path(model_path).parent.parent.name
+    input_sizes = {}
+    for ref in model_paths:
+        model_name, model_path = display_name(ref), resolve(ref)
         print(f"📦 Loading {model_name}: {model_path}")
-        models[model_name] = YOLO(model_path)
+        model = load_model(model_path)
+        models[model_name] = load_network(model, torch_device)
+        input_sizes[model_name] = imgsz or model_input_size(model)
     
     # Find test images
-    test_path = Path(test_images)
-    image_files = list(test_path.glob("*.jpg")) + list(test_path.glob("*.png"))
-    print(f"📸 Found {len(image_files)} test images\n")
+    image_files = list_images(test_images)
+    print(f"📸 Found {len(image_files)} test images")
+    print(f"🧮 Input sizes: {sorted(set(input_sizes.values()))}\n")
     
     # Compare models
     comparison_data = []
+    image_names = []
+    ground_truth = []
+    model_boxes = {model_name: [] for model_name in models}
     
-    for img_path in tqdm(image_files, desc="Testing"):
-        for model_name, model in models.items():
-            # Run inference
-            results = model(str(img_path), verbose=False)
-            
-            # Extract metrics
-            num_detections = len(results[0].boxes)
-            avg_conf = 0
-            avg_width = 0
+    for start in tqdm(range(0, len(image_files), batch_size), desc="Testing"):
+        chunk = image_files[start:start + batch_size]
+        decoded = [(p, img) for p, img in zip(chunk, decode_images(chunk)) if img is not None]
+        if not decoded:
+            continue
+        paths = [p for p, _ in decoded]
+        images = [img for _, img in decoded]
+        shapes = [img.shape[:2] for img in images]
+        image_names.extend(p.name for p in paths)
+        ground_truth.extend(load_yolo_labels(p, shape) for p, shape in zip(paths, shapes))
+        
+        # Preprocess once per distinct input size
+        batches = {}
+        for size in set(input_sizes.values()):
+            tensor, transforms = letterbox_batch(images, size)
+            batches[size] = (tensor.to(torch_device), transforms)
+        
+        for model_name, net in models.items():
+            tensor, transforms = batches[input_sizes[model_name]]
+            detections = detect_batch(net, tensor, transforms, shapes, conf, iou)
+            model_boxes[model_name].extend(d[:2] for d in detections)
             
-            if num_detections > 0:
-                confidences = [box.conf[0].item() for box in results[0].boxes]
-                widths = [box.xyxy[0][2].item() - box.xyxy[0][0].item() 
-                         for box in results[0].boxes]
+            for img_path, (boxes, confidences, _) in zip(paths, detections):
+                # Extract metrics
+                num_detections = len(boxes)
+                avg_conf = 0
+                avg_width = 0
                 
-                avg_conf = sum(confidences) / len(confidences)
-                avg_width = sum(widths) / len(widths)
-            
-            comparison_data.append({
-                "model": model_name,
-                "image": img_path.name,
-                "detections": num_detections,
-                "avg_confidence": avg_conf,
-                "avg_width_px": avg_width
-            })
+                if num_detections > 0:
+                    avg_conf = float(confidences.mean())
+                    avg_width = float((boxes[:, 2] - boxes[:, 0]).mean())
+                
+                comparison_data.append({
+                    "model": model_name,
+                    "image": img_path.name,
+                    "detections": num_detections,
+                    "avg_confidence": avg_conf,
+                    "avg_width_px": avg_width
+                })
     
     # Create DataFrame
     df = pd.DataFrame(comparison_data)
@@ -77,6 +129,9 @@ def compare_models(model_paths: list, test_images: str, output_dir: str):
     df.to_csv(csv_path, index=False)
     print(f"\n📊 Results saved: {csv_path}")
     
+    # Box-level agreement between models and against labels
+    agreement_analysis(model_boxes, ground_truth, image_names, output_path, match_iou)
+    
     # Generate comparison plots
     fig, axes = plt.subplots(2, 2, figsize=(15, 12))
     
@@ -137,7 +192,249 @@ def compare_models(model_paths: list, test_images: str, output_dir: str):
             print(f"  Avg Width: {detected_df['avg_width_px'].mean():.1f}px")
 
 
-def main():
+def agreement_analysis(model_boxes: dict, ground_truth: list, image_names: list,
+                       output_path: Path, match_iou: float = 0.5) -> 'pd.DataFrame':
+    """
+    IoU-match every model pair (and each model against labels, when present).
+    
+    Writes model_agreement.csv (one row per reference/candidate pair) and
+    model_matches.csv (one row per matched tooth with its width delta).
+    
+    Args:
+        model_boxes: model name -> list of (boxes, confidences) per image
+        ground_truth: Per-image label boxes, None where an image has no labels
+        image_names: Image file names, same order
+        output_path: Output directory
+        match_iou: Minimum IoU for two boxes to count as the same tooth
+    """
+    import numpy as np
+    import pandas as pd
+
+    from dentescope.matching import match_boxes, match_table, pack_boxes, summarize_match
+
+    box_sets = {name: pack_boxes(dets) for name, dets in model_boxes.items()}
+    names = list(box_sets)
+    image_names = np.array(image_names)
+    
+    pairs = [(a, b, None) for i, a in enumerate(names) for b in names[i + 1:]]
+    labeled = np.array([gt is not None for gt in ground_truth], dtype=bool)
+    if labeled.any():
+        gt_set = pack_boxes([gt for gt in ground_truth if gt is not None])
+        pairs = [("ground_truth", name, labeled) for name in names] + pairs
+    
+    summaries = []
+    matches = []
+    for reference, candidate, subset in pairs:
+        if reference == "ground_truth":
+            ref_set = gt_set
+            cand = box_sets[candidate]
+            cand_set = cand._replace(boxes=cand.boxes[subset], scores=cand.scores[subset],
+                                     valid=cand.valid[subset])
+            names_subset = image_names[subset]
+        else:
+            ref_set, cand_set = box_sets[reference], box_sets[candidate]
+            names_subset = image_names
+        
+        match = match_boxes(ref_set, cand_set, match_iou)
+        summaries.append(dict(reference=reference, candidate=candidate,
+                              images=len(names_subset),
+                              **summarize_match(ref_set, cand_set, match)))
+        table = pd.DataFrame(match_table(ref_set, cand_set, match))
+        table.insert(0, "image", names_subset[table.pop("image_index").to_numpy()])
+        table.insert(0, "candidate", candidate)
+        table.insert(0, "reference", reference)
+        matches.append(table)
+    
+    if not summaries:
+        return pd.DataFrame()
+    
+    summary_df = pd.DataFrame(summaries)
+    summary_path = output_path / "model_agreement.csv"
+    summary_df.to_csv(summary_path, index=False)
+    pd.concat(matches, ignore_index=True).to_csv(output_path / "model_matches.csv", index=False)
+    print(f"🔗 Agreement saved: {summary_path} (IoU ≥ {match_iou})")
+    
+    for row in summaries:
+        delta = f"{row['width_delta_abs_mean_px']:.1f}px" if row['matched'] else "n/a"
+        print(f"   {row['reference']} vs {row['candidate']}: "
+              f"agreement {row['agreement']:.1%}, missed {row['missed']}, extra {row['extra']}, "
+              f"|Δwidth| {delta}")
+    
+    return summary_df
+
+
+def _benchmark_model(model_path: str, image_paths: list, imgsz: int, device: str,
+                     conf: float, iou: float, warmup: int, iterations: int,
+                     batch_sizes: list, thread_counts: list) -> dict:
+    """
+    Benchmark one checkpoint; runs in a fresh process so load time and
+    peak RSS belong to this model alone.
+    
+    Latency covers letterbox + forward pass + NMS on a pre-decoded image.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    from dentescope.inference import (decode_images, detect_batch, letterbox_batch,
+                                      load_network, model_input_size, resolve_device)
+
+    torch_device = resolve_device(device)
+    rss_start = current_rss_mb()
+    
+    # The checkpoint itself, not the registry's cached inference copy
+    start = time.perf_counter()
+    model = YOLO(model_path)
+    net = load_network(model, torch_device)
+    load_time = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+    size = imgsz or model_input_size(model)
+    
+    images = [img for img in decode_images(image_paths) if img is not None]
+    if not images:
+        raise ValueError("No decodable benchmark images")
+    
+    def run(batch):
+        tensor, transforms = letterbox_batch(batch, size)
+        detect_batch(net, tensor.to(torch_device), transforms,
+                     [img.shape[:2] for img in batch], conf, iou)
+        if torch_device.type == 'cuda':
+            torch.cuda.synchronize()
+    
+    # Warm-up (allocator, kernels, caches)
+    for i in range(warmup):
+        run([images[i % len(images)]])
+    
+    # Single-image latency at the default thread count
+    latencies = []
+    for i in range(iterations):
+        image = images[i % len(images)]
+        t0 = time.perf_counter()
+        run([image])
+        latencies.append(time.perf_counter() - t0)
+    
+    # Throughput sweep over thread counts x batch sizes
+    default_threads = torch.get_num_threads()
+    throughput = []
+    for threads in thread_counts:
+        torch.set_num_threads(threads)
+        for batch_size in batch_sizes:
+            batch = [images[i % len(images)] for i in range(batch_size)]
+            run(batch)
+            repeats = max(3, iterations // batch_size)
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                run(batch)
+            elapsed = time.perf_counter() - t0
+            throughput.append({
+                "batch": batch_size,
+                "threads": threads,
+                "images_per_s": batch_size * repeats / elapsed,
+                "batch_latency_ms": elapsed / repeats * 1000
+            })
+    torch.set_num_threads(default_threads)
+    
+    return {
+        "path": str(model_path),
+        "imgsz": size,
+        "parameters": sum(p.numel() for p in net.parameters()),
+        "load_time_s": load_time,
+        "latency_ms": summarize_latencies(latencies),
+        "throughput": throughput,
+        "rss_after_load_mb": rss_loaded,
+        "model_rss_mb": rss_loaded - rss_start,
+        "peak_rss_mb": peak_rss_mb(),
+        "default_threads": default_threads
+    }
+
+
+def benchmark_models(model_paths: list, test_images: str, output_dir: str,
+                     device: str = 'cpu', imgsz: int = None, conf: float = 0.25,
+                     iou: float = 0.7, warmup: int = 5, iterations: int = 50,
+                     batch_sizes: list = None, thread_counts: list = None,
+                     num_images: int = 16) -> dict:
+    """
+    Measure speed and memory of each checkpoint.
+    
+    Reports model load time, p50/p95/p99 single-image latency, throughput
+    per batch size and thread count, and peak RSS. Results are written to
+    model_benchmark.json next to model_comparison.csv.
+    
+    Args:
+        model_paths: List of paths to model weights or registry names
+        test_images: Directory containing test images
+        output_dir: Directory for comparison results
+        device: Torch device ('cpu', '0', ...)
+        imgsz: Override the input size stored in each checkpoint
+        conf: Confidence threshold
+        iou: NMS IoU threshold
+        warmup: Warm-up iterations before timing
+        iterations: Timed single-image iterations
+        batch_sizes: Batch sizes for the throughput sweep (default 1, 4, 8, 16)
+        thread_counts: Torch thread counts for the sweep (default 1, CPUs/2, CPUs)
+        num_images: Test images sampled for the benchmark
+    """
+    from importlib.metadata import version
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    cpus = os.cpu_count() or 1
+    batch_sizes = batch_sizes or [1, 4, 8, 16]
+    thread_counts = thread_counts or sorted({1, max(1, cpus // 2), cpus})
+    image_paths = list_images(test_images)[:num_images]
+    if not image_paths:
+        raise ValueError(f"No images found in {test_images}")
+    
+    print(f"\n⏱️  Benchmarking {len(model_paths)} models on {len(image_paths)} images")
+    print(f"   Batch sizes: {batch_sizes}, threads: {thread_counts}")
+    
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for ref in model_paths:
+        model_name, model_path = display_name(ref), resolve(ref)
+        print(f"   • {model_name} ...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[model_name] = pool.submit(
+                _benchmark_model, str(model_path), [str(p) for p in image_paths],
+                imgsz, device, conf, iou, warmup, iterations, batch_sizes, thread_counts
+            ).result()
+    
+    report = {
+        "created": datetime.now().isoformat(),
+        "device": device,
+        "cpu_count": cpus,
+        "torch_version": version("torch"),  # without importing torch in this process
+        "images": len(image_paths),
+        "warmup": warmup,
+        "iterations": iterations,
+        "latency_scope": "letterbox + forward + NMS, pre-decoded image",
+        "models": results
+    }
+    json_path = output_path / "model_benchmark.json"
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\n⏱️  Benchmark Summary:")
+    print("="*60)
+    for model_name, r in results.items():
+        latency = r["latency_ms"]
+        best = max(r["throughput"], key=lambda t: t["images_per_s"])
+        print(f"\n{model_name} (imgsz {r['imgsz']}, {r['parameters'] / 1e6:.1f}M params):")
+        print(f"  Load time: {r['load_time_s']:.2f}s")
+        print(f"  Latency p50/p95/p99: {latency['p50']:.1f} / {latency['p95']:.1f} / {latency['p99']:.1f} ms")
+        print(f"  Best throughput: {best['images_per_s']:.1f} img/s "
+              f"(batch {best['batch']}, {best['threads']} threads)")
+        print(f"  Peak RSS: {r['peak_rss_mb']:.0f} MB")
+    print(f"\n📝 Benchmark saved: {json_path}")
+    
+    return report
+
+
+def _int_list(text: str) -> list:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="DenteScope AI - Model Comparison"
     )
@@ -145,7 +442,7 @@ def main():
         "--models",
         nargs="+",
         required=True,
-        help="Paths to model weights to compare"
+        help="Paths to model weights (or registry names) to compare"
     )
     parser.add_argument(
         "--test-images",
@@ -159,8 +456,74 @@ def main():
         default="results/comparison",
         help="Output directory"
     )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=8,
+        help="Images per shared decode/inference batch"
+    )
+    parser.add_argument(
+        "--conf",
+        type=float,
+        default=0.25,
+        help="Confidence threshold"
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cpu",
+        help="Device: cpu or CUDA index"
+    )
+    parser.add_argument(
+        "--imgsz",
+        type=int,
+        default=None,
+        help="Input size override (default: size stored in each checkpoint)"
+    )
+    
+    parser.add_argument(
+        "--match-iou",
+        type=float,
+        default=0.5,
+        help="IoU threshold for matching boxes between models / labels"
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Also measure load time, latency, throughput and peak RSS per model"
+    )
+    parser.add_argument(
+        "--bench-iters",
+        type=int,
+        default=50,
+        help="Timed single-image iterations per model"
+    )
+    parser.add_argument(
+        "--bench-warmup",
+        type=int,
+        default=5,
+        help="Warm-up iterations before timing"
+    )
+    parser.add_argument(
+        "--bench-batch-sizes",
+        type=_int_list,
+        default=None,
+        help="Comma-separated batch sizes for the throughput sweep (default 1,4,8,16)"
+    )
+    parser.add_argument(
+        "--bench-threads",
+        type=_int_list,
+        default=None,
+        help="Comma-separated torch thread counts (default 1,CPUs/2,CPUs)"
+    )
+    parser.add_argument(
+        "--bench-images",
+        type=int,
+        default=16,
+        help="Test images sampled for the benchmark"
+    )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     print("="*60)
     print("🔬 DenteScope AI - Model Comparison")
@@ -169,9 +532,29 @@ def main():
     compare_models(
         model_paths=args.models,
         test_images=args.test_images,
-        output_dir=args.output
+        output_dir=args.output,
+        batch_size=args.batch,
+        conf=args.conf,
+        device=args.device,
+        imgsz=args.imgsz,
+        match_iou=args.match_iou
     )
     
+    if args.benchmark:
+        benchmark_models(
+            model_paths=args.models,
+            test_images=args.test_images,
+            output_dir=args.output,
+            device=args.device,
+            imgsz=args.imgsz,
+            conf=args.conf,
+            warmup=args.bench_warmup,
+            iterations=args.bench_iters,
+            batch_sizes=args.bench_batch_sizes,
+            thread_counts=args.bench_threads,
+            num_images=args.bench_images
+        )
+    
     print("\n✅ Comparison complete!")
 
 
@@ -1,172 +1,398 @@
 #!/usr/bin/env python3
 """
 DenteScope AI - Pathology Detection Module
-Placeholder implementation for future development
+Cavity, bone loss, infection and root canal analysis from one model pass
+
+The pathology model is a single multi-class detector trained on the
+classes in PathologyModelTrainer.default_config. Each analysis is a head
+over that model's output, selected by class name:
+
+    cavities     cavity_mild / cavity_moderate / cavity_severe
+    bone_loss    bone_loss_mild / bone_loss_moderate / bone_loss_severe
+    infections   infection
+    root_canal   root_canal_issue
+
+so an X-ray is decoded, letterboxed and run through the network once,
+however many analyses are requested. Batches are decoded in a thread
+pool while the previous batch is on the model.
+
+Cascade mode (--tooth-model): pathologies are local to teeth, so the tooth
+detector runs first and the pathology model only sees the tooth boxes
+(plus a margin), cropped at the pathology model's scale and batched.
+Detections are mapped back to the full X-ray. Background costs nothing,
+and an image without teeth skips the pathology model entirely.
 
 Author: Ajeet Singh Raina
 Date: November 3, 2025
-Status: Placeholder (Not Yet Implemented)
+Status: Inference implemented; requires a trained pathology model
 """
 
 import argparse
-from pathlib import Path
+import json
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-# TODO: Import actual detection libraries when implemented
-# from ultralytics import YOLO
-# import cv2
-# import numpy as np
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+
+# Analysis -> class-name prefixes of its head
+ANALYSES = {
+    "cavities": ("cavity_",),
+    "bone_loss": ("bone_loss_",),
+    "infections": ("infection",),
+    "root_canal": ("root_canal",),
+}
+SEVERITIES = ("none", "mild", "moderate", "severe")
 
 
 class PathologyDetector:
     """
     Dental pathology detection system.
-    
-    Future capabilities:
+
+    Capabilities:
     - Cavity detection
     - Bone loss analysis
     - Infection identification
     - Root canal assessment
     """
-    
-    def __init__(self, model_path: str = None):
+
+    def __init__(self, model_path: str = None, device: str = "cpu",
+                 conf: float = 0.25, iou: float = 0.7, batch_size: int = 8,
+                 tooth_model_path: str = None, tooth_conf: float = 0.25,
+                 roi_margin: float = 0.15):
         """
         Initialize pathology detector.
-        
+
         Args:
-            model_path: Path to trained pathology detection model
+            model_path: Path to trained pathology detection model or registry name
+            device: Torch device ('cpu', '0', ...)
+            conf: Confidence threshold
+            iou: NMS IoU threshold
+            batch_size: Images per forward pass
+            tooth_model_path: Tooth detector; enables cascade mode, where the
+                pathology model only sees tooth crops
+            tooth_conf: Confidence threshold for tooth boxes in cascade mode
+            roi_margin: Context added around each tooth box, as a fraction of its size
         """
         self.model_path = model_path
+        self.device = device
+        self.conf = conf
+        self.iou = iou
+        self.batch_size = batch_size
+        self.tooth_model_path = tooth_model_path
+        self.tooth_conf = tooth_conf
+        self.roi_margin = roi_margin
         self.model = None
-        print("⚠️  Pathology detection is currently in development.")
-        print("🚧 This is a placeholder implementation.")
-    
+        self.net = None
+        self.imgsz = None
+        self.tooth_net = None
+        self.head_of_class = None
+
     def load_model(self):
         """
         Load trained pathology detection model.
-        
-        TODO: Implement model loading
+
+        Returns:
+            True when the model is ready
         """
-        if self.model_path:
-            print(f"📁 Model path: {self.model_path}")
-            # self.model = YOLO(self.model_path)
-            print("⚠️  Model loading not yet implemented")
-        else:
+        if not self.model_path:
             print("❌ No model path provided")
-    
+            return False
+
+        from dentescope.inference import load_network, model_input_size, resolve_device
+        from dentescope.registry import load_model, resolve
+        import numpy as np
+
+        print(f"📁 Model path: {resolve(self.model_path)}")
+        self.model = load_model(self.model_path)
+        self._device = resolve_device(self.device)
+        self.net = load_network(self.model, self._device)
+        self.imgsz = model_input_size(self.model)
+        self.names = self.model.names
+
+        # Class index -> analysis index (-1: not a pathology class)
+        analyses = list(ANALYSES)
+        self.head_of_class = np.full(max(self.names) + 1, -1, dtype=np.int64)
+        for index, name in self.names.items():
+            for a, prefixes in enumerate(ANALYSES.values()):
+                if str(name).startswith(prefixes):
+                    self.head_of_class[index] = a
+        missing = [analyses[a] for a in range(len(analyses)) if a not in self.head_of_class]
+        if missing:
+            print(f"⚠️  Model has no classes for: {', '.join(missing)}")
+        print(f"✓ Model loaded ({len(self.names)} classes, imgsz {self.imgsz})")
+
+        if self.tooth_model_path:
+            tooth_model = load_model(self.tooth_model_path)
+            self.tooth_net = load_network(tooth_model, self._device)
+            self.tooth_imgsz = model_input_size(tooth_model)
+            self.stride = int(max(self.net.stride))
+            print(f"✓ Cascade mode: tooth crops from {resolve(self.tooth_model_path)}")
+        return True
+
+    def _require_model(self):
+        if self.net is None and not self.load_model():
+            raise RuntimeError("No pathology model loaded; pass model_path")
+
+    @staticmethod
+    def _decode(paths: list) -> list:
+        """(image or None, decode seconds) per path"""
+        import cv2
+
+        def read(path):
+            start = time.perf_counter()
+            image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+            return image, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=min(8, len(paths)) or 1) as pool:
+            return list(pool.map(read, paths))
+
+    def _severity(self, class_id: int) -> str:
+        suffix = str(self.names[class_id]).rsplit("_", 1)[-1]
+        return suffix if suffix in SEVERITIES else "present"
+
+    def _findings(self, boxes, scores, classes, mask) -> list:
+        return [
+            {
+                "class": str(self.names[int(c)]),
+                "severity": self._severity(int(c)),
+                "confidence": round(float(s), 4),
+                "bbox": [round(float(v), 1) for v in box]
+            }
+            for box, s, c in zip(boxes[mask], scores[mask], classes[mask])
+        ]
+
+    def _cavities(self, boxes, scores, classes, mask):
+        return self._findings(boxes, scores, classes, mask)
+
+    def _bone_loss(self, boxes, scores, classes, mask):
+        sites = self._findings(boxes, scores, classes, mask)
+        worst = max((SEVERITIES.index(s["severity"]) for s in sites
+                     if s["severity"] in SEVERITIES), default=0)
+        return {"detected": bool(sites), "severity": SEVERITIES[worst], "sites": sites}
+
+    def _infections(self, boxes, scores, classes, mask):
+        return self._findings(boxes, scores, classes, mask)
+
+    def _root_canal(self, boxes, scores, classes, mask):
+        issues = self._findings(boxes, scores, classes, mask)
+        return {"status": "issue_detected" if issues else "no_issue_detected", "issues": issues}
+
+    def _run_heads(self, detection, analyses) -> tuple:
+        """Split one image's detections into the requested analyses, timing each"""
+        boxes, scores, classes = detection
+        heads = self.head_of_class[classes] if len(classes) else classes
+        results, timings = {}, {}
+        for name in analyses:
+            start = time.perf_counter()
+            mask = heads == list(ANALYSES).index(name)
+            results[name] = getattr(self, f"_{name}")(boxes, scores, classes, mask)
+            timings[name] = (time.perf_counter() - start) * 1000
+        return results, timings
+
+    def _analyze_chunk(self, paths, decoded, analyses) -> list:
+        from dentescope.inference import detect_batch, letterbox_batch
+
+        reports = [None] * len(paths)
+        valid = [i for i, (image, _) in enumerate(decoded) if image is not None]
+        for i, (image, _) in enumerate(decoded):
+            if image is None:
+                reports[i] = {"image": str(paths[i]), "status": "error", "error": "cannot decode image"}
+        if not valid:
+            return reports
+
+        images = [decoded[i][0] for i in valid]
+        shapes = [image.shape[:2] for image in images]
+        start = time.perf_counter()
+        tensor, transforms = letterbox_batch(images, self.tooth_imgsz if self.tooth_net else self.imgsz)
+        tensor = tensor.to(self._device)
+        # Batch stages are amortized over the images of the batch
+        shared = {"preprocess": time.perf_counter() - start}
+
+        start = time.perf_counter()
+        if self.tooth_net is None:
+            detections = detect_batch(self.net, tensor, transforms, shapes, self.conf, self.iou)
+            shared["inference"] = time.perf_counter() - start
+            cascades = [None] * len(images)
+            inference = [0.0] * len(images)
+        else:
+            teeth = detect_batch(self.tooth_net, tensor, transforms, shapes, self.tooth_conf, self.iou)
+            shared["teeth"] = time.perf_counter() - start
+            detections, cascades, inference = self._cascade(images, teeth)
+
+        for k, (i, detection) in enumerate(zip(valid, detections)):
+            results, head_ms = self._run_heads(detection, analyses)
+            timings = {"decode": decoded[i][1] * 1000}
+            timings.update({stage: seconds / len(valid) * 1000 for stage, seconds in shared.items()})
+            if cascades[k] is not None:
+                timings["inference"] = inference[k] * 1000
+            reports[i] = {
+                "image": str(paths[i]),
+                **results,
+                "status": "completed",
+                "timings_ms": {**{stage: round(ms, 2) for stage, ms in timings.items()},
+                               **{name: round(ms, 3) for name, ms in head_ms.items()}},
+                "batch_size": len(valid)
+            }
+            if cascades[k] is not None:
+                reports[i]["cascade"] = cascades[k]
+        return reports
+
+    def _cascade(self, images, teeth) -> tuple:
+        """
+        Pathology detections from tooth crops only.
+
+        Returns:
+            (detections, cascade stats, inference seconds), one of each per image
+        """
+        from dentescope.inference import detect_batch, detect_rois, letterbox_batch
+
+        detections, stats, seconds = [], [], []
+        full_pixels = self.imgsz * self.imgsz
+        for image, (tooth_boxes, _, _) in zip(images, teeth):
+            start = time.perf_counter()
+            found = detect_rois(self.net, image, tooth_boxes, self.imgsz, self.conf, self.iou,
+                                margin=self.roi_margin, max_batch=max(self.batch_size, 16),
+                                stride=self.stride, device=self._device, max_pixels=full_pixels)
+            if found is None:
+                # Crops would cost more than the whole image: plain full-image pass
+                tensor, transforms = letterbox_batch([image], self.imgsz)
+                found = (*detect_batch(self.net, tensor.to(self._device), transforms,
+                                       [image.shape[:2]], self.conf, self.iou)[0], full_pixels)
+            seconds.append(time.perf_counter() - start)
+            detections.append(found[:3])
+            stats.append({"teeth": len(tooth_boxes), "pixel_ratio": round(found[3] / full_pixels, 3)})
+        return detections, stats, seconds
+
+    def analyze_images(self, image_paths: list, analyses=tuple(ANALYSES)):
+        """
+        Analyze images in batches: one decode, one letterbox and one forward
+        pass per image, shared by all analyses. The next batch is decoded in
+        the background while the current one is on the model.
+
+        Args:
+            image_paths: Dental X-ray paths
+            analyses: Subset of ANALYSES to report
+
+        Yields:
+            One report per image, in input order
+        """
+        self._require_model()
+        unknown = set(analyses) - set(ANALYSES)
+        if unknown:
+            raise ValueError(f"Unknown analyses: {', '.join(sorted(unknown))}")
+
+        paths = [Path(p) for p in image_paths]
+        chunks = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            pending = prefetch.submit(self._decode, chunks[0]) if chunks else None
+            for k, chunk in enumerate(chunks):
+                decoded = pending.result()
+                if k + 1 < len(chunks):
+                    pending = prefetch.submit(self._decode, chunks[k + 1])
+                yield from self._analyze_chunk(chunk, decoded, analyses)
+
     def detect_cavities(self, image_path: str):
         """
         Detect dental cavities in X-ray image.
-        
+
         Args:
             image_path: Path to dental X-ray image
-            
+
         Returns:
             List of detected cavities with locations and severity
-            
-        TODO: Implement cavity detection
         """
-        print(f"\n🦷 Cavity Detection - {image_path}")
-        print("⚠️  Not yet implemented")
-        return []
-    
+        return next(self.analyze_images([image_path], ("cavities",))).get("cavities", [])
+
     def detect_bone_loss(self, image_path: str):
         """
         Analyze periodontal bone loss.
-        
+
         Args:
             image_path: Path to dental X-ray image
-            
+
         Returns:
-            Bone loss measurements and severity classification
-            
-        TODO: Implement bone loss analysis
-        """
-        print(f"\n🦴 Bone Loss Analysis - {image_path}")
-        print("⚠️  Not yet implemented")
-        return {}
-    
+            Bone loss sites and overall severity classification
+        """
+        return next(self.analyze_images([image_path], ("bone_loss",))).get("bone_loss", {})
+
     def detect_infections(self, image_path: str):
         """
         Identify periapical and other infections.
-        
+
         Args:
             image_path: Path to dental X-ray image
-            
+
         Returns:
             List of detected infections with locations
-            
-        TODO: Implement infection detection
         """
-        print(f"\n🔴 Infection Detection - {image_path}")
-        print("⚠️  Not yet implemented")
-        return []
-    
+        return next(self.analyze_images([image_path], ("infections",))).get("infections", [])
+
     def assess_root_canal(self, image_path: str):
         """
         Assess root canal quality and complications.
-        
+
         Args:
             image_path: Path to dental X-ray image
-            
+
         Returns:
             Root canal assessment report
-            
-        TODO: Implement root canal assessment
         """
-        print(f"\n🧪 Root Canal Assessment - {image_path}")
-        print("⚠️  Not yet implemented")
-        return {}
-    
-    def comprehensive_analysis(self, image_path: str):
+        return next(self.analyze_images([image_path], ("root_canal",))).get("root_canal", {})
+
+    def comprehensive_analysis(self, image_path):
         """
-        Run complete pathology analysis on X-ray.
-        
+        Run complete pathology analysis on one X-ray or a batch.
+
+        All four analyses share a single decode and model pass per image;
+        use analyze_images() to stream large batches.
+
         Args:
-            image_path: Path to dental X-ray image
-            
+            image_path: Path to dental X-ray image, or a list of paths
+
         Returns:
-            Comprehensive pathology report
-        """
-        print(f"\n📊 Comprehensive Pathology Analysis")
-        print(f"📷 Image: {image_path}")
-        print("-" * 60)
-        
-        # Run all detection modules
-        cavities = self.detect_cavities(image_path)
-        bone_loss = self.detect_bone_loss(image_path)
-        infections = self.detect_infections(image_path)
-        root_canal = self.assess_root_canal(image_path)
-        
-        report = {
-            "image": image_path,
-            "cavities": cavities,
-            "bone_loss": bone_loss,
-            "infections": infections,
-            "root_canal": root_canal,
-            "status": "placeholder"
-        }
-        
-        print("\n✅ Analysis placeholder completed")
-        return report
-
-
-def main():
+            Pathology report with per-stage timings (a list for a list input)
+        """
+        if isinstance(image_path, (str, Path)):
+            return next(self.analyze_images([image_path]))
+        return list(self.analyze_images(image_path))
+
+
+def print_report(report: dict):
+    print(f"\n📷 {Path(report['image']).name}")
+    if report["status"] != "completed":
+        print(f"   ❌ {report.get('error', report['status'])}")
+        return
+    bone_loss, root_canal = report["bone_loss"], report["root_canal"]
+    print(f"   🦷 Cavities: {len(report['cavities'])}")
+    print(f"   🦴 Bone loss: {bone_loss['severity']} ({len(bone_loss['sites'])} sites)")
+    print(f"   🔴 Infections: {len(report['infections'])}")
+    print(f"   🧪 Root canal: {root_canal['status'].replace('_', ' ')}")
+    if "cascade" in report:
+        cascade = report["cascade"]
+        print(f"   ✂️  Cascade: {cascade['teeth']} tooth crops, "
+              f"{cascade['pixel_ratio']:.0%} of a full-image pass")
+    print("   ⏱️  " + ", ".join(f"{k} {v:.1f}ms" for k, v in report["timings_ms"].items()))
+
+
+def main(argv=None):
     """
     Main entry point for pathology detection.
     """
     parser = argparse.ArgumentParser(
-        description="DenteScope AI - Pathology Detection (Placeholder)"
+        description="DenteScope AI - Pathology Detection"
     )
     parser.add_argument(
         "--model",
         type=str,
-        help="Path to trained pathology detection model"
+        help="Path to trained pathology detection model or registry name"
     )
     parser.add_argument(
         "--image",
         type=str,
-        help="Path to dental X-ray image"
+        nargs="+",
+        help="Dental X-ray image(s) or directories"
     )
     parser.add_argument(
         "--output",
@@ -174,41 +400,89 @@ def main():
         default="results/pathology",
         help="Output directory for results"
     )
-    
-    args = parser.parse_args()
-    
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Images per forward pass"
+    )
+    parser.add_argument(
+        "--conf",
+        type=float,
+        default=0.25,
+        help="Confidence threshold"
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cpu",
+        help="Device ('cpu' or a CUDA index)"
+    )
+    parser.add_argument(
+        "--tooth-model",
+        type=str,
+        help="Tooth detector (path or registry name): run pathology only on tooth crops (cascade mode)"
+    )
+    parser.add_argument(
+        "--roi-margin",
+        type=float,
+        default=0.15,
+        help="Context around each tooth crop, as a fraction of the tooth size"
+    )
+
+    args = parser.parse_args(argv)
+
     print("="*60)
     print("🦷 DenteScope AI - Pathology Detection Module")
     print("="*60)
-    
-    # Initialize detector
-    detector = PathologyDetector(model_path=args.model)
-    
-    if args.model:
-        detector.load_model()
-    
-    if args.image:
-        # Check if image exists
-        if not Path(args.image).exists():
-            print(f"❌ Error: Image not found - {args.image}")
-            sys.exit(1)
-        
-        # Run analysis
-        report = detector.comprehensive_analysis(args.image)
-        
-        # TODO: Save results when implemented
-        print(f"\n💾 Output directory: {args.output}")
-    else:
+
+    if not args.image:
         print("\n📝 Usage:")
-        print("  python detect_pathology.py --image path/to/xray.jpg")
         print("  python detect_pathology.py --model path/to/model.pt --image path/to/xray.jpg")
-    
+        print("  python detect_pathology.py --model path/to/model.pt --image xrays/ --batch-size 16")
+        print("  python detect_pathology.py --model path/to/model.pt --tooth-model path/to/teeth.pt --image xrays/")
+        return 0
+
+    from dentescope.scanner import list_images
+
+    images = []
+    for source in args.image:
+        path = Path(source)
+        if path.is_dir():
+            images.extend(list_images(path))
+        elif path.exists():
+            images.append(path)
+        else:
+            print(f"❌ Error: Image not found - {source}")
+            return 1
+
+    # Initialize detector
+    detector = PathologyDetector(model_path=args.model, device=args.device,
+                                 conf=args.conf, batch_size=args.batch_size,
+                                 tooth_model_path=args.tooth_model, roi_margin=args.roi_margin)
+    if not detector.load_model():
+        print("   Pathology analysis needs a model trained with train_pathology_model.py")
+        return 1
+
+    start = time.perf_counter()
+    reports = []
+    for report in detector.analyze_images(images):
+        print_report(report)
+        reports.append(report)
+    elapsed = time.perf_counter() - start
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / "pathology_report.json"
+    with open(output_path, "w") as f:
+        json.dump({"model": args.model, "reports": reports}, f, indent=2)
+
     print("\n" + "="*60)
-    print("🚧 Note: This is a placeholder implementation")
-    print("🕒 Expected release: Q2 2026")
-    print("🔗 GitHub: https://github.com/ajeetraina/dentescope-ai-complete")
+    print(f"✅ {len(reports)} images in {elapsed:.2f}s ({len(reports) / elapsed:.1f} img/s)")
+    print(f"💾 Report saved: {output_path}")
     print("="*60)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,57 +1,83 @@
 #!/usr/bin/env python3
 """
 DenteScope AI - Pathology Model Training
-Placeholder for future pathology detection model training
+Transfer learning from the tooth detector with a frozen backbone
+
+Pathology training starts from the tooth-detection checkpoint: the
+backbone (for YOLOv8, layers 0-9) already knows what panoramic X-rays
+look like, so it is frozen and only the neck and detection head learn
+the pathology classes. Weights that fit the new model (backbone, neck,
+box regression) are transferred; the class branch is new.
+
+A frozen backbone produces the same feature maps for the same image
+every epoch, so by default they are computed once over the unaugmented,
+letterboxed training and validation images and cached on disk
+(dentescope.featurecache). Epochs then run only the neck and head on
+those cached maps, which makes training practical on CPU-only machines.
+--no-cache trains through ultralytics instead (frozen backbone, full
+augmentation, backbone recomputed every step).
+
+Checkpoints are regular ultralytics checkpoints: best.pt loads with
+YOLO() and detect_pathology.py.
 
 Author: Ajeet Singh Raina
 Date: November 3, 2025
-Status: Placeholder (Not Yet Implemented)
+Status: Training and clinical validation implemented
 """
 
 import argparse
+import csv
+import math
+import sys
+import time
+from datetime import datetime
 from pathlib import Path
 
-# TODO: Import training libraries when implemented
-# from ultralytics import YOLO
-# import torch
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
 
 
 class PathologyModelTrainer:
     """
     Training pipeline for dental pathology detection models.
-    
-    Future capabilities:
+
+    Capabilities:
     - Multi-class pathology detection
-    - Transfer learning from tooth detection
-    - Data augmentation strategies
-    - Clinical validation metrics
+    - Transfer learning from tooth detection (frozen backbone)
+    - Cached backbone features for CPU-friendly epochs
+    - Clinical validation metrics (per-class PR/ROC, operating points)
     """
-    
+
     def __init__(self, config: dict = None):
         """
         Initialize pathology model trainer.
-        
+
         Args:
-            config: Training configuration dictionary
+            config: Training configuration dictionary (overrides the defaults)
         """
-        self.config = config or self.default_config()
-        print("⚠️  Pathology model training is currently in development.")
-        print("🚧 This is a placeholder implementation.")
-    
+        self.config = {**self.default_config(), **(config or {})}
+        self.dataset = None
+
     def default_config(self):
         """
         Default training configuration.
-        
+
         Returns:
             Dictionary with default training parameters
         """
         return {
-            "model": "yolov8m.pt",  # Medium model for pathology
+            "model": "runs/train/tooth_detection/weights/best.pt",  # tooth-detection checkpoint
             "epochs": 100,
             "batch_size": 16,
             "img_size": 640,
             "device": 0,
             "patience": 20,
+            "lr": 0.001,
+            "weight_decay": 0.0005,
+            "freeze_backbone": True,
+            "cache_features": True,
+            "cache_dir": None,  # default: dentescope cache directory
+            "project": "runs/pathology",
+            "name": "train",
             "classes": [
                 "cavity_mild",
                 "cavity_moderate",
@@ -63,105 +89,485 @@ class PathologyModelTrainer:
                 "root_canal_issue"
             ]
         }
-    
+
+    def _split_images(self, root: Path, entries) -> list:
+        """Image paths of one data.yaml split (directories or .txt file lists)"""
+        from dentescope.scanner import list_images
+
+        images = []
+        for entry in [entries] if isinstance(entries, str) else entries or []:
+            path = Path(entry) if Path(entry).is_absolute() else root / entry
+            if path.is_dir():
+                images.extend(list_images(path))
+            elif path.suffix == ".txt" and path.exists():
+                for line in path.read_text().splitlines():
+                    line = line.strip()
+                    if line:
+                        images.append(Path(line) if Path(line).is_absolute() else root / line)
+        return images
+
     def prepare_dataset(self, data_path: str):
         """
-        Prepare and validate pathology dataset.
-        
+        Validate a YOLO-format pathology dataset.
+
+        Expects data_path/data.yaml with train and val splits. Checks that
+        both splits have images, counts label files and makes sure class ids
+        fit the dataset's class names.
+
         Args:
-            data_path: Path to dataset directory
-            
-        TODO: Implement dataset preparation
+            data_path: Path to dataset directory (or its data.yaml)
+
+        Returns:
+            True if the dataset can be trained on
         """
-        print(f"\n📁 Preparing dataset from: {data_path}")
-        print("⚠️  Dataset preparation not yet implemented")
-        
-        # TODO: Implement
-        # - Check for required directory structure
-        # - Validate annotations
-        # - Create train/val/test splits
-        # - Generate data.yaml
-        
-        return False
-    
-    def train(self, data_yaml: str, resume: bool = False):
+        import numpy as np
+        import yaml
+
+        from dentescope.featurecache import read_labels
+        from dentescope.matching import label_path_for
+
+        data_yaml = Path(data_path)
+        if data_yaml.is_dir():
+            data_yaml = data_yaml / "data.yaml"
+        print(f"\n📁 Preparing dataset from: {data_yaml}")
+        if not data_yaml.exists():
+            print(f"❌ {data_yaml} not found")
+            return False
+
+        with open(data_yaml) as f:
+            data = yaml.safe_load(f)
+        root = Path(data.get("path") or data_yaml.parent)
+        if not root.is_absolute():
+            root = data_yaml.parent / root
+        names = data.get("names") or []
+        names = [names[k] for k in sorted(names)] if isinstance(names, dict) else list(names)
+        if not names:
+            print("❌ data.yaml has no class names")
+            return False
+        if names != self.config["classes"]:
+            print(f"⚠️  Dataset classes differ from the default pathology classes; training on {names}")
+
+        splits = {}
+        for split in ("train", "val"):
+            images = self._split_images(root, data.get(split))
+            if not images:
+                print(f"❌ No {split} images found ({data.get(split)})")
+                return False
+            labeled = [p for p in images if label_path_for(p) is not None]
+            classes = np.concatenate([read_labels(p)[:, 0] for p in labeled] or [np.zeros(0)])
+            if len(classes) and classes.max() >= len(names):
+                print(f"❌ {split} labels use class {int(classes.max())}, data.yaml has {len(names)} classes")
+                return False
+            print(f"   {split}: {len(images)} images, {len(labeled)} label files, {len(classes)} boxes")
+            splits[split] = images
+
+        self.dataset = {"yaml": data_yaml, "names": names, **splits}
+        return True
+
+    def _last_checkpoint(self, resume) -> Path:
+        """
+        last.pt to resume: of the given run (directory or checkpoint path), or
+        of the most recently trained project/name, name2, name3, ... run
+        """
+        import re
+
+        if not isinstance(resume, bool):
+            path = Path(resume)
+            return path if path.suffix == ".pt" else path / "weights" / "last.pt"
+        project, name = Path(self.config["project"]), self.config["name"]
+        runs = [run for run in project.glob(f"{name}*") if re.fullmatch(rf"{re.escape(name)}\d*", run.name)]
+        checkpoints = [run / "weights" / "last.pt" for run in runs if (run / "weights" / "last.pt").exists()]
+        if not checkpoints:
+            return project / name / "weights" / "last.pt"
+        return max(checkpoints, key=lambda path: path.stat().st_mtime)
+
+    def train(self, data_yaml: str, resume=False):
         """
         Train pathology detection model.
-        
+
         Args:
             data_yaml: Path to dataset configuration
-            resume: Whether to resume from checkpoint
-            
-        TODO: Implement training loop
+            resume: True to resume the latest run, or a run directory / last.pt to resume
+
+        Returns:
+            Path to best.pt, or None if training could not start
         """
+        from dentescope.registry import resolve
+
+        self.config["model"] = resolve(self.config["model"])
         print(f"\n🏋️ Training pathology model...")
         print(f"📄 Dataset config: {data_yaml}")
+        print(f"🦷 Base model: {self.config['model']}")
         print(f"♻️ Resume training: {resume}")
-        print("⚠️  Training not yet implemented")
-        
-        # TODO: Implement
-        # model = YOLO(self.config['model'])
-        # results = model.train(
-        #     data=data_yaml,
-        #     epochs=self.config['epochs'],
-        #     batch=self.config['batch_size'],
-        #     imgsz=self.config['img_size'],
-        #     device=self.config['device'],
-        #     patience=self.config['patience'],
-        #     resume=resume
-        # )
-        
-        return None
-    
+
+        if (self.dataset is None or self.dataset["yaml"] != Path(data_yaml)) and not self.prepare_dataset(data_yaml):
+            return None
+        if not self.config["cache_features"]:
+            return self._train_ultralytics(data_yaml, resume)
+        return self._train_cached(resume)
+
+    def _train_ultralytics(self, data_yaml: str, resume):
+        """Frozen-backbone fine-tuning through ultralytics (with augmentation)"""
+        from ultralytics import YOLO
+
+        from dentescope.featurecache import backbone_split
+
+        if resume:
+            last = self._last_checkpoint(resume)
+            if not last.exists():
+                print(f"❌ Nothing to resume: {last} not found")
+                return None
+            print(f"♻️ Resuming {last}")
+            model = YOLO(str(last))
+            model.train(resume=True)
+        else:
+            model = YOLO(self.config["model"])
+            n_backbone, _ = backbone_split(model.model)
+            model.train(
+                data=str(data_yaml),
+                epochs=self.config["epochs"],
+                batch=self.config["batch_size"],
+                imgsz=self.config["img_size"],
+                device=self.config["device"],
+                patience=self.config["patience"],
+                freeze=n_backbone if self.config["freeze_backbone"] else None,
+                project=self.config["project"],
+                name=self.config["name"],
+            )
+        best = Path(model.trainer.best)
+        return best if best.exists() else None
+
+    def _build_model(self, names: list):
+        """Pathology DetectionModel initialized from the tooth-detection checkpoint"""
+        from copy import deepcopy
+
+        from ultralytics import YOLO
+        from ultralytics.nn.tasks import DetectionModel
+
+        tooth = YOLO(self.config["model"]).model
+        cfg = deepcopy(tooth.yaml)
+        cfg["nc"] = len(names)
+        model = DetectionModel(cfg, nc=len(names), verbose=False)
+        model.load(tooth)  # backbone, neck and box branch; the class branch is new
+        model.names = dict(enumerate(names))
+        return model
+
+    @staticmethod
+    def _cached_loss(model, cache, n_backbone: int, batch_size: int, device):
+        """Mean (box, cls, dfl) loss over a feature cache without updating the model"""
+        import torch
+
+        from dentescope.featurecache import forward_head
+
+        model.eval()
+        totals, batches = torch.zeros(3), 0
+        with torch.no_grad():
+            for start in range(0, len(cache), batch_size):
+                features, batch = cache.batch(range(start, min(start + batch_size, len(cache))), device)
+                _, items = model.loss(batch, forward_head(model, features, n_backbone))
+                totals += items.cpu()
+                batches += 1
+        return totals / max(batches, 1)
+
+    def _train_cached(self, resume):
+        """Train neck and head on cached backbone features"""
+        from copy import deepcopy
+
+        import torch
+        from ultralytics import __version__
+        from ultralytics.cfg import get_cfg
+        from ultralytics.utils.files import increment_path
+
+        from dentescope.featurecache import FeatureCache, backbone_split, forward_head
+        from dentescope.inference import resolve_device
+        from dentescope.scanner import file_sha256
+
+        config = self.config
+        names = self.dataset["names"]
+        device = resolve_device(str(config["device"]))
+        save_dir = Path(config["project"]) / config["name"]
+        checkpoint = None
+        if resume:
+            last = self._last_checkpoint(resume)
+            save_dir = last.parent.parent
+            if not last.exists():
+                print(f"❌ Nothing to resume: {last} not found")
+                return None
+            checkpoint = torch.load(last, map_location="cpu")
+            config["img_size"] = checkpoint["train_args"]["imgsz"]  # the cached features depend on it
+            config["batch_size"] = checkpoint["train_args"]["batch"]
+            model = checkpoint["model"].float()
+            print(f"♻️ Resuming {last} from epoch {checkpoint['epoch'] + 1}")
+        else:
+            save_dir = Path(increment_path(save_dir, exist_ok=False))
+            model = self._build_model(names)
+
+        imgsz = config["img_size"]
+        batch_size = config["batch_size"]
+        n_backbone, cached_layers = backbone_split(model)
+        train_args = {
+            "model": str(config["model"]), "data": str(self.dataset["yaml"]), "epochs": config["epochs"],
+            "batch": batch_size, "imgsz": imgsz, "patience": config["patience"], "lr0": config["lr"],
+            "weight_decay": config["weight_decay"], "freeze": n_backbone, "project": config["project"],
+            "name": save_dir.name, "cache_features": True,
+        }
+        model.args = get_cfg(overrides={"imgsz": imgsz})  # loss gains (box, cls, dfl)
+        model.to(device)
+
+        # Backbone features, once per (images, imgsz, tooth checkpoint)
+        base_hash = file_sha256(config["model"]) if Path(config["model"]).exists() else str(config["model"])
+        caches = {}
+        for split in ("train", "val"):
+            caches[split] = FeatureCache.build(model, self.dataset[split], imgsz, base_hash,
+                                               cache_dir=config["cache_dir"], batch_size=batch_size,
+                                               device=device, prefix=f"   {split}: ")
+            if caches[split] is None:
+                print("❌ Not enough disk space for the feature cache; use --no-cache")
+                return None
+        print(f"🧊 Backbone layers 0-{n_backbone - 1} frozen; caching outputs of layers "
+              f"{', '.join(map(str, cached_layers))}")
+
+        for p in model.model[:n_backbone].parameters():
+            p.requires_grad = False
+        params = [p for p in model.model[n_backbone:].parameters() if p.requires_grad]
+        decay = [p for p in params if p.ndim > 1]
+        no_decay = [p for p in params if p.ndim <= 1]  # BatchNorm and biases
+        optimizer = torch.optim.AdamW([{"params": decay, "weight_decay": config["weight_decay"]},
+                                       {"params": no_decay, "weight_decay": 0.0}], lr=config["lr"])
+        # Cosine decay to 1% of lr, closed form so a resumed run with more epochs stretches it
+        scheduler = torch.optim.lr_scheduler.LambdaLR(
+            optimizer, lambda e: 0.01 + 0.99 * 0.5 * (1 + math.cos(math.pi * min(e / config["epochs"], 1.0))))
+        start_epoch, best_loss, best_epoch = 0, float("inf"), -1
+        if checkpoint is not None:
+            optimizer.load_state_dict(checkpoint["optimizer"])
+            start_epoch = checkpoint["epoch"] + 1
+            best_loss, best_epoch = checkpoint["best_loss"], checkpoint["best_epoch"]
+            for _ in range(start_epoch):
+                scheduler.step()
+
+        weights_dir = save_dir / "weights"
+        weights_dir.mkdir(parents=True, exist_ok=True)
+        results_csv = save_dir / "results.csv"
+        if checkpoint is None:
+            with open(results_csv, "w", newline="") as f:
+                csv.writer(f).writerow(["epoch", "train/box_loss", "train/cls_loss", "train/dfl_loss",
+                                        "val/box_loss", "val/cls_loss", "val/dfl_loss", "lr", "seconds"])
+
+        print(f"📂 Saving to {save_dir}")
+        print(f"{'Epoch':>8} {'box':>8} {'cls':>8} {'dfl':>8} {'val':>8} {'time':>8}")
+        generator = torch.Generator().manual_seed(start_epoch)
+        train_cache = caches["train"]
+        for epoch in range(start_epoch, config["epochs"]):
+            epoch_start = time.perf_counter()
+            model.train()
+            order = torch.randperm(len(train_cache), generator=generator).numpy()
+            totals, batches = torch.zeros(3), 0
+            for start in range(0, len(order), batch_size):
+                features, batch = train_cache.batch(order[start:start + batch_size], device)
+                loss, items = model.loss(batch, forward_head(model, features, n_backbone))
+                optimizer.zero_grad(set_to_none=True)
+                loss.backward()
+                torch.nn.utils.clip_grad_norm_(params, max_norm=10.0)
+                optimizer.step()
+                totals += items.cpu()
+                batches += 1
+            lr = optimizer.param_groups[0]["lr"]
+            scheduler.step()
+            train_loss = totals / max(batches, 1)
+            val_loss = self._cached_loss(model, caches["val"], n_backbone, batch_size, device)
+            seconds = time.perf_counter() - epoch_start
+
+            fitness = float(val_loss.sum())
+            improved = fitness < best_loss
+            if improved:
+                best_loss, best_epoch = fitness, epoch
+            with open(results_csv, "a", newline="") as f:
+                csv.writer(f).writerow([epoch + 1, *[f"{v:.5f}" for v in (*train_loss.tolist(), *val_loss.tolist())],
+                                        f"{lr:.6f}", f"{seconds:.2f}"])
+            print(f"{epoch + 1:>4}/{config['epochs']:<3} {train_loss[0]:8.4f} {train_loss[1]:8.4f} "
+                  f"{train_loss[2]:8.4f} {fitness:8.4f} {seconds:7.2f}s{' *' if improved else ''}")
+
+            saved = deepcopy(model).half()
+            saved.__dict__.pop("criterion", None)
+            ckpt = {
+                "epoch": epoch,
+                "best_fitness": -best_loss,
+                "best_loss": best_loss,
+                "best_epoch": best_epoch,
+                "model": saved,
+                "ema": None,
+                "updates": None,
+                "optimizer": optimizer.state_dict(),
+                "train_args": train_args,
+                "date": datetime.now().isoformat(),
+                "version": __version__,
+            }
+            torch.save(ckpt, weights_dir / "last.pt")
+            if improved:
+                torch.save(ckpt, weights_dir / "best.pt")
+            if epoch - best_epoch >= config["patience"]:
+                print(f"⏹️  No val loss improvement for {config['patience']} epochs, stopping")
+                break
+
+        print(f"\n✅ Best val loss {best_loss:.4f} at epoch {best_epoch + 1}")
+        print(f"💾 {weights_dir / 'best.pt'}")
+        return weights_dir / "best.pt"
+
     def validate(self, model_path: str, data_yaml: str):
         """
         Validate trained model on test set.
-        
+
         Args:
             model_path: Path to trained model weights
             data_yaml: Path to dataset configuration
-            
+
         TODO: Implement validation
         """
         print(f"\n✅ Validating model: {model_path}")
         print(f"📄 Dataset config: {data_yaml}")
         print("⚠️  Validation not yet implemented")
-        
+
         # TODO: Implement
         # model = YOLO(model_path)
         # results = model.val(data=data_yaml)
-        
+
         return None
-    
-    def clinical_validation(self, model_path: str, test_images: str):
+
+    def _test_images(self, test_images: str) -> list:
+        """Images of a test set: a directory, a .txt list, or a data.yaml (test split, else val)"""
+        import yaml
+
+        from dentescope.scanner import list_images
+
+        path = Path(test_images)
+        if path.is_dir() and (path / "data.yaml").exists() and not list_images(path):
+            path = path / "data.yaml"
+        if path.suffix in (".yaml", ".yml"):
+            with open(path) as f:
+                data = yaml.safe_load(f)
+            root = Path(data.get("path") or path.parent)
+            if not root.is_absolute():
+                root = path.parent / root
+            return self._split_images(root, data.get("test") or data.get("val"))
+        if path.is_dir():
+            return list_images(path, recursive=True)
+        return self._split_images(path.parent, str(path))
+
+    def clinical_validation(self, model_path: str, test_images: str, conf: float = 0.25,
+                            iou: float = 0.5, output_dir: str = "results/pathology"):
         """
         Run clinical validation tests.
-        
+
+        Streams the test set through the model in batches (the next batch is
+        decoded while the current one is on the model) and accumulates
+        lesion-level and study-level statistics (dentescope.clinical):
+        per-class PR curves and AP50, ROC AUC, sensitivity/specificity/PPV/NPV
+        at the reporting confidence, at 90% and 95% sensitivity and at the
+        Youden point, and a lesion confusion matrix.
+
         Args:
-            model_path: Path to trained model
-            test_images: Path to clinical test set
-            
-        TODO: Implement clinical validation
+            model_path: Path to trained model or registry name
+            test_images: Path to clinical test set (directory with YOLO labels,
+                .txt image list, or data.yaml)
+            conf: Reporting confidence (confusion matrix, default operating point)
+            iou: Minimum IoU for a lesion to count as found
+            output_dir: Where clinical_validation.json is written
+
+        Returns:
+            Metrics dictionary, or None if the test set is empty
         """
+        import json
+        from concurrent.futures import ThreadPoolExecutor
+
+        import numpy as np
+
+        from dentescope.clinical import ClinicalMetrics, format_summary
+        from dentescope.featurecache import read_labels
+        from dentescope.inference import (decode_images, detect_batch, letterbox_batch,
+                                          load_network, model_input_size, resolve_device)
+        from dentescope.registry import load_model, resolve
+
         print(f"\n🏥 Clinical validation")
-        print(f"🧑‍⚕️ Model: {model_path}")
+        print(f"🧑‍⚕️ Model: {resolve(model_path)}")
         print(f"📊 Test set: {test_images}")
-        print("⚠️  Clinical validation not yet implemented")
-        
-        # TODO: Implement
-        # - Expert agreement metrics
-        # - Sensitivity/specificity analysis
-        # - Clinical impact assessment
-        
-        return None
 
+        paths = self._test_images(test_images)
+        if not paths:
+            print("❌ No test images found")
+            return None
+        model = load_model(model_path)
+        names = [model.names[k] for k in sorted(model.names)]
+        if names != self.config["classes"]:
+            print(f"⚠️  Model classes differ from the default pathology classes: {names}")
+        device = resolve_device(str(self.config["device"]))
+        net = load_network(model, device)
+        imgsz = model_input_size(model)
+        batch_size = self.config["batch_size"]
+
+        metrics = ClinicalMetrics(names, len(paths), iou=iou, conf=conf)
+        chunks = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+        unreadable, unlabeled = [], 0
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            pending = prefetch.submit(decode_images, chunks[0])
+            for k, chunk in enumerate(chunks):
+                images = pending.result()
+                if k + 1 < len(chunks):
+                    pending = prefetch.submit(decode_images, chunks[k + 1])
+                rows = [i for i, image in enumerate(images) if image is not None]
+                unreadable.extend(str(chunk[i]) for i in range(len(chunk)) if images[i] is None)
+                if not rows:
+                    continue
+                shapes = [images[i].shape[:2] for i in rows]
+                tensor, transforms = letterbox_batch([images[i] for i in rows], imgsz)
+                # Low confidence so the curves cover every operating point
+                predictions = detect_batch(net, tensor.to(device), transforms, shapes, conf=0.001, iou=0.7)
 
-def main():
+                truths = []
+                for i, (h, w) in zip(rows, shapes):
+                    labels = read_labels(chunk[i])
+                    unlabeled += not len(labels)
+                    xywh = labels[:, 1:5] * np.array([w, h, w, h], dtype=np.float32)
+                    boxes = np.concatenate([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2], axis=1)
+                    truths.append((boxes, labels[:, 0].astype(np.int64)))
+                metrics.update([k * batch_size + i for i in rows], truths, predictions)
+
+                done = k * batch_size + len(chunk)
+                if (k + 1) % 50 == 0 or k + 1 == len(chunks):
+                    rate = done / (time.perf_counter() - start_time)
+                    print(f"   {done}/{len(paths)} studies ({rate:.1f} img/s)")
+
+        results = metrics.compute()
+        results.update({
+            "model": str(model_path),
+            "test_set": str(test_images),
+            "studies_without_findings": unlabeled,
+            "unreadable": unreadable,
+            "seconds": round(time.perf_counter() - start_time, 2),
+            "date": datetime.now().isoformat(),
+        })
+
+        print()
+        for line in format_summary(results):
+            print(f"   {line}")
+        print(f"\n   Lesion mAP50: {results['lesion']['map']}  |  Study mean AUC: {results['study']['mean_auc']}")
+        print(f"   Sensitivity/specificity at conf >= {conf}; targets from the clinical validation plan")
+        if unreadable:
+            print(f"⚠️  {len(unreadable)} unreadable images skipped")
+
+        output = Path(output_dir)
+        output.mkdir(parents=True, exist_ok=True)
+        with open(output / "clinical_validation.json", "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Report saved: {output / 'clinical_validation.json'}")
+        return results
+
+def main(argv=None):
     """
     Main entry point for pathology model training.
     """
     parser = argparse.ArgumentParser(
-        description="DenteScope AI - Pathology Model Training (Placeholder)"
+        description="DenteScope AI - Pathology Model Training"
     )
     parser.add_argument(
         "--data",
@@ -173,63 +579,117 @@ def main():
         type=str,
         help="Path to training configuration YAML"
     )
+    parser.add_argument(
+        "--model",
+        type=str,
+        help="Tooth-detection checkpoint (or registry name) to start from"
+    )
     parser.add_argument(
         "--epochs",
         type=int,
-        default=100,
-        help="Number of training epochs"
+        help="Number of training epochs (default: 100)"
     )
     parser.add_argument(
         "--batch-size",
         type=int,
-        default=16,
-        help="Batch size for training"
+        help="Batch size for training (default: 16)"
+    )
+    parser.add_argument(
+        "--img-size",
+        type=int,
+        help="Training image size (default: 640)"
     )
     parser.add_argument(
         "--device",
         type=str,
-        default="0",
-        help="Device for training (0 for GPU, cpu for CPU)"
+        help="Device for training (0 for GPU, cpu for CPU; default: 0)"
     )
     parser.add_argument(
-        "--resume",
+        "--no-cache",
         action="store_true",
-        help="Resume training from checkpoint"
+        help="Train through ultralytics with augmentation instead of on cached backbone features"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Feature cache directory (default: dentescope cache directory)"
     )
-    
-    args = parser.parse_args()
-    
+    parser.add_argument(
+        "--clinical-validation",
+        type=str,
+        metavar="MODEL",
+        help="Run clinical validation of a trained model instead of training"
+    )
+    parser.add_argument(
+        "--test-images",
+        type=str,
+        help="Clinical test set: image directory with YOLO labels, .txt list or data.yaml (default: --data)"
+    )
+    parser.add_argument(
+        "--conf",
+        type=float,
+        default=0.25,
+        help="Reporting confidence for clinical validation"
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const=True,
+        default=False,
+        metavar="RUN",
+        help="Resume the latest run, or the given run directory or last.pt"
+    )
+
+    args = parser.parse_args(argv)
+
     print("="*60)
     print("🦷 DenteScope AI - Pathology Model Training")
     print("="*60)
-    
-    # Initialize trainer
-    config = {
+
+    # Initialize trainer: defaults < config file < flags given on the command line
+    config = {}
+    if args.config:
+        import yaml
+        with open(args.config) as f:
+            config.update(yaml.safe_load(f) or {})
+    flags = {
+        "model": args.model,
         "epochs": args.epochs,
         "batch_size": args.batch_size,
-        "device": 0 if args.device == "0" else "cpu"
+        "img_size": args.img_size,
+        "device": int(args.device) if args.device and args.device.isdigit() else args.device,
+        "cache_features": False if args.no_cache else None,
+        "cache_dir": args.cache_dir,
     }
+    config.update({key: value for key, value in flags.items() if value is not None})
     trainer = PathologyModelTrainer(config=config)
-    
-    if args.data:
+
+    if args.clinical_validation:
+        test_images = args.test_images or args.data
+        if test_images:
+            trainer.clinical_validation(args.clinical_validation, test_images, conf=args.conf)
+        else:
+            print("❌ --clinical-validation needs --test-images or --data")
+    elif args.data:
         # Prepare dataset
         dataset_ready = trainer.prepare_dataset(args.data)
-        
+
         if dataset_ready:
             # Train model
-            data_yaml = Path(args.data) / "data.yaml"
-            trainer.train(str(data_yaml), resume=args.resume)
+            best = trainer.train(str(trainer.dataset["yaml"]), resume=args.resume)
+            if best:
+                print(f"📇 Register it: python -m dentescope models update pathology --path {best}")
         else:
-            print("❌ Dataset preparation failed or not implemented")
+            print("❌ Dataset preparation failed")
     else:
         print("\n📝 Usage:")
-        print("  python train_pathology_model.py --data path/to/dataset")
-        print("  python train_pathology_model.py --data path/to/dataset --epochs 100 --batch-size 16")
+        print("  python train_pathology_model.py --data path/to/dataset --model tooth_best.pt")
+        print("  python train_pathology_model.py --data path/to/dataset --device cpu --epochs 50")
+        print("  python train_pathology_model.py --data path/to/dataset --no-cache  # with augmentation")
         print("  python train_pathology_model.py --data path/to/dataset --resume")
-    
+        print("  python train_pathology_model.py --clinical-validation best.pt --test-images path/to/test")
+
     print("\n" + "="*60)
-    print("🚧 Note: This is a placeholder implementation")
-    print("🕒 Expected release: Q2 2026")
     print("📚 Documentation: docs/PATHOLOGY_ROADMAP.md")
     print("🔗 GitHub: https://github.com/ajeetraina/dentescope-ai-complete")
     print("="*60)
@@ -1,23 +1,53 @@
 #!/usr/bin/env python3
 """
 Run predictions on dental X-rays using trained model
+
+`predict.py --serve` keeps the model loaded in a daemon behind a Unix
+domain socket. Later `predict.py --image ...` calls send the image paths
+to the daemon and get JSON detections back, skipping interpreter warm-up,
+torch import and weight loading. Without a running daemon the prediction
+runs in-process as before.
+
+Sources can be files, directories, globs or a manifest file. Images are
+streamed through the model in batches and each record is written as soon
+as it is ready (--jsonl / --output), so memory stays flat on large runs.
 """
 
-from ultralytics import YOLO
-import cv2
+import glob
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
 from pathlib import Path
 
+from dentescope.registry import loaded_models, resolve
+from dentescope.scanner import is_image_file, list_images
+
+DEFAULT_MODEL = 'runs/train/tooth_detection/weights/best.pt'
+
+
+def default_socket_path():
+    """$DENTESCOPE_PREDICT_SOCKET or a per-user socket in the temp directory"""
+    return os.environ.get(
+        'DENTESCOPE_PREDICT_SOCKET',
+        os.path.join(tempfile.gettempdir(), f'dentescope-predict-{os.getuid()}.sock')
+    )
+
+
 def predict(
-    model_path='runs/train/tooth_detection/weights/best.pt',
+    model_path=DEFAULT_MODEL,
     image_path='test.jpg',
     conf=0.5,
     save=True
 ):
     """Run prediction on image"""
-    
+    from dentescope.registry import load_model
+
     # Load model
-    model = YOLO(model_path)
-    
+    model = load_model(model_path)
+
     # Predict
     results = model.predict(
         source=image_path,
@@ -26,7 +56,7 @@ def predict(
         project='runs/predict',
         name='results'
     )
-    
+
     # Print results
     for r in results:
         boxes = r.boxes
@@ -35,23 +65,418 @@ def predict(
             conf = box.conf[0]
             cls = box.cls[0]
             print(f"  Tooth {i+1}: confidence={conf:.2f}")
-    
+
     print(f"\n✅ Results saved to: runs/predict/results/")
-    
+
     return results
 
-if __name__ == '__main__':
+
+def iter_sources(sources=(), manifest=None, recursive=False):
+    """
+    Expand image sources into image paths, lazily and without duplicates.
+
+    Args:
+        sources: Image files, directories or glob patterns ('scans/**/*.jpg')
+        manifest: Text file with one source per line ('-' for stdin);
+            relative paths are resolved against the manifest's directory
+        recursive: Descend into subdirectories of directory sources
+
+    Yields:
+        Absolute image paths (str); missing files are passed through so the
+        caller can report them
+    """
+    seen = set()
+
+    def expand(source, base=None):
+        path = Path(source).expanduser()
+        if base is not None and not path.is_absolute():
+            path = base / path
+        if path.is_dir():
+            yield from (str(p.resolve()) for p in list_images(path, recursive=recursive))
+        elif glob.has_magic(str(path)):
+            for match in sorted(glob.iglob(str(path), recursive=True)):
+                if is_image_file(match) and os.path.isfile(match):
+                    yield str(Path(match).resolve())
+        else:
+            yield str(path.resolve())
+
+    def manifest_lines():
+        if manifest == '-':
+            yield from ((line, None) for line in sys.stdin)
+            return
+        base = Path(manifest).resolve().parent
+        with open(manifest) as f:
+            yield from ((line, base) for line in f)
+
+    def all_sources():
+        for source in sources:
+            yield from expand(source)
+        if manifest:
+            for line, base in manifest_lines():
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield from expand(line, base)
+
+    for path in all_sources():
+        if path not in seen:
+            seen.add(path)
+            yield path
+
+
+def result_to_record(result):
+    """Convert one ultralytics result into a JSON-serializable record"""
+    boxes = result.boxes
+    xyxy = boxes.xyxy.tolist()
+    confidences = boxes.conf.tolist()
+    classes = boxes.cls.tolist()
+    height, width = result.orig_shape[:2]
+    return {
+        'image': result.path,
+        'width': int(width),
+        'height': int(height),
+        'inference_ms': round(result.speed.get('inference') or 0.0, 2),  # batch average
+        'detections': [
+            {
+                'xyxy': [round(v, 2) for v in box],
+                'confidence': round(c, 4),
+                'class': int(k)
+            }
+            for box, c, k in zip(xyxy, confidences, classes)
+        ]
+    }
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_predictions(model, image_paths, conf=0.5, save=True, save_dir='runs/predict',
+                     batch=16):
+    """
+    Stream detection records for image paths.
+
+    Paths are fed to ultralytics in chunks with stream=True, so only one
+    batch of decoded images and result tensors is alive at a time and
+    records can be written as soon as each image is done.
+
+    Args:
+        model: Loaded YOLO model
+        image_paths: Iterable of image paths (may be a generator)
+        conf: Confidence threshold
+        save: Save annotated images to <save_dir>/results
+        save_dir: Parent directory for annotated images
+        batch: Images per inference batch
+
+    Yields:
+        One record per image; unreadable images yield {'image', 'error'}
+    """
+    import logging
+    from ultralytics.utils import LOGGER
+
+    # ultralytics logs to stdout, which would corrupt JSONL output
+    LOGGER.setLevel(logging.WARNING)
+
+    options = dict(conf=conf, save=save, project=save_dir, name='results',
+                   exist_ok=True, verbose=False, stream=True, batch=batch)
+
+    # Several batches per predict() call to amortize source setup
+    for chunk in _chunks(image_paths, batch * 8):
+        readable = []
+        for path in chunk:
+            if os.path.isfile(path):
+                readable.append(path)
+            else:
+                yield {'image': path, 'error': 'file not found'}
+        if not readable:
+            continue
+        # ultralytics reports result.path as Path(p).absolute()
+        done = set()
+        try:
+            for result in model.predict(source=readable, **options):
+                done.add(result.path)
+                yield result_to_record(result)
+        except Exception:
+            # A corrupt image aborts the rest of the chunk; redo what is left one by one
+            for path in readable:
+                if str(Path(path).absolute()) in done:
+                    continue
+                try:
+                    for result in model.predict(source=path, **options):
+                        done.add(result.path)
+                        yield result_to_record(result)
+                except Exception as e:
+                    if str(Path(path).absolute()) not in done:
+                        yield {'image': path, 'error': f"{type(e).__name__}: {e}"}
+
+
+def connect_daemon(socket_path=None, connect_timeout=0.5):
+    """Connected socket to the predict daemon, or None if none is listening"""
+    socket_path = socket_path or default_socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(connect_timeout)
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return sock
+
+
+def _send(sock, payload):
+    sock.sendall((json.dumps(payload) + '\n').encode())
+
+
+def request_daemon(payload, socket_path=None):
+    """
+    Send one request to the predict daemon and return its first response line.
+
+    Returns:
+        Response dict, or None if no daemon is listening
+    """
+    sock = connect_daemon(socket_path)
+    if sock is None:
+        return None
+    with sock, sock.makefile('r') as reader:
+        _send(sock, payload)
+        line = reader.readline()
+    if not line:
+        raise ConnectionError("Predict daemon closed the connection")
+    return json.loads(line)
+
+
+def stream_daemon(sock, payload):
+    """Send a predict request on a connected socket and yield records as they arrive"""
+    with sock, sock.makefile('r') as reader:
+        _send(sock, payload)
+        for line in reader:
+            message = json.loads(line)
+            if 'result' in message:
+                yield message['result']
+            elif 'error' in message:
+                raise RuntimeError(f"Predict daemon error: {message['error']}")
+            elif message.get('done') is not None:
+                return
+    raise ConnectionError("Predict daemon closed the connection")
+
+
+def detect(image_paths, model_path=None, conf=0.5, save=True,
+           socket_path=None, use_daemon=True, batch=16):
+    """
+    Detect teeth, through the daemon when one is running.
+
+    Args:
+        image_paths: Iterable of image paths (see iter_sources)
+        model_path: Model weights or registry name (default: the daemon's
+            own model, or DEFAULT_MODEL in-process)
+        conf: Confidence threshold
+        save: Save annotated images under runs/predict/results
+        socket_path: Daemon socket (default: default_socket_path())
+        use_daemon: Try the daemon first; fall back to in-process
+        batch: Images per inference batch
+
+    Returns:
+        (record iterator, served_by) where served_by is 'daemon' or 'local'
+    """
+    save_dir = str(Path('runs/predict').resolve())
+
+    def local(images):
+        from dentescope.registry import load_model
+        model = load_model(resolve(model_path or DEFAULT_MODEL))
+        yield from iter_predictions(model, images, conf=conf, save=save,
+                                    save_dir=save_dir, batch=batch)
+
+    sock = connect_daemon(socket_path) if use_daemon else None
+    if sock is None:
+        return local(image_paths), 'local'
+
+    # Absolute paths so the daemon resolves them independent of its cwd
+    images = [str(Path(p).resolve()) for p in image_paths]
+    payload = {'images': images, 'conf': conf, 'save': save,
+               'save_dir': save_dir, 'batch': batch}
+    if model_path is not None:
+        payload['model'] = str(Path(resolve(model_path)).resolve())
+
+    def served():
+        sent = 0
+        try:
+            for record in stream_daemon(sock, payload):
+                sent += 1
+                yield record
+        except (RuntimeError, ConnectionError) as e:
+            if sent:
+                raise
+            # Nothing was served yet (e.g. the daemon can't load the model)
+            print(f"⚠️  {e}; running in-process", file=sys.stderr)
+            yield from local(images)
+
+    return served(), 'daemon'
+
+
+def serve(model_path=DEFAULT_MODEL, socket_path=None):
+    """
+    Keep models loaded and answer predict requests on a Unix domain socket.
+
+    Protocol: one JSON object per line in each direction. A request carries
+    'images', 'model', 'conf', 'save', 'save_dir' and 'batch'; the daemon
+    answers with one {'result': record} line per image as it is processed,
+    then {'done': count}, or {'error': message}. {'cmd': 'ping'} returns
+    the loaded models.
+    """
+    import socketserver
+    import threading
+    from dentescope.registry import load_model
+
+    socket_path = socket_path or default_socket_path()
+    if os.path.exists(socket_path):
+        if request_daemon({'cmd': 'ping'}, socket_path) is not None:
+            print(f"❌ A predict daemon is already listening on {socket_path}")
+            sys.exit(1)
+        os.unlink(socket_path)  # stale socket from a crashed daemon
+
+    lock = threading.Lock()
+
+    def get_model(ref):
+        path = str(Path(resolve(ref)).resolve())
+        if path not in loaded_models():
+            print(f"📦 Loading model: {path}")
+        return load_model(path)
+
+    start = time.perf_counter()
+    get_model(model_path)
+    print(f"✓ Model warm in {time.perf_counter() - start:.2f}s")
+
+    class Handler(socketserver.StreamRequestHandler):
+        def send(self, message):
+            self.wfile.write((json.dumps(message) + '\n').encode())
+            self.wfile.flush()
+
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    if request.get('cmd') == 'ping':
+                        self.send({'status': 'ok', 'models': list(loaded_models())})
+                        continue
+                    # One inference at a time; torch already uses all cores
+                    with lock:
+                        model = get_model(request.get('model') or model_path)
+                        count = 0
+                        for record in iter_predictions(
+                            model, request['images'],
+                            conf=request.get('conf', 0.5),
+                            save=request.get('save', False),
+                            save_dir=request.get('save_dir', 'runs/predict'),
+                            batch=request.get('batch', 16)
+                        ):
+                            self.send({'result': record})
+                            count += 1
+                    self.send({'done': count})
+                except (BrokenPipeError, ConnectionResetError):
+                    return  # client went away
+                except Exception as e:
+                    self.send({'error': f"{type(e).__name__}: {e}"})
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    os.chmod(socket_path, 0o600)
+    print(f"🟢 Predict daemon listening on {socket_path} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping predict daemon")
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main(argv=None):
     import argparse
-    
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--model', default='runs/train/tooth_detection/weights/best.pt', help='Model path')
-    parser.add_argument('--image', required=True, help='Image path')
+
+    parser = argparse.ArgumentParser(
+        description='Detect teeth in dental X-rays',
+        epilog="Sources may be image files, directories or quoted globs "
+               "('scans/**/*.jpg'). JSONL output has one record per image."
+    )
+    parser.add_argument('--model',
+                        help=f"Model path or registry name (default: the daemon's model, else {DEFAULT_MODEL})")
+    parser.add_argument('--image', nargs='+', default=[],
+                        help='Image files, directories or glob patterns')
+    parser.add_argument('--manifest', help="Text file listing one source per line ('-' for stdin)")
+    parser.add_argument('--recursive', action='store_true', help='Descend into subdirectories')
     parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold')
-    
-    args = parser.parse_args()
-    
-    predict(
+    parser.add_argument('--batch', type=int, default=16, help='Images per inference batch')
+    parser.add_argument('--jsonl', action='store_true', help='Write JSONL records to stdout')
+    parser.add_argument('--output', help='Write JSONL records to this file')
+    parser.add_argument('--serve', action='store_true', help='Run as a warm predict daemon')
+    parser.add_argument('--socket', default=None, help='Daemon socket path')
+    parser.add_argument('--no-daemon', action='store_true', help='Always run in-process')
+    parser.add_argument('--no-save', action='store_true', help="Don't save annotated images")
+
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(model_path=args.model or DEFAULT_MODEL, socket_path=args.socket)
+        return
+
+    if not args.image and not args.manifest:
+        parser.error('--image or --manifest is required unless --serve is given')
+
+    sources = iter_sources(args.image, manifest=args.manifest, recursive=args.recursive)
+    records, served_by = detect(
+        sources,
         model_path=args.model,
-        image_path=args.image,
-        conf=args.conf
-    )
\ No newline at end of file
+        conf=args.conf,
+        save=not args.no_save,
+        socket_path=args.socket,
+        use_daemon=not args.no_daemon,
+        batch=args.batch
+    )
+
+    # Human-readable progress goes to stderr when stdout carries JSONL
+    log = sys.stderr if args.jsonl else sys.stdout
+    sink = open(args.output, 'w') if args.output else (sys.stdout if args.jsonl else None)
+
+    start = time.perf_counter()
+    images = teeth = failed = 0
+    try:
+        for record in records:
+            images += 1
+            if sink is not None:
+                sink.write(json.dumps(record) + '\n')
+                sink.flush()
+            if 'error' in record:
+                failed += 1
+                print(f"⚠️  {record['image']}: {record['error']}", file=log)
+                continue
+            teeth += len(record['detections'])
+            if sink is None:
+                print(f"\n{Path(record['image']).name}: detected {len(record['detections'])} teeth")
+                for i, det in enumerate(record['detections']):
+                    print(f"  Tooth {i+1}: confidence={det['confidence']:.2f}")
+    except (RuntimeError, ConnectionError, FileNotFoundError) as e:
+        print(f"❌ {e}", file=log)
+        sys.exit(1)
+    finally:
+        if args.output and sink is not None:
+            sink.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n⚡ {images} images, {teeth} teeth in {elapsed:.1f}s "
+          f"(served by {served_by})" + (f", {failed} failed" if failed else ''), file=log)
+    if args.output:
+        print(f"📄 Records written to: {args.output}", file=log)
+    if not args.no_save:
+        print(f"✅ Results saved to: runs/predict/results/", file=log)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,140 @@
 """
 Prepare dataset for YOLO training
 Organize images and create data.yaml
+
+Splits are deterministic: images are ordered by a seeded hash of their name
+and the order is cut at the requested ratios, so split sizes are exact and
+adding an image moves at most one existing file across each cut. A manifest
+of the previous run (prepare_manifest.json) lets re-preparation touch only
+files that were added, removed or changed in the source directory.
 """
 
+import errno
+import hashlib
+import json
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import random
+
+from dentescope.scanner import scan_images
+
+SPLITS = ['train', 'val', 'test']
+LINK_MODES = ['copy', 'hardlink', 'symlink', 'reflink']
+MANIFEST_NAME = 'prepare_manifest.json'
+MANIFEST_VERSION = 1
+
+FICLONE = 0x40049409  # Linux ioctl: share extents (btrfs, XFS, overlayfs on those)
+
+
+def assign_splits(names, seed, train_split, val_split, group_of=None):
+    """
+    Split for every image name.
+
+    Names are sorted by a seeded hash (stable across runs) and the order is
+    cut at round(n * train) and round(n * (train + val)).
+
+    Args:
+        names: Image names
+        group_of: Optional name -> group key; images of a group sort together
+            and all take the split of the group's first image
+
+    Returns:
+        Dict of name -> 'train', 'val' or 'test'
+    """
+    group_of = group_of or {}
+
+    def rank(name):
+        key = group_of.get(name, name)
+        return hashlib.blake2b(f"{seed}:{key}".encode('utf-8'), digest_size=8).digest(), key, name
+
+    order = sorted(names, key=rank)
+    train_end = round(len(order) * train_split)
+    val_end = round(len(order) * (train_split + val_split))
+    splits, group_splits = {}, {}
+    for position, name in enumerate(order):
+        split = 'train' if position < train_end else 'val' if position < val_end else 'test'
+        splits[name] = group_splits.setdefault(group_of.get(name, name), split)
+    return splits
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+
+def place_file(src, dst, mode='copy'):
+    """
+    Materialize src at dst.
+
+    hardlink and reflink fall back to a copy when the filesystem can't do
+    them (different device, no extent sharing). Copies keep the source
+    mtime so training caches keyed on mtime stay valid.
+
+    Returns:
+        The mode actually used
+    """
+    src, dst = str(src), str(dst)
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    if mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+        return mode
+    if mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return mode
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+    elif mode == 'reflink':
+        try:
+            _reflink(src, dst)
+            return mode
+        except OSError as e:
+            if os.path.exists(dst):
+                os.unlink(dst)
+            if e.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+                raise
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_manifest(output_dir):
+    path = Path(output_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def write_manifest(output_dir, manifest):
+    path = Path(output_dir) / MANIFEST_NAME
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
 
 def prepare_dataset(
     images_dir='./images',
     output_dir='./dataset',
     train_split=0.8,
     val_split=0.1,
-    test_split=0.1
+    test_split=0.1,
+    mode='copy',
+    seed=0,
+    workers=None,
+    full=False,
+    group_duplicates=False
 ):
     """
     Organize images into YOLO format:
@@ -27,46 +148,127 @@ def prepare_dataset(
           ├── train/
           ├── val/
           └── test/
+
+    Args:
+        images_dir: Source images (labels are the matching .txt files)
+        output_dir: Dataset directory
+        train_split, val_split, test_split: Split ratios
+        mode: copy, hardlink, symlink or reflink
+        seed: Split seed; the same seed always gives the same splits
+        workers: Copy threads (default: 4 x cores, max 32)
+        full: Ignore the previous manifest and re-place every file
+        group_duplicates: Give near-duplicate images the split of their
+            group's original shot, so no duplicate spans train and val/test
     """
-    
+    if mode not in LINK_MODES:
+        raise ValueError(f"mode must be one of {LINK_MODES}")
+
     # Create directories
-    for split in ['train', 'val', 'test']:
+    for split in SPLITS:
         Path(f'{output_dir}/images/{split}').mkdir(parents=True, exist_ok=True)
         Path(f'{output_dir}/labels/{split}').mkdir(parents=True, exist_ok=True)
-    
-    # Get all images
-    image_files = []
-    for ext in ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG']:
-        image_files.extend(list(Path(images_dir).glob(ext)))
-    
-    print(f"Found {len(image_files)} images")
-    
-    # Shuffle
-    random.shuffle(image_files)
-    
-    # Split
-    n_train = int(len(image_files) * train_split)
-    n_val = int(len(image_files) * val_split)
-    
-    train_files = image_files[:n_train]
-    val_files = image_files[n_train:n_train+n_val]
-    test_files = image_files[n_train+n_val:]
-    
-    print(f"Train: {len(train_files)}, Val: {len(val_files)}, Test: {len(test_files)}")
-    
-    # Copy files
-    for files, split in [(train_files, 'train'), (val_files, 'val'), (test_files, 'test')]:
-        for img_file in files:
-            # Copy image
-            dst_img = f'{output_dir}/images/{split}/{img_file.name}'
-            shutil.copy(img_file, dst_img)
-            
-            # Copy label if exists
-            label_file = img_file.with_suffix('.txt')
-            if label_file.exists():
-                dst_label = f'{output_dir}/labels/{split}/{label_file.name}'
-                shutil.copy(label_file, dst_label)
-    
+
+    # Get all images (stat info comes from the scanner's cached index)
+    records = scan_images(images_dir, recursive=False, with_hash=False)
+
+    print(f"Found {len(records)} images")
+
+    # Near-duplicates are split by the name of their group's keeper
+    split_names = {}
+    if group_duplicates:
+        from dentescope.dedupe import build_index, duplicate_groups
+        groups = duplicate_groups(build_index(images_dir, recursive=False, workers=workers))
+        split_names = {Path(path).name: Path(group[0]).name
+                       for group in groups for path in group}
+        print(f"Grouped {sum(len(g) for g in groups)} near-duplicate images into {len(groups)} groups")
+
+    source = str(Path(images_dir).resolve())
+    manifest = load_manifest(output_dir)
+    previous_files = manifest['files'] if manifest else {}
+    incremental = (manifest is not None and not full
+                   and manifest['source'] == source and manifest['mode'] == mode)
+    if manifest and not incremental and not full:
+        print("⚠️  Source or link mode changed since the last run, re-placing all files")
+
+    splits = assign_splits([Path(record.path).name for record in records],
+                           seed, train_split, val_split, split_names)
+
+    # Plan: compare every image with its previous manifest entry
+    files = {}
+    tasks = []
+    counts = dict.fromkeys(['added', 'updated', 'moved', 'unchanged', 'removed'], 0)
+    for record in records:
+        img_file = Path(record.path)
+        label_file = img_file.with_suffix('.txt')
+        entry = {
+            'split': splits[img_file.name],
+            'image': [record.size, record.mtime_ns],
+            'label': _stat_key(label_file) if label_file.exists() else None
+        }
+        files[img_file.name] = entry
+        old = previous_files.get(img_file.name) if incremental else None
+
+        if old == entry:
+            counts['unchanged'] += 1
+            continue
+        if old is None:
+            counts['added'] += 1
+        elif old['image'] == entry['image'] and old['label'] == entry['label']:
+            counts['moved'] += 1
+        else:
+            counts['updated'] += 1
+        tasks.append((img_file, label_file, entry, old))
+
+    # Files gone from the source; all old outputs when starting over
+    counts['removed'] = sum(1 for name in previous_files if name not in files)
+    stale = [(name, old) for name, old in previous_files.items()
+             if not incremental or name not in files]
+
+    split_counts = {split: sum(1 for e in files.values() if e['split'] == split)
+                    for split in SPLITS}
+    print(f"Train: {split_counts['train']}, Val: {split_counts['val']}, Test: {split_counts['test']}")
+    print(f"Changes: {counts['added']} added, {counts['updated']} updated, "
+          f"{counts['moved']} moved, {counts['removed']} removed, {counts['unchanged']} unchanged")
+
+    def remove_outputs(name, old):
+        for path in (Path(output_dir) / 'images' / old['split'] / name,
+                     Path(output_dir) / 'labels' / old['split'] / Path(name).with_suffix('.txt')):
+            if os.path.lexists(path):
+                os.unlink(path)
+
+    def place(task):
+        img_file, label_file, entry, old = task
+        split = entry['split']
+        dst_img = Path(f'{output_dir}/images/{split}/{img_file.name}')
+        dst_label = Path(f'{output_dir}/labels/{split}/{label_file.name}')
+        if old is not None and old['split'] != split:
+            old_img = Path(output_dir) / 'images' / old['split'] / img_file.name
+            old_label = Path(output_dir) / 'labels' / old['split'] / label_file.name
+            unchanged = old['image'] == entry['image'] and old['label'] == entry['label']
+            if unchanged and os.path.lexists(old_img):
+                # Split changed only (new seed or ratios): move, don't re-copy
+                os.replace(old_img, dst_img)
+                if os.path.lexists(old_label):
+                    os.replace(old_label, dst_label)
+                return mode
+            remove_outputs(img_file.name, old)
+        used = place_file(img_file, dst_img, mode)
+        if entry['label'] is not None:
+            place_file(label_file, dst_label, mode)
+        elif os.path.lexists(dst_label):
+            os.unlink(dst_label)
+        return used
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Removals finish before placement starts, so they never hit new files
+        list(pool.map(lambda item: remove_outputs(*item), stale))
+        modes_used = list(pool.map(place, tasks))
+
+    fallbacks = sum(1 for used in modes_used if used != mode)
+    if fallbacks:
+        print(f"⚠️  {fallbacks} files were copied because {mode} is not supported here")
+
     # Create data.yaml
     yaml_content = f"""# Dataset configuration
 path: {os.path.abspath(output_dir)}
@@ -78,30 +280,58 @@ test: images/test
 nc: 1
 names: ['tooth']
 """
-    
-    with open(f'{output_dir}/data.yaml', 'w') as f:
-        f.write(yaml_content)
-    
+
+    yaml_path = Path(f'{output_dir}/data.yaml')
+    if not yaml_path.exists() or yaml_path.read_text() != yaml_content:
+        yaml_path.write_text(yaml_content)
+
+    # Manifest last: an interrupted run is simply redone next time
+    write_manifest(output_dir, {
+        'version': MANIFEST_VERSION,
+        'source': source,
+        'mode': mode,
+        'seed': seed,
+        'splits': [train_split, val_split, test_split],
+        'files': files
+    })
+
     print(f"\n✅ Dataset prepared in: {output_dir}")
     print(f"✅ Configuration: {output_dir}/data.yaml")
-    
+
     return output_dir
 
-if __name__ == '__main__':
+def main(argv=None):
     import argparse
-    
+
     parser = argparse.ArgumentParser()
     parser.add_argument('--images', default='./images', help='Images directory')
     parser.add_argument('--output', default='./dataset', help='Output directory')
     parser.add_argument('--train', type=float, default=0.8, help='Train split ratio')
     parser.add_argument('--val', type=float, default=0.1, help='Val split ratio')
-    
-    args = parser.parse_args()
-    
+    parser.add_argument('--mode', default='copy', choices=LINK_MODES,
+                        help='How files are placed (hardlink/reflink fall back to copy)')
+    parser.add_argument('--seed', type=int, default=0, help='Split seed')
+    parser.add_argument('--workers', type=int, help='Copy threads')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the previous manifest and re-place every file')
+    parser.add_argument('--group-duplicates', action='store_true',
+                        help='Keep near-duplicate images in the same split')
+
+    args = parser.parse_args(argv)
+
     prepare_dataset(
         images_dir=args.images,
         output_dir=args.output,
         train_split=args.train,
         val_split=args.val,
-        test_split=1.0 - args.train - args.val
-    )
\ No newline at end of file
+        test_split=1.0 - args.train - args.val,
+        mode=args.mode,
+        seed=args.seed,
+        workers=args.workers,
+        full=args.full,
+        group_duplicates=args.group_duplicates
+    )
+
+
+if __name__ == '__main__':
+    main()
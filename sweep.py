@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+DenteScope AI - Hyperparameter Sweep
+Run training trials from a search space concurrently, stopping weak trials early
+
+Trials run in separate processes with a fixed CPU thread budget each, so
+J concurrent trials on a C-core box do not oversubscribe the CPU. Early
+termination uses ASHA (asynchronous successive halving): at each rung
+(min_epochs * eta^k epochs) a trial continues only if its validation metric
+is in the top 1/eta of all trials that reached that rung so far. No trial
+waits for others, so workers never sit idle.
+
+Search space file (YAML):
+
+    data: dataset/data.yaml
+    epochs: 60          # max epochs per trial
+    min_epochs: 5       # first rung
+    eta: 3              # keep the top 1/eta at each rung
+    trials: 24          # random samples; omit for a full grid over lists
+    metric: fitness     # fitness, map50 or map50-95
+    seed: 0
+    fixed:              # passed to every trial
+      imgsz: 640
+      batch: 16
+    space:
+      model_size: [n, s]
+      lr0: {loguniform: [0.001, 0.02]}
+      degrees: {uniform: [0, 15]}
+      mosaic: [0.5, 1.0]
+"""
+
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+METRICS = {
+    'fitness': None,  # trainer.fitness (0.1 * mAP50 + 0.9 * mAP50-95)
+    'map50': 'metrics/mAP50(B)',
+    'map50-95': 'metrics/mAP50-95(B)',
+}
+RESULT_FIELDS = ['trial', 'status', 'epochs', 'best_metric', 'best_epoch', 'map50',
+                 'map50_95', 'seconds', 'weights', 'params', 'error']
+
+
+def sample_space(space, trials=None, seed=0):
+    """
+    Expand a search space into trial parameter dicts.
+
+    Lists are categorical choices; {uniform: [a, b]}, {loguniform: [a, b]}
+    and {int: [a, b]} are sampled. Without `trials` and with only lists,
+    the full grid is returned.
+    """
+    if trials is None:
+        if not all(isinstance(v, list) for v in space.values()):
+            raise ValueError("'trials' is required when the space has continuous ranges")
+        keys = list(space)
+        return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(trials):
+        params = {}
+        for key, spec in space.items():
+            if isinstance(spec, list):
+                params[key] = rng.choice(spec)
+            elif 'uniform' in spec:
+                params[key] = round(rng.uniform(*spec['uniform']), 6)
+            elif 'loguniform' in spec:
+                low, high = spec['loguniform']
+                params[key] = round(math.exp(rng.uniform(math.log(low), math.log(high))), 6)
+            elif 'int' in spec:
+                params[key] = rng.randint(*spec['int'])
+            else:
+                raise ValueError(f"Unknown distribution for '{key}': {spec}")
+        samples.append(params)
+    return samples
+
+
+def rung_epochs(min_epochs, max_epochs, eta):
+    """Epochs at which trials are compared: min_epochs * eta^k below max_epochs"""
+    rungs = []
+    epoch = min_epochs
+    while epoch < max_epochs:
+        rungs.append(int(epoch))
+        epoch *= eta
+    return rungs
+
+
+class ASHA:
+    """
+    Asynchronous successive halving shared by all trial processes.
+
+    Rung results live in a multiprocessing.Manager dict, so the object can
+    be passed to spawned workers.
+    """
+
+    def __init__(self, manager, rungs, eta):
+        self.rungs = set(rungs)
+        self.eta = eta
+        self.results = manager.dict({r: [] for r in rungs})
+        self.lock = manager.Lock()
+
+    def report(self, epoch, value):
+        """Record a trial's metric at an epoch; False means stop the trial"""
+        if epoch not in self.rungs:
+            return True
+        with self.lock:
+            recorded = self.results[epoch] + [value]
+            self.results[epoch] = recorded
+        if len(recorded) < self.eta:
+            return True  # not enough trials at this rung to judge yet
+        ranked = sorted(recorded, reverse=True)
+        cutoff = ranked[max(len(ranked) // self.eta, 1) - 1]
+        return value >= cutoff
+
+
+def _limit_threads(threads):
+    # Must run before torch/numpy start their thread pools
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+
+def run_trial(trial_id, params, config, sweep_dir, scheduler, threads):
+    """Train one trial in this (worker) process and return its result row"""
+    trial_dir = Path(sweep_dir) / trial_id
+    trial_dir.mkdir(parents=True, exist_ok=True)
+
+    # Keep the console readable: each trial logs to its own file. Workers run
+    # several trials, so the console is restored and the log closed after each
+    saved = [os.dup(1), os.dup(2)]
+    with open(trial_dir / 'train.log', 'w') as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            return _train_trial(trial_id, params, config, sweep_dir, trial_dir, scheduler, threads)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            for fd, original in zip((1, 2), saved):
+                os.dup2(original, fd)
+                os.close(original)
+
+
+def _train_trial(trial_id, params, config, sweep_dir, trial_dir, scheduler, threads):
+    import torch
+    torch.set_num_threads(threads)
+    sys.path.insert(0, str(Path(__file__).resolve().parent))  # repo root
+    from train_tooth_model import train_model
+
+    metric_key = METRICS[config['metric']]
+    history = []
+    state = {'status': 'completed'}
+
+    def on_fit_epoch_end(trainer):
+        epoch = trainer.epoch + 1
+        if history and history[-1]['epoch'] >= epoch:
+            return  # final validation of best.pt re-fires this callback
+        value = trainer.fitness if metric_key is None else trainer.metrics.get(metric_key)
+        history.append({'epoch': epoch, 'value': float(value or 0.0),
+                        'map50': trainer.metrics.get('metrics/mAP50(B)'),
+                        'map50_95': trainer.metrics.get('metrics/mAP50-95(B)')})
+        if scheduler is not None and not scheduler.report(epoch, float(value or 0.0)):
+            state['status'] = 'stopped'
+            trainer.stop = True
+
+    start = time.time()
+    params = dict(params)
+    fixed = dict(config.get('fixed', {}))
+    train_kwargs = {**fixed, **params}
+    row = {'trial': trial_id, 'params': json.dumps(params, sort_keys=True)}
+    try:
+        train_model(
+            data_yaml_path=config['data'],
+            model_size=train_kwargs.pop('model_size', 'n'),
+            epochs=config['epochs'],
+            imgsz=train_kwargs.pop('imgsz', 640),
+            batch_size=train_kwargs.pop('batch', 16),
+            device=train_kwargs.pop('device', 'cpu'),
+            project=str(Path(sweep_dir).resolve()),
+            name=trial_id,
+            cache=train_kwargs.pop('cache', 'mmap'),
+            callbacks={'on_fit_epoch_end': on_fit_epoch_end},
+            exist_ok=True,
+            plots=False,
+            workers=train_kwargs.pop('workers', max(1, threads // 2)),
+            **train_kwargs
+        )
+        row['status'] = state['status']
+    except Exception as e:
+        row.update(status='failed', error=f"{type(e).__name__}: {e}")
+
+    if history:
+        best = max(history, key=lambda h: h['value'])
+        row.update(epochs=history[-1]['epoch'], best_metric=round(best['value'], 5),
+                   best_epoch=best['epoch'], map50=best['map50'], map50_95=best['map50_95'])
+    weights = trial_dir / 'weights' / 'best.pt'
+    row['weights'] = str(weights) if weights.exists() else ''
+    row['seconds'] = round(time.time() - start, 1)
+    with open(trial_dir / 'history.json', 'w') as f:
+        json.dump(history, f, indent=2)
+    return row
+
+
+def write_results(rows, sweep_dir):
+    """Write the comparable results table, best trial first"""
+    ranked = sorted(rows, key=lambda r: (r.get('best_metric') is None, -(r.get('best_metric') or 0)))
+    with open(Path(sweep_dir) / 'results.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for row in ranked:
+            writer.writerow({k: row.get(k, '') for k in RESULT_FIELDS})
+    return ranked
+
+
+def sweep(space_file, output_dir='runs/sweep', jobs=None, threads=None, scheduler='asha'):
+    """
+    Run a hyperparameter sweep.
+
+    Args:
+        space_file: YAML search space (see module docstring)
+        output_dir: Parent directory for sweep runs
+        jobs: Concurrent trials (default: cores // 4)
+        threads: CPU threads per trial (default: cores // jobs)
+        scheduler: 'asha' or 'none' (run every trial to the end)
+
+    Returns:
+        Result rows, best first
+    """
+    with open(space_file) as f:
+        config = yaml.safe_load(f)
+    config.setdefault('epochs', 60)
+    config.setdefault('min_epochs', max(1, config['epochs'] // 12))
+    config.setdefault('eta', 3)
+    config.setdefault('metric', 'fitness')
+    if config['metric'] not in METRICS:
+        raise ValueError(f"metric must be one of {list(METRICS)}")
+
+    trials = sample_space(config['space'], config.get('trials'), config.get('seed', 0))
+    cores = os.cpu_count() or 1
+    jobs = max(1, min(jobs or max(1, cores // 4), len(trials)))
+    threads = threads or max(1, cores // jobs)
+    rungs = rung_epochs(config['min_epochs'], config['epochs'], config['eta'])
+
+    sweep_dir = Path(output_dir) / datetime.now().strftime('sweep_%Y%m%d_%H%M%S')
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    with open(sweep_dir / 'sweep.json', 'w') as f:
+        json.dump({'config': config, 'trials': trials, 'jobs': jobs, 'threads': threads,
+                   'scheduler': scheduler, 'rungs': rungs}, f, indent=2)
+
+    print("=" * 60)
+    print("DenteScope AI - Hyperparameter Sweep")
+    print("=" * 60)
+    print(f"   • Trials: {len(trials)} ({jobs} concurrent, {threads} threads each)")
+    print(f"   • Max epochs: {config['epochs']}, metric: {config['metric']}")
+    if scheduler == 'asha':
+        print(f"   • ASHA rungs at epochs {rungs}, keeping top 1/{config['eta']}")
+    print(f"   • Output: {sweep_dir}")
+
+    context = multiprocessing.get_context('spawn')
+    manager = context.Manager()
+    asha = ASHA(manager, rungs, config['eta']) if scheduler == 'asha' else None
+
+    rows = []
+    width = len(str(len(trials) - 1))
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                             initializer=_limit_threads, initargs=(threads,)) as pool:
+        futures = {
+            pool.submit(run_trial, f"trial_{i:0{width}d}", params, config,
+                        str(sweep_dir), asha, threads): i
+            for i, params in enumerate(trials)
+        }
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            metric = row.get('best_metric')
+            shown = f"{metric:.4f}" if metric is not None else 'n/a'
+            icon = {'completed': '✓', 'stopped': '✂️', 'failed': '❌'}[row['status']]
+            print(f"{icon} [{len(rows)}/{len(trials)}] {row['trial']} {row['status']} "
+                  f"after {row.get('epochs', 0)} epochs, {config['metric']}={shown} "
+                  f"({row['seconds']:.0f}s) {row['params']}")
+            write_results(rows, sweep_dir)
+    manager.shutdown()
+
+    ranked = write_results(rows, sweep_dir)
+    print(f"\n🏆 Top trials ({config['metric']}):")
+    for row in ranked[:5]:
+        if row.get('best_metric') is not None:
+            print(f"   {row['trial']}: {row['best_metric']:.4f} @ epoch {row['best_epoch']} "
+                  f"{row['params']}")
+    print(f"\n✅ Results table: {sweep_dir / 'results.csv'}")
+    return ranked
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Hyperparameter sweep for tooth detection')
+    parser.add_argument('space', help='Search space YAML file')
+    parser.add_argument('--output', default='runs/sweep', help='Parent directory for sweeps')
+    parser.add_argument('--jobs', type=int, help='Concurrent trials (default: cores // 4)')
+    parser.add_argument('--threads', type=int, help='CPU threads per trial (default: cores // jobs)')
+    parser.add_argument('--scheduler', default='asha', choices=['asha', 'none'],
+                        help='Early termination of weak trials')
+
+    args = parser.parse_args(argv)
+
+    sweep(args.space, output_dir=args.output, jobs=args.jobs, threads=args.threads,
+          scheduler=args.scheduler)
+
+
+if __name__ == '__main__':
+    main()
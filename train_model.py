@@ -4,7 +4,6 @@ Simple YOLOv8 Training Script for Tooth Detection
 """
 
 import os
-from ultralytics import YOLO
 
 def train_model(
     data_yaml='data.yaml',
@@ -15,6 +14,7 @@ def train_model(
     device='0'
 ):
     """Train YOLOv8 model"""
+    from ultralytics import YOLO
     
     # Load model
     model = YOLO(f'yolov8{model_size}.pt')
@@ -43,7 +43,7 @@ def train_model(
     
     return model
 
-if __name__ == '__main__':
+def main(argv=None):
     import argparse
     
     parser = argparse.ArgumentParser()
@@ -53,7 +53,7 @@ if __name__ == '__main__':
     parser.add_argument('--batch', type=int, default=16, help='batch size')
     parser.add_argument('--device', default='0', help='cuda device, i.e. 0 or cpu')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     train_model(
         data_yaml=args.data,
@@ -61,4 +61,8 @@ if __name__ == '__main__':
         epochs=args.epochs,
         batch=args.batch,
         device=args.device
-    )
\ No newline at end of file
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,11 @@
 """
 DenteScope AI - YOLOv8 Tooth Detection Model Training
 Train a custom YOLOv8 model to detect and measure tooth widths
+
+ultralytics is imported inside the functions that use it, so --help and
+argument errors return immediately.
 """
 
-from ultralytics import YOLO
-import yaml
 import os
 from pathlib import Path
 
@@ -13,6 +14,8 @@ def create_data_yaml(dataset_path, num_classes=1):
     """
     Create data.yaml configuration file for YOLOv8 training
     """
+    import yaml
+
     data_config = {
         'path': str(dataset_path),  # Dataset root directory
         'train': 'train/images',    # Train images
@@ -39,7 +42,12 @@ def train_model(
     batch_size=16,
     device='0',  # GPU device, or 'cpu'
     project='runs/train',
-    name='tooth_detection'
+    name='tooth_detection',
+    cache='mmap',  # mmap, ram, disk or none
+    cache_dir=None,
+    callbacks=None,
+    profile=False,
+    **overrides
 ):
     """
     Train YOLOv8 model for tooth detection
@@ -53,8 +61,18 @@ def train_model(
         device: GPU device ID or 'cpu'
         project: Project directory
         name: Experiment name
+        cache: Image cache: 'mmap' (persistent, shared across runs and model
+            sizes), 'ram'/'disk' (ultralytics' own) or 'none'
+        cache_dir: Root of the mmap cache (default: ~/.cache/dentescope)
+        callbacks: Optional {event: function} ultralytics callbacks
+        profile: Record per-epoch dataloader/augmentation/step timings to
+            profile.json in the run directory
+        **overrides: Extra ultralytics train arguments (e.g. lr0, mosaic);
+            they replace the defaults below
     """
     
+    from ultralytics import YOLO
+
     print("=" * 60)
     print("DenteScope AI - YOLOv8 Training")
     print("=" * 60)
@@ -63,6 +81,12 @@ def train_model(
     model_name = f'yolov8{model_size}.pt'
     print(f"\n📦 Loading pretrained model: {model_name}")
     model = YOLO(model_name)
+    for event, callback in (callbacks or {}).items():
+        model.add_callback(event, callback)
+    if profile:
+        from dentescope.trainprof import TrainingProfiler
+        for event, callback in TrainingProfiler().callbacks().items():
+            model.add_callback(event, callback)
     
     # Training parameters
     print(f"\n⚙️  Training Configuration:")
@@ -71,10 +95,17 @@ def train_model(
     print(f"   • Image Size: {imgsz}")
     print(f"   • Batch Size: {batch_size}")
     print(f"   • Device: {device}")
+    print(f"   • Image Cache: {cache}")
+    for key, value in overrides.items():
+        print(f"   • {key}: {value}")
     
-    # Start training
-    print(f"\n🚀 Starting training...")
-    results = model.train(
+    # The mmap cache is built once per dataset and imgsz and reused by every run
+    trainer = None
+    if cache == 'mmap':
+        from dentescope.traincache import CachedDetectionTrainer
+        trainer = CachedDetectionTrainer.configured(cache_dir=cache_dir)
+    
+    train_args = dict(
         data=data_yaml_path,
         epochs=epochs,
         imgsz=imgsz,
@@ -85,7 +116,7 @@ def train_model(
         patience=50,  # Early stopping patience
         save=True,
         save_period=10,  # Save checkpoint every 10 epochs
-        cache=True,  # Cache images for faster training
+        cache=cache if cache in ('ram', 'disk') else False,
         verbose=True,
         plots=True,  # Generate training plots
         
@@ -103,10 +134,17 @@ def train_model(
         mosaic=1.0,   # Mosaic augmentation
         mixup=0.0,    # Mixup augmentation
     )
+    train_args.update(overrides)
+    
+    # Start training
+    print(f"\n🚀 Starting training...")
+    results = model.train(trainer=trainer, **train_args)
     
     print(f"\n✅ Training completed!")
     print(f"   • Best model saved to: {project}/{name}/weights/best.pt")
     print(f"   • Last model saved to: {project}/{name}/weights/last.pt")
+    if profile:
+        print(f"   • Throughput profile: {model.trainer.save_dir}/profile.json")
     
     return results
 
@@ -118,6 +156,7 @@ def validate_model(model_path, data_yaml_path):
     print("Model Validation")
     print("=" * 60)
     
+    from ultralytics import YOLO
     model = YOLO(model_path)
     
     # Validate on validation set
@@ -139,6 +178,7 @@ def test_prediction(model_path, test_image_path, save_dir='runs/predict'):
     print("Test Prediction")
     print("=" * 60)
     
+    from ultralytics import YOLO
     model = YOLO(model_path)
     
     # Run inference
@@ -174,6 +214,7 @@ def export_model(model_path, export_format='onnx'):
     print(f"Exporting Model to {export_format.upper()}")
     print("=" * 60)
     
+    from ultralytics import YOLO
     model = YOLO(model_path)
     
     # Export model
@@ -181,7 +222,7 @@ def export_model(model_path, export_format='onnx'):
     
     print(f"✓ Model exported to {export_format.upper()} format")
 
-if __name__ == "__main__":
+def main(argv=None):
     import argparse
     
     parser = argparse.ArgumentParser(description='Train YOLOv8 for tooth detection')
@@ -192,12 +233,17 @@ if __name__ == "__main__":
     parser.add_argument('--batch-size', type=int, default=16, help='Batch size')
     parser.add_argument('--imgsz', type=int, default=640, help='Input image size')
     parser.add_argument('--device', type=str, default='0', help='GPU device (0, 1, 2, ...) or cpu')
+    parser.add_argument('--cache', type=str, default='mmap', choices=['mmap', 'ram', 'disk', 'none'],
+                        help='Image cache (mmap = persistent cache shared across runs)')
+    parser.add_argument('--cache-dir', type=str, help='mmap cache directory (default: ~/.cache/dentescope)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile dataloading vs compute per epoch (writes profile.json)')
     parser.add_argument('--validate', action='store_true', help='Run validation after training')
     parser.add_argument('--test-image', type=str, help='Test prediction on a sample image')
     parser.add_argument('--export', type=str, choices=['onnx', 'torchscript', 'coreml', 'tflite'],
                         help='Export model format after training')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Create data.yaml if it doesn't exist
     data_yaml = os.path.join(args.dataset, 'data.yaml')
@@ -212,7 +258,10 @@ if __name__ == "__main__":
         epochs=args.epochs,
         imgsz=args.imgsz,
         batch_size=args.batch_size,
-        device=args.device
+        device=args.device,
+        cache=args.cache,
+        cache_dir=args.cache_dir,
+        profile=args.profile
     )
     
     # Get best model path
@@ -233,3 +282,8 @@ if __name__ == "__main__":
     print("\n" + "=" * 60)
     print("🎉 All operations completed successfully!")
     print("=" * 60)
+    print(f"📇 Register the model: python -m dentescope models add {best_model} --name NAME")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,35 +3,297 @@
 DenteScope AI - Comprehensive Tooth Width Analysis
 Analyzes tooth widths from detected bounding boxes
 Generates statistical reports and visualizations
+
+Heavy libraries (ultralytics, pandas, matplotlib) are imported inside the
+functions that use them, so report workers only pay for what they render.
+
+`analyze_tooth_widths.py report <measurements.csv>` re-renders the report
+artifacts from an earlier run's CSV without loading the model.
 """
 
-from ultralytics import YOLO
+import csv
+import multiprocessing
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
 from datetime import datetime
 
-def analyze_tooth_widths(model_path, image_dir, output_dir, calibration_factor=0.1):
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from dentescope.metadata import MetadataTable, add_filter_arguments, filters_from_args
+from dentescope.registry import load_model, resolve
+from dentescope.scanner import list_images
+
+# Report artifacts that can be requested with --formats
+REPORT_FORMATS = ['csv', 'xlsx', 'stats', 'png', 'plots']
+DEFAULT_FORMATS = ['csv', 'xlsx', 'png']
+
+# Individual figures produced by the 'plots' format
+PLOT_NAMES = ['histogram', 'per_patient', 'scatter', 'boxplot']
+
+MEASUREMENT_FIELDS = [
+    'patient', 'age', 'sex', 'doctor', 'study_date', 'image', 'width_px', 'height_px',
+    'width_mm', 'height_mm', 'confidence', 'bbox'
+]
+
+
+def _per_patient_means(measurements):
+    """Mean width per patient, sorted ascending (same order as pandas sort_values)"""
+    widths = {}
+    for m in measurements:
+        widths.setdefault(m['patient'], []).append(m['width_mm'])
+    means = {patient: statistics.fmean(values) for patient, values in widths.items()}
+    return sorted(means.items(), key=lambda item: item[1])
+
+
+def _draw_histogram(ax, measurements):
+    widths = [m['width_mm'] for m in measurements]
+    mean_width = statistics.fmean(widths)
+    ax.hist(widths, bins=20, color='skyblue', edgecolor='black', alpha=0.7)
+    ax.axvline(mean_width, color='red', linestyle='--', linewidth=2,
+               label=f'Mean: {mean_width:.1f}mm')
+    ax.set_xlabel('Width (mm)', fontsize=12)
+    ax.set_ylabel('Frequency', fontsize=12)
+    ax.set_title('Width Distribution', fontsize=14, fontweight='bold')
+    ax.legend()
+    ax.grid(alpha=0.3)
+
+
+def _draw_per_patient(ax, measurements):
+    patient_means = _per_patient_means(measurements)
+    ax.barh(range(len(patient_means)), [mean for _, mean in patient_means],
+            color='green', alpha=0.6)
+    ax.set_yticks(range(len(patient_means)))
+    ax.set_yticklabels([patient[:20] for patient, _ in patient_means], fontsize=8)
+    ax.set_xlabel('Width (mm)', fontsize=12)
+    ax.set_title('Per-Patient Width Measurements', fontsize=14, fontweight='bold')
+    ax.grid(axis='x', alpha=0.3)
+
+
+def _draw_scatter(ax, measurements):
+    ax.scatter([m['width_mm'] for m in measurements],
+               [m['confidence'] for m in measurements],
+               alpha=0.6, s=100, c='purple')
+    ax.set_xlabel('Width (mm)', fontsize=12)
+    ax.set_ylabel('Confidence', fontsize=12)
+    ax.set_title('Width vs Detection Confidence', fontsize=14, fontweight='bold')
+    ax.grid(alpha=0.3)
+
+
+def _draw_boxplot(ax, measurements):
+    ax.boxplot([[m['width_mm'] for m in measurements]], vert=True)
+    ax.set_xticklabels(['Width'])
+    ax.set_ylabel('Width (mm)', fontsize=12)
+    ax.set_title('Width Distribution (Box Plot)', fontsize=14, fontweight='bold')
+    ax.grid(alpha=0.3)
+
+
+PLOT_DRAWERS = {
+    'histogram': _draw_histogram,
+    'per_patient': _draw_per_patient,
+    'scatter': _draw_scatter,
+    'boxplot': _draw_boxplot,
+}
+
+
+def _pyplot():
+    """Import pyplot with the non-interactive Agg backend"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def write_csv(measurements, path):
+    """Write raw measurements with the stdlib csv module (no pandas needed)"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MEASUREMENT_FIELDS)
+        writer.writeheader()
+        writer.writerows(measurements)
+    return path
+
+
+def read_measurements(path):
+    """Load measurements written by write_csv, with numbers converted back from text"""
+    measurements = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            row['age'] = int(row['age']) if row.get('age') else None
+            for field in ('width_px', 'height_px', 'width_mm', 'height_mm', 'confidence'):
+                row[field] = float(row[field])
+            measurements.append(row)
+    return measurements
+
+
+def write_excel(measurements, path):
+    """Write the three-sheet Excel workbook"""
+    import pandas as pd
+
+    df = pd.DataFrame(measurements, columns=MEASUREMENT_FIELDS)
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Raw Data', index=False)
+        df.describe().to_excel(writer, sheet_name='Statistics')
+        df.groupby('patient')['width_mm'].agg(['mean', 'std', 'count']).to_excel(
+            writer, sheet_name='Per Patient'
+        )
+    return path
+
+
+def write_stats(measurements, path):
+    """Write the describe() and per-patient tables as a standalone CSV"""
+    import pandas as pd
+
+    df = pd.DataFrame(measurements, columns=MEASUREMENT_FIELDS)
+    with open(path, 'w', newline='') as f:
+        f.write('# Statistics\n')
+        df.describe().to_csv(f)
+        f.write('\n# Per Patient\n')
+        df.groupby('patient')['width_mm'].agg(['mean', 'std', 'count']).to_csv(f)
+    return path
+
+
+def write_overview(measurements, path):
+    """Render the four-panel overview figure"""
+    plt = _pyplot()
+
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    fig.suptitle('DenteScope AI - Tooth Width Analysis', fontsize=16, fontweight='bold')
+
+    _draw_histogram(axes[0, 0], measurements)
+    _draw_per_patient(axes[0, 1], measurements)
+    _draw_scatter(axes[1, 0], measurements)
+    _draw_boxplot(axes[1, 1], measurements)
+
+    plt.tight_layout()
+    fig.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def write_plot(measurements, path, plot_name):
+    """Render a single panel of the overview as its own figure"""
+    plt = _pyplot()
+
+    fig, ax = plt.subplots(figsize=(7.5, 5))
+    PLOT_DRAWERS[plot_name](ax, measurements)
+    fig.tight_layout()
+    fig.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def report_tasks(output_dir, formats, date_tag=None):
+    """
+    Expand requested formats into independent artifact tasks
+
+    Args:
+        output_dir: Directory the artifacts are written to
+        formats: Iterable of names from REPORT_FORMATS
+        date_tag: Filename date suffix (default: today, YYYYMMDD)
+
+    Returns:
+        List of (label, function, path, extra_args) tuples
+    """
+    output_dir = Path(output_dir)
+    date_tag = date_tag or datetime.now().strftime('%Y%m%d')
+
+    unknown = set(formats) - set(REPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown report format(s): {', '.join(sorted(unknown))}")
+
+    tasks = []
+    if 'csv' in formats:
+        tasks.append(('CSV', write_csv,
+                      output_dir / f"tooth_width_analysis_{date_tag}.csv", ()))
+    if 'xlsx' in formats:
+        tasks.append(('Excel', write_excel,
+                      output_dir / f"tooth_width_report_{date_tag}.xlsx", ()))
+    if 'stats' in formats:
+        tasks.append(('Statistics', write_stats,
+                      output_dir / f"tooth_width_statistics_{date_tag}.csv", ()))
+    if 'png' in formats:
+        tasks.append(('Visualizations', write_overview,
+                      output_dir / f"tooth_width_visualizations_{date_tag}.png", ()))
+    if 'plots' in formats:
+        for plot_name in PLOT_NAMES:
+            tasks.append((f"Plot ({plot_name})", write_plot,
+                          output_dir / f"tooth_width_{plot_name}_{date_tag}.png", (plot_name,)))
+    return tasks
+
+
+def generate_reports(measurements, output_dir, formats=DEFAULT_FORMATS, workers=None):
+    """
+    Write report artifacts concurrently in a process pool
+
+    Args:
+        measurements: List of measurement dicts (see MEASUREMENT_FIELDS)
+        output_dir: Where to save results
+        formats: Artifacts to produce (subset of REPORT_FORMATS)
+        workers: Worker processes (default: one per task, capped at CPU count)
+
+    Returns:
+        Dict mapping artifact label to written path
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks = report_tasks(output_dir, formats)
+    if not tasks:
+        return {}
+
+    written = {}
+    if workers == 1 or len(tasks) == 1:
+        for label, func, path, extra in tasks:
+            written[label] = func(measurements, path, *extra)
+            print(f"✓ {label} saved: {path}")
+        return written
+
+    workers = workers or min(len(tasks), multiprocessing.cpu_count())
+    # spawn keeps workers free of the parent's torch/ultralytics state;
+    # this module's top-level imports are stdlib only, so start-up is cheap
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(func, measurements, path, *extra): label
+            for label, func, path, extra in tasks
+        }
+        for future in as_completed(futures):
+            label = futures[future]
+            written[label] = future.result()
+            print(f"✓ {label} saved: {written[label]}")
+    return written
+
+
+def analyze_tooth_widths(model_path, image_dir, output_dir, calibration_factor=0.1,
+                         formats=DEFAULT_FORMATS, workers=None, filters=None):
     """
     Comprehensive tooth width analysis
     
     Args:
-        model_path: Path to trained YOLO model
+        model_path: Path to trained YOLO model or registry name
         image_dir: Directory containing dental X-rays
         output_dir: Where to save results
         calibration_factor: Pixels to mm conversion (default 0.1)
+        formats: Report artifacts to write (subset of REPORT_FORMATS)
+        workers: Report worker processes (default: one per artifact)
+        filters: Cohort filters (age, sex, doctor, patient, since, until)
     """
+    import pandas as pd
+
     print("🦷 DenteScope AI - Tooth Width Analysis")
     print("=" * 70)
     
     # Load model
-    model = YOLO(model_path)
+    model_path = resolve(model_path)
+    model = load_model(model_path)
     print(f"✓ Model loaded: {model_path}")
     
     # Get images
     image_dir = Path(image_dir)
-    images = list(image_dir.glob('*.jpg'))
+    metadata = MetadataTable(list_images(image_dir))
+    images = metadata.select(**(filters or {}))
+    if filters:
+        print(f"✓ Cohort {filters}: {len(images)}/{len(metadata)} images")
     print(f"✓ Found {len(images)} images to analyze\n")
     
     # Collect measurements
@@ -42,6 +304,7 @@ def analyze_tooth_widths(model_path, image_dir, output_dir, calibration_factor=0
         
         # Run detection
         results = model.predict(img, conf=0.25, verbose=False)
+        meta = metadata.get(img)
         
         for r in results:
             for box in r.boxes:
@@ -56,7 +319,11 @@ def analyze_tooth_widths(model_path, image_dir, output_dir, calibration_factor=0
                 conf = box.conf[0].item()
                 
                 measurements.append({
-                    'patient': img.stem[:40],
+                    'patient': meta.patient,
+                    'age': meta.age,
+                    'sex': meta.sex,
+                    'doctor': meta.doctor,
+                    'study_date': meta.study_date,
                     'image': img.name,
                     'width_px': width_px,
                     'height_px': height_px,
@@ -69,7 +336,7 @@ def analyze_tooth_widths(model_path, image_dir, output_dir, calibration_factor=0
                 print(f"  ✓ Width: {width_px:.1f}px ({width_mm:.1f}mm), Conf: {conf:.1%}")
     
     # Create DataFrame
-    df = pd.DataFrame(measurements)
+    df = pd.DataFrame(measurements, columns=MEASUREMENT_FIELDS)
     
     # Calculate statistics
     print("\n" + "=" * 70)
@@ -96,65 +363,12 @@ def analyze_tooth_widths(model_path, image_dir, output_dir, calibration_factor=0
     print(f"  Min:       {df['confidence'].min():.1%}")
     print(f"  Max:       {df['confidence'].max():.1%}")
     
-    # Create output directory
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Save raw data
-    csv_file = output_dir / f"tooth_width_analysis_{datetime.now().strftime('%Y%m%d')}.csv"
-    df.to_csv(csv_file, index=False)
-    print(f"\n✓ CSV saved: {csv_file}")
-    
-    # Save to Excel with multiple sheets
-    excel_file = output_dir / f"tooth_width_report_{datetime.now().strftime('%Y%m%d')}.xlsx"
-    with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Raw Data', index=False)
-        df.describe().to_excel(writer, sheet_name='Statistics')
-        df.groupby('patient')['width_mm'].agg(['mean', 'std', 'count']).to_excel(
-            writer, sheet_name='Per Patient'
-        )
-    print(f"✓ Excel saved: {excel_file}")
-    
-    # Create visualizations
-    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
-    fig.suptitle('DenteScope AI - Tooth Width Analysis', fontsize=16, fontweight='bold')
-    
-    # Histogram
-    axes[0, 0].hist(df['width_mm'], bins=20, color='skyblue', edgecolor='black', alpha=0.7)
-    axes[0, 0].axvline(df['width_mm'].mean(), color='red', linestyle='--', linewidth=2,
-                       label=f'Mean: {df["width_mm"].mean():.1f}mm')
-    axes[0, 0].set_xlabel('Width (mm)', fontsize=12)
-    axes[0, 0].set_ylabel('Frequency', fontsize=12)
-    axes[0, 0].set_title('Width Distribution', fontsize=14, fontweight='bold')
-    axes[0, 0].legend()
-    axes[0, 0].grid(alpha=0.3)
-    
-    # Bar chart - Per Patient
-    patient_means = df.groupby('patient')['width_mm'].mean().sort_values()
-    axes[0, 1].barh(range(len(patient_means)), patient_means.values, color='green', alpha=0.6)
-    axes[0, 1].set_yticks(range(len(patient_means)))
-    axes[0, 1].set_yticklabels([p[:20] for p in patient_means.index], fontsize=8)
-    axes[0, 1].set_xlabel('Width (mm)', fontsize=12)
-    axes[0, 1].set_title('Per-Patient Width Measurements', fontsize=14, fontweight='bold')
-    axes[0, 1].grid(axis='x', alpha=0.3)
-    
-    # Scatter - Width vs Confidence
-    axes[1, 0].scatter(df['width_mm'], df['confidence'], alpha=0.6, s=100, c='purple')
-    axes[1, 0].set_xlabel('Width (mm)', fontsize=12)
-    axes[1, 0].set_ylabel('Confidence', fontsize=12)
-    axes[1, 0].set_title('Width vs Detection Confidence', fontsize=14, fontweight='bold')
-    axes[1, 0].grid(alpha=0.3)
-    
-    # Box plot
-    axes[1, 1].boxplot([df['width_mm']], vert=True, labels=['Width'])
-    axes[1, 1].set_ylabel('Width (mm)', fontsize=12)
-    axes[1, 1].set_title('Width Distribution (Box Plot)', fontsize=14, fontweight='bold')
-    axes[1, 1].grid(alpha=0.3)
-    
-    plt.tight_layout()
-    viz_file = output_dir / f"tooth_width_visualizations_{datetime.now().strftime('%Y%m%d')}.png"
-    plt.savefig(viz_file, dpi=300, bbox_inches='tight')
-    print(f"✓ Visualizations saved: {viz_file}")
+    # Write report artifacts in parallel
+    print()
+    if measurements:
+        generate_reports(measurements, output_dir, formats=formats, workers=workers)
+    else:
+        print("⚠️  No detections found, skipping reports")
     
     print("\n" + "=" * 70)
     print("✅ Analysis complete!")
@@ -162,15 +376,64 @@ def analyze_tooth_widths(model_path, image_dir, output_dir, calibration_factor=0
     
     return df
 
-if __name__ == "__main__":
+def main(argv=None):
     import argparse
     
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == 'report':
+        return report_main(argv[1:])
+    
     parser = argparse.ArgumentParser(description='Analyze tooth widths from dental X-rays')
-    parser.add_argument('--model', required=True, help='Path to trained YOLO model')
+    parser.add_argument('--model', required=True, help='Path to trained YOLO model or registry name')
     parser.add_argument('--images', required=True, help='Directory containing X-ray images')
     parser.add_argument('--output', default='width_analysis_results', help='Output directory')
     parser.add_argument('--calibration', type=float, default=0.1, help='Pixels to mm factor')
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS),
+                        help=f"Comma-separated report artifacts ({', '.join(REPORT_FORMATS)})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Report worker processes (default: one per artifact)')
+    add_filter_arguments(parser)
+    
+    args = parser.parse_args(argv)
     
-    args = parser.parse_args()
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = set(formats) - set(REPORT_FORMATS)
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
     
-    analyze_tooth_widths(args.model, args.images, args.output, args.calibration)
+    analyze_tooth_widths(args.model, args.images, args.output, args.calibration,
+                         formats=formats, workers=args.workers,
+                         filters=filters_from_args(args))
+
+
+def report_main(argv=None):
+    """Re-render report artifacts from a measurements CSV without running the model"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Render tooth width reports from a measurements CSV')
+    parser.add_argument('measurements', help='Measurements CSV (the csv format of a previous analysis)')
+    parser.add_argument('--output', help='Output directory (default: the CSV\'s directory)')
+    parser.add_argument('--formats', default='xlsx,png',
+                        help=f"Comma-separated report artifacts ({', '.join(REPORT_FORMATS)})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Report worker processes (default: one per artifact)')
+
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = set(formats) - set(REPORT_FORMATS)
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
+
+    measurements = read_measurements(args.measurements)
+    if not measurements:
+        print("⚠️  No measurements in the CSV, nothing to render")
+        return 1
+    print(f"✓ {len(measurements)} measurements from {args.measurements}")
+    generate_reports(measurements, args.output or Path(args.measurements).parent,
+                     formats=formats, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    main()